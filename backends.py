@@ -0,0 +1,640 @@
+# backends.py
+# Motores de banco usados por database.py. A API de database.py é escrita no
+# dialeto do Firebird (fdb); cada motor entrega conexões com a mesma interface
+# (cursor, prep, commit, rollback, close, closed) e cuida do que é específico
+# dele: criação do banco, transação de leitura, consultas ao catálogo usadas
+# pelas migrações e, no SQLite, tradução do SQL e os triggers equivalentes.
+#   - BackendFirebird: servidor Firebird (local ou remoto), via fdb.
+#   - BackendSQLite: arquivo SQLite embutido no processo, em modo WAL, para
+#     instalações de um único computador (sem servidor de banco).
+import abc
+import collections
+import contextlib
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+
+try:
+    import fdb
+except ImportError:
+    fdb = None
+
+# Exceções dos drivers, para "except ErroBanco" funcionar com qualquer motor
+ErroBanco = (sqlite3.Error,) + ((fdb.Error,) if fdb else ())
+
+class Backend(abc.ABC):
+    """Interface dos motores. 'nome' é o valor gravado em database/motor."""
+    nome = None
+    suporta_eventos = False # POST_EVENT / event_conduit (avisos entre computadores)
+    suporta_psql = False # Triggers/procedures em PSQL; sem ele, as migrações usam os scripts deste módulo
+
+    @abc.abstractmethod
+    def criar_banco(self, params):
+        """Cria o banco em params['database'] (chamado só quando o arquivo local não existe)."""
+
+    @abc.abstractmethod
+    def conectar(self, params):
+        """Abre uma conexão nova com a interface das conexões fdb."""
+
+    @abc.abstractmethod
+    def transacao_leitura(self, conexao):
+        """Objeto com cursor() e close() para as consultas de conectar_leitura()."""
+
+    @abc.abstractmethod
+    def tabela_existe(self, cur, nome_tabela):
+        """Indica se a tabela existe no banco."""
+
+    @abc.abstractmethod
+    def coluna_existe(self, cur, nome_tabela, nome_coluna):
+        """Indica se a coluna existe na tabela."""
+
+    @abc.abstractmethod
+    def colunas_dos_indices(self, cur, nome_tabela):
+        """Lista, para cada índice da tabela (inclusive os automáticos), as suas colunas em ordem."""
+
+    @abc.abstractmethod
+    def criar_gerador(self, cur, nome):
+        """Cria o generator (contador fora das transações), se ainda não existir."""
+
+    @abc.abstractmethod
+    def criar_chave_automatica(self, cur, tabela):
+        """Faz a coluna ID da tabela ser preenchida automaticamente nos INSERTs sem ID."""
+
+    @abc.abstractmethod
+    def bloqueio_migracoes(self, params):
+        """
+        Gerenciador de contexto que só entra quando nenhum outro processo (de qualquer
+        computador) está dentro dele, usado por database.iniciar_db em cada migração.
+        """
+
+#==============================================================================
+# FIREBIRD
+#==============================================================================
+class BackendFirebird(Backend):
+    nome = "firebird"
+    suporta_eventos = True
+    suporta_psql = True
+
+    def _fdb(self):
+        if fdb is None:
+            raise ConnectionError("O driver do Firebird (fdb) não está instalado. Instale com: pip install fdb")
+        return fdb
+
+    def criar_banco(self, params):
+        self._fdb().create_database(dsn=f"{params['host']}/{params['port']}:{params['database']}",
+                                    user=params['user'], password=params['password'])
+
+    def conectar(self, params):
+        return self._fdb().connect(
+            host=params['host'],
+            port=params['port'],
+            database=params['database'],
+            user=params['user'],
+            password=params['password'],
+            charset='UTF8'
+        )
+
+    def transacao_leitura(self, conexao):
+        return conexao.trans(default_tpb=fdb.ISOLATION_LEVEL_READ_COMMITED_RO)
+
+    def tabela_existe(self, cur, nome_tabela):
+        cur.execute("SELECT RDB$RELATION_NAME FROM RDB$RELATIONS WHERE RDB$RELATION_NAME = ?", (nome_tabela.upper(),))
+        return cur.fetchone() is not None
+
+    def coluna_existe(self, cur, nome_tabela, nome_coluna):
+        cur.execute("""
+            SELECT 1
+            FROM RDB$RELATION_FIELDS
+            WHERE RDB$RELATION_NAME = ? AND RDB$FIELD_NAME = ?
+        """, (nome_tabela.upper(), nome_coluna.upper()))
+        return cur.fetchone() is not None
+
+    def colunas_dos_indices(self, cur, nome_tabela):
+        # Inclui os índices criados pelo Firebird para chaves primárias, estrangeiras e UNIQUE
+        cur.execute("""
+            SELECT i.RDB$INDEX_NAME, TRIM(s.RDB$FIELD_NAME)
+            FROM RDB$INDICES i
+            JOIN RDB$INDEX_SEGMENTS s ON s.RDB$INDEX_NAME = i.RDB$INDEX_NAME
+            WHERE i.RDB$RELATION_NAME = ?
+            ORDER BY i.RDB$INDEX_NAME, s.RDB$FIELD_POSITION
+        """, (nome_tabela.upper(),))
+        segmentos = collections.defaultdict(list)
+        for nome_indice, campo in cur.fetchall():
+            segmentos[nome_indice].append(campo)
+        return list(segmentos.values())
+
+    def criar_gerador(self, cur, nome):
+        cur.execute(f"SELECT RDB$GENERATOR_NAME FROM RDB$GENERATORS WHERE RDB$GENERATOR_NAME = '{nome}'")
+        if cur.fetchone() is None:
+            cur.execute(f"CREATE GENERATOR {nome}")
+
+    def criar_chave_automatica(self, cur, tabela):
+        gen_name = f"GEN_{tabela}_ID"
+        trg_name = f"TRG_{tabela}_BI"
+        self.criar_gerador(cur, gen_name)
+        cur.execute(f"SELECT RDB$TRIGGER_NAME FROM RDB$TRIGGERS WHERE RDB$TRIGGER_NAME = '{trg_name}'")
+        if cur.fetchone() is None:
+            cur.execute(f"""
+            CREATE TRIGGER {trg_name} FOR {tabela}
+            ACTIVE BEFORE INSERT POSITION 0
+            AS
+            BEGIN
+                IF (NEW.ID IS NULL) THEN NEW.ID = GEN_ID({gen_name}, 1);
+            END
+            """)
+
+    @contextlib.contextmanager
+    def bloqueio_migracoes(self, params):
+        # Trava a linha sentinela de SCHEMA_VERSION (VERSAO = 0) numa conexão à parte,
+        # já que as migrações confirmam o próprio DDL no meio do caminho. Outro
+        # computador fica esperando no UPDATE até esta transação ser desfeita.
+        conexao = self.conectar(params)
+        try:
+            conexao.cursor().execute("UPDATE SCHEMA_VERSION SET DESCRICAO = DESCRICAO WHERE VERSAO = 0")
+            yield
+        finally:
+            conexao.rollback()
+            conexao.close()
+
+#==============================================================================
+# SQLITE
+#==============================================================================
+# Datas são gravadas como texto ISO ('yyyy-MM-dd' e 'yyyy-MM-dd HH:MM:SS'), que
+# compara na mesma ordem das datas e aceita os parâmetros em texto usados pelas
+# telas. Colunas declaradas DATE/TIMESTAMP voltam como date/datetime; em
+# expressões, use "CAST(x AS DATE) AS NOME" (traduzido para o tipo na coluna).
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(" "))
+sqlite3.register_converter("DATE", lambda valor: date.fromisoformat(valor.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda valor: datetime.fromisoformat(valor.decode()))
+
+# SQL já traduzido. 'limite_no_inicio': o valor de "FIRST ?" vem como primeiro
+# parâmetro e precisa ir para o LIMIT do final. 'gerador': (nome, incremento)
+# quando o comando é um "SELECT GEN_ID(...) FROM RDB$DATABASE".
+ComandoSQLite = collections.namedtuple('ComandoSQLite', 'sql limite_no_inicio gerador')
+
+_RE_FIRST = re.compile(r"^(\s*SELECT\s+)FIRST\s+(\?|\d+)\s+", re.IGNORECASE)
+_RE_GEN_ID = re.compile(r"^\s*SELECT\s+GEN_ID\(\s*(\w+)\s*,\s*(-?\d+)\s*\)\s+FROM\s+RDB\$DATABASE\s*$", re.IGNORECASE)
+_RE_RDB_DATABASE = re.compile(r"\s+FROM\s+RDB\$DATABASE\b", re.IGNORECASE)
+_RE_EXTRACT = re.compile(r"EXTRACT\(\s*(YEAR|MONTH|DAY)\s+FROM\s+([\w.]+)\s*\)", re.IGNORECASE)
+_RE_CAST_DATA = re.compile(r"CAST\(\s*(NULL|[\w.]+)\s+AS\s+(DATE|TIMESTAMP)\s*\)\s+AS\s+(\w+)", re.IGNORECASE)
+_FORMATOS_EXTRACT = {'YEAR': '%Y', 'MONTH': '%m', 'DAY': '%d'}
+# DDL das migrações: chaves "ID" com generator viram AUTOINCREMENT (cuja sqlite_sequence
+# responde ao GEN_<tabela>_ID) e os tipos/opções próprios do Firebird são trocados
+_RE_CHAVE_ID = re.compile(r"\bID\s+(?:INTEGER|BIGINT)\s+NOT\s+NULL\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_RE_BLOB_TEXTO = re.compile(r"\bBLOB\s+SUB_TYPE\s+TEXT\b", re.IGNORECASE)
+_RE_CHARSET = re.compile(r"\s+CHARACTER\s+SET\s+\w+", re.IGNORECASE)
+
+def traduzir_sql(sql):
+    """Converte um comando escrito para o Firebird no equivalente do SQLite."""
+    gerador = _RE_GEN_ID.match(sql)
+    if gerador:
+        nome, incremento = gerador.group(1).upper(), int(gerador.group(2))
+        tabela = re.fullmatch(r"GEN_(\w+)_ID", nome)
+        if tabela:
+            # Chaves primárias usam AUTOINCREMENT: o "generator" é a sqlite_sequence
+            if incremento:
+                raise sqlite3.NotSupportedError(f"{nome} só pode ser consultado (incremento 0) no SQLite.")
+            consulta = f"SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = '{tabela.group(1)}'), 0)"
+            return ComandoSQLite(consulta, False, None)
+        consulta = f"SELECT COALESCE((SELECT VALOR FROM GENERATORS WHERE NOME = '{nome}'), 0)"
+        return ComandoSQLite(consulta, False, (nome, incremento) if incremento else None)
+
+    limite = _RE_FIRST.match(sql)
+    limite_no_inicio = False
+    if limite:
+        limite_no_inicio = limite.group(2) == '?'
+        sql = limite.group(1) + sql[limite.end():].rstrip() + f" LIMIT {limite.group(2)}"
+
+    sql = _RE_RDB_DATABASE.sub("", sql)
+    sql = _RE_CHAVE_ID.sub("ID INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+    sql = _RE_BLOB_TEXTO.sub("TEXT", sql)
+    sql = _RE_CHARSET.sub("", sql)
+    sql = _RE_EXTRACT.sub(lambda m: f"CAST(strftime('{_FORMATOS_EXTRACT[m.group(1).upper()]}', {m.group(2)}) AS INTEGER)", sql)
+    sql = _RE_CAST_DATA.sub(lambda m: f'{m.group(1)} AS "{m.group(3)} [{m.group(2).upper()}]"', sql)
+    sql = re.sub(r"\bCURRENT_TIMESTAMP\b", "(datetime('now', 'localtime'))", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURRENT_DATE\b", "(date('now', 'localtime'))", sql, flags=re.IGNORECASE)
+    return ComandoSQLite(sql, limite_no_inicio, None)
+
+class CursorSQLite:
+    """Cursor sqlite3 que aceita o SQL no dialeto do Firebird (ver traduzir_sql)."""
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._cursor = conexao._conexao.cursor()
+        self._ultimo = None # (sql, parâmetros) do último comando, para o plan
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def prep(self, sql):
+        """Traduz uma única vez; o sqlite3 reaproveita a compilação pelo cache de comandos da conexão."""
+        return traduzir_sql(sql)
+
+    def execute(self, comando, params=()):
+        if not isinstance(comando, ComandoSQLite):
+            comando = traduzir_sql(comando)
+        params = tuple(params)
+        if comando.limite_no_inicio:
+            params = params[1:] + params[:1]
+        if comando.gerador:
+            self._conexao._avancar_gerador(*comando.gerador)
+        self._cursor.execute(comando.sql, params)
+        self._ultimo = (comando.sql, params)
+        return self
+
+    def executemany(self, comando, seq_params):
+        if not isinstance(comando, ComandoSQLite):
+            comando = traduzir_sql(comando)
+        seq_params = list(seq_params)
+        self._cursor.executemany(comando.sql, seq_params)
+        self._ultimo = (comando.sql, seq_params[0]) if seq_params else None
+        return self
+
+    @property
+    def plan(self):
+        """Plano do último comando (EXPLAIN QUERY PLAN), no lugar do cursor.plan do fdb."""
+        if self._ultimo is None:
+            return None
+        sql, params = self._ultimo
+        passos = self._conexao._conexao.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        return "; ".join(passo[-1] for passo in passos)
+
+class ConexaoSQLite:
+    """Conexão sqlite3 com a interface usada por database.py (a mesma das conexões fdb)."""
+    def __init__(self, caminho, tamanho_cache_sql=64):
+        self._conexao = sqlite3.connect(
+            caminho,
+            timeout=30, # Espera (em vez de falhar) enquanto outra conexão grava
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level="IMMEDIATE", # A transação de escrita reserva o banco já no primeiro comando
+            check_same_thread=False, # O pool garante um usuário por vez, mas em threads diferentes
+            cached_statements=tamanho_cache_sql
+        )
+        self._conexao.execute("PRAGMA journal_mode = WAL")
+        self._conexao.execute("PRAGMA synchronous = NORMAL")
+        self._conexao.execute("PRAGMA foreign_keys = ON")
+        self.closed = False
+
+    def cursor(self):
+        return CursorSQLite(self)
+
+    def commit(self):
+        self._conexao.commit()
+
+    def rollback(self):
+        self._conexao.rollback()
+
+    def close(self):
+        if not self.closed:
+            self._conexao.close()
+            self.closed = True
+
+    def executar_script(self, script):
+        """Executa vários comandos SQLite nativos (sem tradução), como os triggers das migrações."""
+        self._conexao.executescript(script)
+
+    def _avancar_gerador(self, nome, incremento):
+        # Como no Firebird, o incremento não depende da transação em andamento:
+        # fora de uma transação ele é confirmado na hora
+        em_transacao = self._conexao.in_transaction
+        self._conexao.execute("UPDATE GENERATORS SET VALOR = VALOR + ? WHERE NOME = ?", (incremento, nome))
+        if not em_transacao:
+            self._conexao.commit()
+
+class _TransacaoLeituraSQLite:
+    # No modo WAL cada consulta fora de transação já lê o último commit sem
+    # bloquear quem grava; basta usar cursores da própria conexão
+    def __init__(self, conexao):
+        self._conexao = conexao
+
+    def cursor(self):
+        return self._conexao.cursor()
+
+    def close(self):
+        pass
+
+class BackendSQLite(Backend):
+    nome = "sqlite"
+
+    def criar_banco(self, params):
+        pasta = os.path.dirname(params['database'])
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        # O arquivo é criado pelo sqlite3 na primeira conexão
+
+    def conectar(self, params):
+        return ConexaoSQLite(params['database'], params.get('cache_sql_tamanho', 64))
+
+    def transacao_leitura(self, conexao):
+        return _TransacaoLeituraSQLite(conexao)
+
+    def tabela_existe(self, cur, nome_tabela):
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND UPPER(name) = ?", (nome_tabela.upper(),))
+        return cur.fetchone() is not None
+
+    def coluna_existe(self, cur, nome_tabela, nome_coluna):
+        cur.execute(f"PRAGMA table_info({nome_tabela})")
+        return any(coluna[1].upper() == nome_coluna.upper() for coluna in cur.fetchall())
+
+    def colunas_dos_indices(self, cur, nome_tabela):
+        # Inclui os índices automáticos de PRIMARY KEY e UNIQUE (o SQLite não indexa chaves estrangeiras)
+        cur.execute(f"PRAGMA index_list({nome_tabela})")
+        indices = [indice[1] for indice in cur.fetchall()]
+        colunas = []
+        for indice in indices:
+            cur.execute(f"PRAGMA index_info({indice})")
+            colunas.append([campo[2].upper() for campo in sorted(cur.fetchall())])
+        return colunas
+
+    def criar_gerador(self, cur, nome):
+        # Os generators ficam na tabela GENERATORS (ver traduzir_sql e ConexaoSQLite._avancar_gerador)
+        cur.execute("CREATE TABLE IF NOT EXISTS GENERATORS (NOME VARCHAR(31) NOT NULL PRIMARY KEY, VALOR BIGINT NOT NULL)")
+        cur.execute("INSERT INTO GENERATORS (NOME, VALOR) VALUES (?, 0) ON CONFLICT (NOME) DO NOTHING", (nome,))
+
+    def criar_chave_automatica(self, cur, tabela):
+        pass # A chave já foi criada como INTEGER PRIMARY KEY AUTOINCREMENT (ver traduzir_sql)
+
+    @contextlib.contextmanager
+    def bloqueio_migracoes(self, params):
+        # Trava exclusiva num arquivo ao lado do banco: travar o próprio banco
+        # impediria a conexão das migrações de gravar
+        conexao = sqlite3.connect(params['database'] + "-migracoes", timeout=600, isolation_level=None)
+        try:
+            conexao.execute("BEGIN EXCLUSIVE")
+            yield
+        finally:
+            conexao.close() # Desfaz a transação e libera a trava
+
+#------------------------------------------------------------------------------
+# TRIGGERS DO SQLITE
+# O SQLite segue a mesma lista de migrações de database.py (MIGRACOES): tabelas,
+# colunas, índices e cargas iniciais são os mesmos comandos, traduzidos por
+# traduzir_sql. Só os triggers e procedures (PSQL) têm aqui o seu equivalente, um
+# por migração. Cada trigger do Firebird vira um trigger por evento, com o mesmo
+# nome mais o sufixo do momento e do evento (TRG_ENTREGAS_BUSCA ->
+# TRG_ENTREGAS_BUSCA_AI, _AU e _AD); tests/test_esquema.py confere a correspondência.
+# Não há POST_EVENT (migração 5) nem triggers de chave (ver criar_chave_automatica).
+#------------------------------------------------------------------------------
+def _trigger(nome, evento, tabela, corpo, quando=None, momento="AFTER"):
+    """'nome' é o do trigger equivalente no Firebird; o sufixo (ex: _AI, _BD) é acrescentado aqui."""
+    condicao = f" WHEN {quando}" if quando else ""
+    return f"CREATE TRIGGER {nome}_{momento[0]}{evento[0]} {momento} {evento} ON {tabela}{condicao}\nBEGIN{corpo}\nEND;"
+
+def _remover_triggers(nome, eventos=("INSERT", "UPDATE", "DELETE"), momento="AFTER"):
+    return "\n".join(f"DROP TRIGGER IF EXISTS {nome}_{momento[0]}{evento[0]};" for evento in eventos)
+
+# Tabelas exibidas pelas telas e a coluna de data registrada em ALTERACOES
+_TABELAS_EXIBIDAS = {'ENTREGAS': 'DATA_VENCIMENTO', 'CLIENTES': None, 'STATUS': None, 'FERIADOS': 'DATA'}
+_EVENTOS = (('INSERT', 'I', 'NEW'), ('UPDATE', 'U', 'NEW'), ('DELETE', 'D', 'OLD'))
+
+def gatilhos_versao_dados():
+    """Migração 4: GEN_VERSAO_DADOS avança a cada alteração."""
+    return "\n".join(
+        _trigger(f"TRG_{tabela}_VERSAO", evento, tabela,
+                 "\n        UPDATE GENERATORS SET VALOR = VALOR + 1 WHERE NOME = 'GEN_VERSAO_DADOS';")
+        for tabela in _TABELAS_EXIBIDAS for evento, _, _ in _EVENTOS)
+
+def _registrar_alteracao(tabela, operacao, linha, coluna_data):
+    data_ref = f"{linha}.{coluna_data}" if coluna_data else "NULL"
+    return f"""
+        INSERT INTO ALTERACOES (ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF) VALUES ('{tabela}', {linha}.ID, '{operacao}', {data_ref});"""
+
+def gatilhos_registro_alteracoes():
+    """Migração 6: uma linha em ALTERACOES para cada linha gravada."""
+    comandos = []
+    for tabela, coluna_data in _TABELAS_EXIBIDAS.items():
+        for evento, operacao, linha in _EVENTOS:
+            corpo = _registrar_alteracao(tabela, operacao, linha, coluna_data)
+            if coluna_data and evento == 'UPDATE':
+                # Data alterada: registra também a antiga, para atualizar a tela que a exibia
+                corpo += f"""
+        INSERT INTO ALTERACOES (ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF)
+        SELECT '{tabela}', NEW.ID, 'U', OLD.{coluna_data} WHERE OLD.{coluna_data} IS NOT NEW.{coluna_data};"""
+            comandos.append(_trigger(f"TRG_{tabela}_ALTERACOES", evento, tabela, corpo))
+    return "\n".join(comandos)
+
+def _recalcular_resumo_dia(data):
+    return f"""
+        DELETE FROM RESUMO_DIA WHERE DATA = {data};
+        INSERT INTO RESUMO_DIA (DATA, CONTAGEM, STATUS_ID, QTD_AGENDADO, QTD_SOLICITADO)
+        SELECT DATA_VENCIMENTO, COUNT(*), MIN(STATUS_ID),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1)),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0))
+        FROM ENTREGAS WHERE DATA_VENCIMENTO = {data}
+        GROUP BY DATA_VENCIMENTO;"""
+
+def gatilhos_resumo_dia():
+    """Migração 7: RESUMO_DIA recalculada para a data (ou as datas) da linha gravada (RECALCULAR_RESUMO_DIA)."""
+    return "\n".join([
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "INSERT", "ENTREGAS", _recalcular_resumo_dia("NEW.DATA_VENCIMENTO")),
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "DELETE", "ENTREGAS", _recalcular_resumo_dia("OLD.DATA_VENCIMENTO")),
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "UPDATE", "ENTREGAS",
+                 _recalcular_resumo_dia("NEW.DATA_VENCIMENTO") + _recalcular_resumo_dia("OLD.DATA_VENCIMENTO")),
+    ])
+
+def _parcela_resumo_dia(linha, sinal):
+    return f"""
+        INSERT INTO RESUMO_DIA_PARCELAS (DATA, STATUS_ID, CONTAGEM, QTD_AGENDADO, QTD_SOLICITADO)
+        VALUES ({linha}.DATA_VENCIMENTO, {linha}.STATUS_ID, {sinal},
+                IIF({linha}.TIPO_ATENDIMENTO = 'SOLICITADO', 0, {sinal}), IIF({linha}.TIPO_ATENDIMENTO = 'SOLICITADO', {sinal}, 0));"""
+
+def gatilhos_resumo_dia_parcelas():
+    """Migração 13: cada gravação em ENTREGAS só insere parcelas (-1 para OLD, +1 para NEW) em RESUMO_DIA_PARCELAS."""
+    return "\n".join([
+        _remover_triggers("TRG_ENTREGAS_RESUMO_DIA"),
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "INSERT", "ENTREGAS", _parcela_resumo_dia("NEW", 1)),
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "DELETE", "ENTREGAS", _parcela_resumo_dia("OLD", -1)),
+        _trigger("TRG_ENTREGAS_RESUMO_DIA", "UPDATE", "ENTREGAS", _parcela_resumo_dia("OLD", -1) + _parcela_resumo_dia("NEW", 1),
+                 quando="OLD.DATA_VENCIMENTO IS NOT NEW.DATA_VENCIMENTO OR OLD.STATUS_ID IS NOT NEW.STATUS_ID"
+                        " OR OLD.TIPO_ATENDIMENTO IS NOT NEW.TIPO_ATENDIMENTO"),
+    ])
+
+def _e_feito(nome):
+    return f"IIF(UPPER({nome}) LIKE '%FEITO%', 1, 0)"
+
+def _e_retificado(nome):
+    return f"IIF(UPPER({nome}) LIKE '%RETIFICADO%', 1, 0)"
+
+def _e_pendente(nome):
+    return f"IIF(UPPER({nome}) = 'PENDENTE', 1, 0)"
+
+def _ano(data):
+    return f"CAST(strftime('%Y', {data}) AS INTEGER)"
+
+def _mes(data):
+    return f"CAST(strftime('%m', {data}) AS INTEGER)"
+
+_CONTAGENS_RESUMO_MES = f"""
+            COALESCE(SUM({_e_feito('s.NOME')}), 0),
+            COALESCE(SUM({_e_retificado('s.NOME')}), 0),
+            COALESCE(SUM(IIF(e.TIPO_ATENDIMENTO = 'SOLICITADO', {_e_pendente('s.NOME')}, 0)), 0),
+            COUNT(DISTINCT IIF(UPPER(s.NOME) LIKE '%FEITO%', e.CLIENTE_ID, NULL))"""
+
+def _recalcular_resumo_mes(data):
+    ano, mes = _ano(data), _mes(data)
+    return f"""
+        DELETE FROM RESUMO_MES WHERE ANO = {ano} AND MES = {mes};
+        INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+        SELECT {ano}, {mes},{_CONTAGENS_RESUMO_MES}
+        FROM ENTREGAS e
+        JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE e.DATA_VENCIMENTO >= date({data}, 'start of month') AND e.DATA_VENCIMENTO < date({data}, 'start of month', '+1 month');"""
+
+_RECALCULAR_RESUMO_MES_TODOS = f"""
+        DELETE FROM RESUMO_MES;
+        INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+        SELECT {_ano('e.DATA_VENCIMENTO')}, {_mes('e.DATA_VENCIMENTO')},{_CONTAGENS_RESUMO_MES}
+        FROM ENTREGAS e
+        JOIN STATUS s ON e.STATUS_ID = s.ID
+        GROUP BY 1, 2;"""
+
+def gatilhos_resumo_mes():
+    """
+    Migração 8: RESUMO_MES recalculada para o mês da linha gravada (RECALCULAR_RESUMO_MES);
+    renomear um status recalcula todos os meses. Inclui a carga inicial.
+    """
+    return "\n".join([
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "INSERT", "ENTREGAS", _recalcular_resumo_mes("NEW.DATA_VENCIMENTO")),
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "DELETE", "ENTREGAS", _recalcular_resumo_mes("OLD.DATA_VENCIMENTO")),
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "UPDATE", "ENTREGAS",
+                 _recalcular_resumo_mes("NEW.DATA_VENCIMENTO") + _recalcular_resumo_mes("OLD.DATA_VENCIMENTO")),
+        _trigger("TRG_STATUS_RESUMO_MES", "UPDATE", "STATUS", _RECALCULAR_RESUMO_MES_TODOS, quando="OLD.NOME IS NOT NEW.NOME"),
+        _RECALCULAR_RESUMO_MES_TODOS,
+    ])
+
+def _marcar_busca_pendente(entrega_id):
+    return f"""
+        INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ) VALUES ({entrega_id}, 0)
+        ON CONFLICT (ENTREGA_ID) DO UPDATE SET SEQ = SEQ + 1;"""
+
+def gatilhos_indice_busca():
+    """Migração 9: agendamentos cujo texto muda entram na fila BUSCA_PENDENTES."""
+    return "\n".join([
+        _trigger("TRG_ENTREGAS_BUSCA", "INSERT", "ENTREGAS", _marcar_busca_pendente("NEW.ID")),
+        _trigger("TRG_ENTREGAS_BUSCA", "DELETE", "ENTREGAS", _marcar_busca_pendente("OLD.ID")),
+        _trigger("TRG_ENTREGAS_BUSCA", "UPDATE", "ENTREGAS", _marcar_busca_pendente("NEW.ID"),
+                 quando="OLD.CLIENTE_ID IS NOT NEW.CLIENTE_ID OR OLD.RESPONSAVEL IS NOT NEW.RESPONSAVEL OR OLD.OBSERVACOES IS NOT NEW.OBSERVACOES"),
+        _trigger("TRG_CLIENTES_BUSCA", "UPDATE", "CLIENTES", """
+        INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ)
+        SELECT ID, 0 FROM ENTREGAS WHERE CLIENTE_ID = NEW.ID
+        ON CONFLICT (ENTREGA_ID) DO UPDATE SET SEQ = SEQ + 1;""", quando="OLD.NOME IS NOT NEW.NOME"),
+    ])
+
+_SOMAR_RESUMO_MES = """
+        ON CONFLICT (ANO, MES) DO UPDATE SET
+            CONCLUIDOS = CONCLUIDOS + excluded.CONCLUIDOS,
+            RETIFICADOS = RETIFICADOS + excluded.RETIFICADOS,
+            SOLICITADOS_PENDENTES = SOLICITADOS_PENDENTES + excluded.SOLICITADOS_PENDENTES,
+            CLIENTES_ATENDIDOS = CLIENTES_ATENDIDOS + excluded.CLIENTES_ATENDIDOS;"""
+
+def _ajustar_resumo_mes(linha, sinal):
+    """Soma (sinal 1) ou subtrai (sinal -1) a contribuição da linha NEW/OLD de ENTREGAS."""
+    ano, mes, cliente = _ano(f"{linha}.DATA_VENCIMENTO"), _mes(f"{linha}.DATA_VENCIMENTO"), f"{linha}.CLIENTE_ID"
+    return f"""
+        INSERT INTO RESUMO_MES_CLIENTES (ANO, MES, CLIENTE_ID, CONCLUIDOS)
+        SELECT {ano}, {mes}, {cliente}, {sinal} FROM STATUS
+        WHERE ID = {linha}.STATUS_ID AND {_e_feito('NOME')} = 1
+        ON CONFLICT (ANO, MES, CLIENTE_ID) DO UPDATE SET CONCLUIDOS = CONCLUIDOS + excluded.CONCLUIDOS;
+        INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+        SELECT {ano}, {mes}, {sinal} * FEITO, {sinal} * RETIFICADO, {sinal} * PENDENTE,
+               FEITO * (IIF(DEPOIS > 0, 1, 0) - IIF(DEPOIS - ({sinal}) > 0, 1, 0))
+        FROM (SELECT {_e_feito('NOME')} AS FEITO, {_e_retificado('NOME')} AS RETIFICADO,
+                     IIF({linha}.TIPO_ATENDIMENTO = 'SOLICITADO', {_e_pendente('NOME')}, 0) AS PENDENTE,
+                     COALESCE((SELECT CONCLUIDOS FROM RESUMO_MES_CLIENTES
+                               WHERE ANO = {ano} AND MES = {mes} AND CLIENTE_ID = {cliente}), 0) AS DEPOIS
+              FROM STATUS WHERE ID = {linha}.STATUS_ID)
+        WHERE FEITO + RETIFICADO + PENDENTE > 0{_SOMAR_RESUMO_MES}
+        DELETE FROM RESUMO_MES_CLIENTES WHERE ANO = {ano} AND MES = {mes} AND CLIENTE_ID = {cliente} AND CONCLUIDOS <= 0;"""
+
+_MUDOU_O_QUE_O_MES_CONTA = (
+    "OLD.STATUS_ID IS NOT NEW.STATUS_ID OR OLD.CLIENTE_ID IS NOT NEW.CLIENTE_ID"
+    " OR OLD.TIPO_ATENDIMENTO IS NOT NEW.TIPO_ATENDIMENTO"
+    " OR strftime('%Y-%m', OLD.DATA_VENCIMENTO) IS NOT strftime('%Y-%m', NEW.DATA_VENCIMENTO)")
+# Quanto o novo nome de um status muda cada classificação (feito, retificado, pendente): -1, 0 ou 1
+_DELTAS_DO_STATUS = tuple(f"({classe('NEW.NOME')} - {classe('OLD.NOME')})" for classe in (_e_feito, _e_retificado, _e_pendente))
+_STATUS_MUDOU_DE_CLASSE = " OR ".join(f"{delta} <> 0" for delta in _DELTAS_DO_STATUS)
+
+def gatilhos_resumo_mes_incremental():
+    """
+    Migração 10: como AJUSTAR_RESUMO_MES, cada linha gravada em ENTREGAS soma ou subtrai
+    a sua própria contribuição, sem reler o mês. CLIENTES_ATENDIDOS muda quando o
+    contador do cliente no mês (RESUMO_MES_CLIENTES) passa de 0 para 1 ou de 1 para 0.
+    """
+    comandos = [_remover_triggers("TRG_ENTREGAS_RESUMO_MES"), _remover_triggers("TRG_STATUS_RESUMO_MES", ("UPDATE",))]
+    comandos.append(_trigger("TRG_ENTREGAS_RESUMO_MES", "INSERT", "ENTREGAS", _ajustar_resumo_mes("NEW", 1)))
+    comandos.append(_trigger("TRG_ENTREGAS_RESUMO_MES", "DELETE", "ENTREGAS", _ajustar_resumo_mes("OLD", -1)))
+    # Alterações que não mudam nada do que é contado não tocam RESUMO_MES
+    comandos.append(_trigger("TRG_ENTREGAS_RESUMO_MES", "UPDATE", "ENTREGAS",
+            _ajustar_resumo_mes("OLD", -1) + _ajustar_resumo_mes("NEW", 1), quando=_MUDOU_O_QUE_O_MES_CONTA))
+
+    # Renomear um status só ajusta os agendamentos dele, e só se a classificação mudar
+    delta_feito, delta_retificado, delta_pendente = _DELTAS_DO_STATUS
+    ano, mes = _ano("e.DATA_VENCIMENTO"), _mes("e.DATA_VENCIMENTO")
+    comandos.append(_trigger("TRG_STATUS_RESUMO_MES", "UPDATE", "STATUS", f"""
+        INSERT INTO RESUMO_MES_CLIENTES (ANO, MES, CLIENTE_ID, CONCLUIDOS)
+        SELECT {ano}, {mes}, e.CLIENTE_ID, COUNT(*) * {delta_feito}
+        FROM ENTREGAS e WHERE e.STATUS_ID = NEW.ID AND {delta_feito} <> 0
+        GROUP BY 1, 2, 3
+        ON CONFLICT (ANO, MES, CLIENTE_ID) DO UPDATE SET CONCLUIDOS = CONCLUIDOS + excluded.CONCLUIDOS;
+        DELETE FROM RESUMO_MES_CLIENTES WHERE CONCLUIDOS <= 0;
+        INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+        SELECT {ano}, {mes}, COUNT(*) * {delta_feito}, COUNT(*) * {delta_retificado},
+               SUM(IIF(e.TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0)) * {delta_pendente}, 0
+        FROM ENTREGAS e WHERE e.STATUS_ID = NEW.ID
+        GROUP BY 1, 2{_SOMAR_RESUMO_MES}
+        UPDATE RESUMO_MES SET CLIENTES_ATENDIDOS =
+            (SELECT COUNT(*) FROM RESUMO_MES_CLIENTES c WHERE c.ANO = RESUMO_MES.ANO AND c.MES = RESUMO_MES.MES)
+        WHERE {delta_feito} <> 0 AND EXISTS (
+            SELECT 1 FROM ENTREGAS e WHERE e.STATUS_ID = NEW.ID
+            AND {ano} = RESUMO_MES.ANO AND {mes} = RESUMO_MES.MES);""",
+            quando=_STATUS_MUDOU_DE_CLASSE))
+
+    # O ON DELETE SET NULL é feito aqui, com o status ainda existente, para que
+    # TRG_ENTREGAS_RESUMO_MES_AU desconte os agendamentos que ele contava
+    comandos.append(_trigger("TRG_STATUS_RESUMO_MES_EXCLUSAO", "DELETE", "STATUS", """
+        UPDATE ENTREGAS SET STATUS_ID = NULL WHERE STATUS_ID = OLD.ID;""", momento="BEFORE"))
+    return "\n".join(comandos)
+
+def _parcela_resumo_mes(linha, sinal):
+    """Parcela (sinal 1 ou -1) da linha NEW/OLD de ENTREGAS, se o status dela conta para o painel."""
+    return f"""
+        INSERT INTO RESUMO_MES_PARCELAS (ANO, MES, CLIENTE_ID, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES)
+        SELECT {_ano(f"{linha}.DATA_VENCIMENTO")}, {_mes(f"{linha}.DATA_VENCIMENTO")}, {linha}.CLIENTE_ID,
+               {sinal} * FEITO, {sinal} * RETIFICADO, {sinal} * PENDENTE
+        FROM (SELECT {_e_feito('NOME')} AS FEITO, {_e_retificado('NOME')} AS RETIFICADO,
+                     IIF({linha}.TIPO_ATENDIMENTO = 'SOLICITADO', {_e_pendente('NOME')}, 0) AS PENDENTE
+              FROM STATUS WHERE ID = {linha}.STATUS_ID)
+        WHERE FEITO + RETIFICADO + PENDENTE > 0;"""
+
+def gatilhos_resumo_mes_parcelas():
+    """
+    Migração 14: como AJUSTAR_RESUMO_MES, cada gravação em ENTREGAS só insere parcelas
+    em RESUMO_MES_PARCELAS; renomear um status insere as diferenças dos agendamentos dele.
+    """
+    delta_feito, delta_retificado, delta_pendente = _DELTAS_DO_STATUS
+    ano, mes = _ano("e.DATA_VENCIMENTO"), _mes("e.DATA_VENCIMENTO")
+    return "\n".join([
+        _remover_triggers("TRG_ENTREGAS_RESUMO_MES"),
+        _remover_triggers("TRG_STATUS_RESUMO_MES", ("UPDATE",)),
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "INSERT", "ENTREGAS", _parcela_resumo_mes("NEW", 1)),
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "DELETE", "ENTREGAS", _parcela_resumo_mes("OLD", -1)),
+        _trigger("TRG_ENTREGAS_RESUMO_MES", "UPDATE", "ENTREGAS",
+                 _parcela_resumo_mes("OLD", -1) + _parcela_resumo_mes("NEW", 1), quando=_MUDOU_O_QUE_O_MES_CONTA),
+        _trigger("TRG_STATUS_RESUMO_MES", "UPDATE", "STATUS", f"""
+        INSERT INTO RESUMO_MES_PARCELAS (ANO, MES, CLIENTE_ID, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES)
+        SELECT {ano}, {mes}, e.CLIENTE_ID, COUNT(*) * {delta_feito}, COUNT(*) * {delta_retificado},
+               SUM(IIF(e.TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0)) * {delta_pendente}
+        FROM ENTREGAS e WHERE e.STATUS_ID = NEW.ID
+        GROUP BY 1, 2, 3;""", quando=_STATUS_MUDOU_DE_CLASSE),
+    ])
+
+#==============================================================================
+MOTORES = {BackendFirebird.nome: BackendFirebird(), BackendSQLite.nome: BackendSQLite()}
+
+def obter(nome):
+    """Retorna o motor pelo nome salvo nas configurações ('firebird' ou 'sqlite')."""
+    try:
+        return MOTORES[nome]
+    except KeyError:
+        raise ConnectionError(f"Motor de banco de dados desconhecido: {nome}")
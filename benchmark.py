@@ -0,0 +1,293 @@
+# benchmark.py
+# Mede o tempo das funções públicas de database.py em bancos sintéticos de
+# vários tamanhos (ver dados_sinteticos.py) e compara com uma base salva.
+# Roda só com o motor SQLite local: não precisa de servidor nem de rede.
+#
+# Uso:
+#   python benchmark.py                      # mede e compara com a base, se existir
+#   python benchmark.py --salvar-base        # mede e grava o resultado como nova base
+#   python benchmark.py --tamanhos 100,1000 --repeticoes 30 --funcoes get_resumo_mes,buscar_agendamentos_pagina
+# Sai com código 1 se alguma função ficar mais lenta que a base além da tolerância.
+import argparse
+import inspect
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from datetime import date, datetime, timedelta
+from PyQt5.QtCore import QDate
+import configuracoes
+import database
+import dados_sinteticos
+from instrumentacao import NAO_MEDIR
+
+DIFERENCA_MINIMA_MS = 0.05 # Abaixo disso a variação é ruído de medição, não regressão
+
+class Contexto:
+    """Dados do banco sintético usados como argumentos das funções medidas."""
+    def __init__(self):
+        hoje = date.today()
+        self.ano, self.mes = hoje.year, hoje.month
+        self.inicio_ano = date(hoje.year, 1, 1).isoformat()
+        self.fim_ano = date(hoje.year, 12, 31).isoformat()
+        inicio_mes, fim_mes = date(self.ano, self.mes, 1), (date(self.ano, self.mes, 28) + timedelta(days=4)).replace(day=1)
+        self.inicio_mes, self.fim_mes = inicio_mes.isoformat(), (fim_mes - timedelta(days=1)).isoformat()
+        # Dia mais movimentado do mês, como o usuário abriria no calendário
+        resumo = database.get_resumo_dias(inicio_mes, fim_mes)
+        self.dia = max(resumo, key=lambda d: resumo[d]['CONTAGEM'], default=inicio_mes).isoformat()
+
+        clientes = database.listar_clientes()
+        self.cliente = clientes[len(clientes) // 2]
+        self.clientes_para_excluir = [c['ID'] for c in clientes[len(clientes) * 3 // 4:]]
+        self.status_ids = [s['ID'] for s in database.listar_status()]
+        self.status_pendente = database.get_id_status_pendente()
+        self.entregas_do_dia = [e['ID'] for e in database.get_entregas_por_dia(self.dia).values()]
+        self.entregas_para_excluir = [ # Dos outros dias do mês, para não excluir as que atualizar_entrega usa
+            e['ID'] for dia in range(1, 29) if inicio_mes.replace(day=dia).isoformat() != self.dia
+            for e in database.get_entregas_por_dia(inicio_mes.replace(day=dia).isoformat()).values()
+        ]
+        self.termo = "padaria"
+        self.ids_busca = (database.buscar_ids_agendamentos(self.termo) or [])[:100]
+        self.contador = 0
+
+    def unico(self, prefixo):
+        """Nome ainda não usado (para cadastros com campo único)."""
+        self.contador += 1
+        return f"{prefixo}_{self.contador}_{int(time.time() * 1000) % 100000}"
+
+    def proxima(self, lista):
+        """Retira um id da lista (exclusões não podem repetir o registro)."""
+        return lista.pop() if lista else -1
+
+def _consumir(fluxo):
+    with fluxo as linhas:
+        return sum(1 for _ in linhas)
+
+def _agendamentos(ctx, quantidade):
+    return [{'data': date(ctx.ano + 1, 1 + i % 12, 10).isoformat(), 'hora': "09:00", 'cliente_id': ctx.cliente['ID'], 'obs': ""}
+            for i in range(quantidade)]
+
+def _criar_status(ctx):
+    nome = ctx.unico("Status")
+    database.adicionar_status(nome, "#123456", "benchmark")
+    return database.get_status_por_nome(nome)['ID']
+
+def _criar_usuario(ctx):
+    nome = ctx.unico("usuario")
+    database.criar_usuario(nome, "senha", False, "benchmark")
+    return database.get_usuario_por_nome(nome)['ID']
+
+# nome da função -> (executar(ctx, preparado), preparar(ctx) ou None). O que
+# 'preparar' faz (ex: criar o registro que será excluído) não entra no tempo.
+CASOS = {
+    # Versão e registro de alterações
+    'get_versao_dados': (lambda ctx, _: database.get_versao_dados(), None),
+    'get_ultimo_seq_alteracoes': (lambda ctx, _: database.get_ultimo_seq_alteracoes(), None),
+    'get_alteracoes_desde': (lambda ctx, _: database.get_alteracoes_desde(0), None),
+    'limpar_alteracoes_antigas': (lambda ctx, _: database.limpar_alteracoes_antigas(), None),
+    'compactar_resumos': (lambda ctx, _: database.compactar_resumos(), None),
+    'iniciar_db': (lambda ctx, _: database.iniciar_db(), None),
+    'registrar_log': (lambda ctx, _: database.registrar_log("benchmark", "BENCHMARK", "Entrada de teste."), None),
+    # Feriados
+    'adicionar_feriado': (lambda ctx, dia: database.adicionar_feriado(dia, "municipal"),
+                          lambda ctx: date(ctx.ano + 2, 1, 1 + ctx.contador % 28).isoformat()),
+    'remover_feriado': (lambda ctx, dia: database.remover_feriado(dia), lambda ctx: date(ctx.ano, 12, 25).isoformat()),
+    'get_feriados_do_mes': (lambda ctx, _: database.get_feriados_do_mes(ctx.ano, ctx.mes), None),
+    'is_dia_invalido': (lambda ctx, _: database.is_dia_invalido(QDate.fromString(ctx.dia, "yyyy-MM-dd")), None),
+    'is_dia_util': (lambda ctx, _: database.is_dia_util(date.fromisoformat(ctx.dia)), None),
+    'proximo_dia_util': (lambda ctx, _: database.proximo_dia_util(date(ctx.ano, 12, 24)), None),
+    'dias_uteis_entre': (lambda ctx, _: database.dias_uteis_entre(date.fromisoformat(ctx.inicio_ano), date.fromisoformat(ctx.fim_ano)), None),
+    # Status e usuários
+    'listar_status': (lambda ctx, _: database.listar_status(), None),
+    'get_status_por_id': (lambda ctx, _: database.get_status_por_id(ctx.status_pendente), None),
+    'get_status_por_nome': (lambda ctx, _: database.get_status_por_nome("Pendente"), None),
+    'get_id_status_pendente': (lambda ctx, _: database.get_id_status_pendente(), None),
+    'adicionar_status': (lambda ctx, nome: database.adicionar_status(nome, "#abcdef", "benchmark"), lambda ctx: ctx.unico("Status")),
+    'atualizar_status': (lambda ctx, status_id: database.atualizar_status(status_id, ctx.unico("Status"), "#654321", "benchmark"), _criar_status),
+    'deletar_status': (lambda ctx, status_id: database.deletar_status(status_id, "benchmark"), _criar_status),
+    'verificar_usuario': (lambda ctx, _: database.verificar_usuario("admin", "admin"), None),
+    'verificar_senha_usuario_atual': (lambda ctx, _: database.verificar_senha_usuario_atual("admin", "admin"), None),
+    'listar_usuarios': (lambda ctx, _: database.listar_usuarios(), None),
+    'get_usuario_por_nome': (lambda ctx, _: database.get_usuario_por_nome("admin"), None),
+    'get_admin_count': (lambda ctx, _: database.get_admin_count(), None),
+    'criar_usuario': (lambda ctx, nome: database.criar_usuario(nome, "senha", False, "benchmark"), lambda ctx: ctx.unico("usuario")),
+    'atualizar_usuario': (lambda ctx, user_id: database.atualizar_usuario(user_id, ctx.unico("usuario"), "nova", False, "benchmark"), _criar_usuario),
+    'deletar_usuario': (lambda ctx, user_id: database.deletar_usuario(user_id, "benchmark"), _criar_usuario),
+    # Clientes
+    'get_total_clientes': (lambda ctx, _: database.get_total_clientes(), None),
+    'listar_clientes': (lambda ctx, _: database.listar_clientes(), None),
+    'get_nomes_clientes': (lambda ctx, _: database.get_nomes_clientes(), None),
+    'get_cliente_por_id': (lambda ctx, _: database.get_cliente_por_id(ctx.cliente['ID']), None),
+    'adicionar_cliente': (lambda ctx, nome: database.adicionar_cliente(nome, "Nosso", "x@exemplo.com.br", True, False, "A", "", 1, "", "", "benchmark"),
+                          lambda ctx: ctx.unico("Cliente")),
+    'adicionar_clientes_em_lote': (lambda ctx, clientes: database.adicionar_clientes_em_lote(clientes, "benchmark"),
+                                   lambda ctx: [{'nome': ctx.unico("Lote"), 'tipo_envio': "Deles", 'contato': "lote@exemplo.com.br"} for _ in range(100)]),
+    'atualizar_cliente': (lambda ctx, c: database.atualizar_cliente(c['ID'], c['NOME'], c['TIPO_ENVIO'], c['CONTATO'], c['GERA_RECIBO'], c['CONTA_XMLS'], c['NIVEL'],
+                                                                   c['OUTROS_DETALHES'], c['NUMERO_COMPUTADORES'], c['TELEFONE1'], c['TELEFONE2'], "benchmark"),
+                          lambda ctx: ctx.cliente),
+    'deletar_cliente': (lambda ctx, cliente_id: database.deletar_cliente(cliente_id, "benchmark"), lambda ctx: ctx.proxima(ctx.clientes_para_excluir)),
+    'get_status_de_atividade_clientes': (lambda ctx, _: database.get_status_de_atividade_clientes(), None),
+    'verificar_agendamento_pendente_existente': (lambda ctx, _: database.verificar_agendamento_pendente_existente(ctx.cliente['ID']), None),
+    # Agendamentos
+    'get_entregas_por_dia': (lambda ctx, _: database.get_entregas_por_dia(ctx.dia), None),
+    'get_entregas_no_intervalo': (lambda ctx, _: database.get_entregas_no_intervalo(ctx.dia, "08:00", "12:00"), None),
+    'adicionar_entrega': (lambda ctx, _: database.adicionar_entrega(ctx.dia, "10:00", ctx.status_pendente, ctx.cliente['ID'], "benchmark", "", False, "benchmark"), None),
+    'atualizar_entrega': (lambda ctx, entrega_id: database.atualizar_entrega(entrega_id, "11:00", ctx.status_ids[1], ctx.cliente['ID'], "benchmark", "", False, "benchmark", 'AGENDADO'),
+                          lambda ctx: ctx.entregas_do_dia[ctx.contador % len(ctx.entregas_do_dia)] if ctx.entregas_do_dia else -1),
+    'deletar_entrega': (lambda ctx, entrega_id: database.deletar_entrega(entrega_id, "benchmark"), lambda ctx: ctx.proxima(ctx.entregas_para_excluir)),
+    'adicionar_entregas_em_lote': (lambda ctx, entregas: database.adicionar_entregas_em_lote(entregas),
+                                   lambda ctx: [{'data': a['data'], 'horario': a['hora'], 'status_id': ctx.status_pendente, 'cliente_id': a['cliente_id'],
+                                                 'responsavel': "benchmark", 'observacoes': ""} for a in _agendamentos(ctx, 12)]),
+    'criar_agendamentos_recorrentes': (lambda ctx, agendamentos: database.criar_agendamentos_recorrentes(agendamentos, "benchmark"),
+                                       lambda ctx: _agendamentos(ctx, 12)),
+    'limpar_agendamentos_futuros_pendentes': (lambda ctx, _: database.limpar_agendamentos_futuros_pendentes(ctx.cliente['ID'], "benchmark"), None),
+    'limpar_agendamentos_futuros_cliente': (lambda ctx, _: database.limpar_agendamentos_futuros_cliente(ctx.cliente['ID'], "benchmark"), None),
+    # Calendário e painel do mês
+    'get_resumo_mes': (lambda ctx, _: database.get_resumo_mes(ctx.ano, ctx.mes), None),
+    'get_resumo_dias': (lambda ctx, _: database.get_resumo_dias(ctx.inicio_mes, ctx.fim_mes), None),
+    'get_status_dias_para_mes': (lambda ctx, _: database.get_status_dias_para_mes(ctx.ano, ctx.mes), None),
+    'get_solicitados_do_mes': (lambda ctx, _: database.get_solicitados_do_mes(ctx.ano, ctx.mes), None),
+    'get_contagem_solicitados_do_mes': (lambda ctx, _: database.get_contagem_solicitados_do_mes(ctx.ano, ctx.mes), None),
+    'get_contagem_solicitados_pendentes_do_mes': (lambda ctx, _: database.get_contagem_solicitados_pendentes_do_mes(ctx.ano, ctx.mes), None),
+    'get_estatisticas_mensais': (lambda ctx, _: database.get_estatisticas_mensais(ctx.ano, ctx.mes), None),
+    'get_clientes_com_agendamento_no_mes': (lambda ctx, _: database.get_clientes_com_agendamento_no_mes(ctx.ano, ctx.mes), None),
+    'get_clientes_com_agendamento_concluido_no_mes': (lambda ctx, _: database.get_clientes_com_agendamento_concluido_no_mes(ctx.ano, ctx.mes), None),
+    # Relatórios
+    'get_entregas_filtradas': (lambda ctx, _: database.get_entregas_filtradas(ctx.inicio_ano, ctx.fim_ano, []), None),
+    'fluxo_entregas_filtradas': (lambda ctx, _: _consumir(database.fluxo_entregas_filtradas(ctx.inicio_ano, ctx.fim_ano, [])), None),
+    'existem_entregas_filtradas': (lambda ctx, _: database.existem_entregas_filtradas(ctx.inicio_ano, ctx.fim_ano, []), None),
+    'get_logs_filtrados': (lambda ctx, _: database.get_logs_filtrados(ctx.inicio_mes, ctx.fim_mes, "Todos"), None),
+    'fluxo_logs_filtrados': (lambda ctx, _: _consumir(database.fluxo_logs_filtrados(ctx.inicio_mes, ctx.fim_mes, "Todos")), None),
+    'existem_logs_filtrados': (lambda ctx, _: database.existem_logs_filtrados(ctx.inicio_mes, ctx.fim_mes, "Todos"), None),
+    'get_estatisticas_por_usuario_e_status': (lambda ctx, _: database.get_estatisticas_por_usuario_e_status(), None),
+    'get_estatisticas_cliente_periodo': (lambda ctx, _: database.get_estatisticas_cliente_periodo(ctx.cliente['ID'], ctx.inicio_ano, ctx.fim_ano), None),
+    'get_dados_ranking_clientes_periodo': (lambda ctx, _: database.get_dados_ranking_clientes_periodo(ctx.inicio_ano, ctx.fim_ano), None),
+    # Busca global
+    'atualizar_indice_busca': (lambda ctx, _: database.atualizar_indice_busca(), None),
+    'buscar_ids_agendamentos': (lambda ctx, _: database.buscar_ids_agendamentos(ctx.termo), None),
+    'get_agendamentos_por_ids': (lambda ctx, _: database.get_agendamentos_por_ids(ctx.ids_busca), None),
+    'buscar_agendamentos_globais': (lambda ctx, _: database.buscar_agendamentos_globais(ctx.termo), None),
+    'buscar_agendamentos_pagina': (lambda ctx, _: database.buscar_agendamentos_pagina(ctx.termo), None),
+    'contar_agendamentos_busca': (lambda ctx, _: database.contar_agendamentos_busca(ctx.termo), None),
+}
+
+def funcoes_sem_caso():
+    """Funções públicas de database.py que o benchmark ainda não mede (mesmo critério de instrumentacao.py)."""
+    return sorted(
+        nome for nome, funcao in vars(database).items()
+        if inspect.isfunction(funcao) and funcao.__module__ == database.__name__
+        and not nome.startswith('_') and nome not in NAO_MEDIR and nome not in CASOS
+    )
+
+def _percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)."""
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+def medir_tamanho(pasta, clientes, anos, semente, repeticoes, nomes):
+    """Gera (ou reaproveita) o banco do tamanho pedido e mede as funções 'nomes' numa cópia dele."""
+    original = os.path.join(pasta, f"sintetico_{clientes}c_{anos}a_s{semente}.sqlite3")
+    if not os.path.exists(original):
+        print(f"🆕 Gerando banco sintético com {clientes} clientes e {anos} anos...")
+        print(f"   {dados_sinteticos.gerar(original, clientes, anos, semente)}")
+    # As funções de escrita alteram o banco: cada execução mede uma cópia nova
+    copia = os.path.join(pasta, "execucao.sqlite3")
+    for sufixo in ('-wal', '-shm'):
+        if os.path.exists(copia + sufixo):
+            os.remove(copia + sufixo)
+    shutil.copyfile(original, copia)
+    dados_sinteticos.usar_banco(copia)
+    database.iniciar_db()
+    database.iniciar_escritor_auditoria() # Como no programa, os logs são gravados em segundo plano
+
+    try:
+        ctx = Contexto()
+        resultados = {}
+        for nome in nomes:
+            executar, preparar = CASOS[nome]
+            tempos = []
+            for i in range(repeticoes + 1):
+                preparado = preparar(ctx) if preparar else None
+                inicio = time.perf_counter()
+                executar(ctx, preparado)
+                if i > 0: # A primeira chamada só aquece caches e comandos preparados
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos.sort()
+            resultados[nome] = {'p50_ms': round(_percentil(tempos, 50), 4), 'p95_ms': round(_percentil(tempos, 95), 4)}
+        return resultados
+    finally:
+        database.parar_escritor_auditoria()
+        database.fechar_pool()
+
+def comparar(resultados, base, tolerancia):
+    """Imprime os tempos de cada tamanho ao lado da base. Retorna as regressões encontradas."""
+    regressoes = []
+    for tamanho, funcoes in resultados.items():
+        base_tamanho = base.get(tamanho, {})
+        print(f"\n=== {tamanho} clientes ===")
+        print(f"{'função':<46} {'p50 ms':>10} {'p95 ms':>10} {'base p50':>10} {'variação':>10}")
+        for nome, tempos in funcoes.items():
+            anterior = base_tamanho.get(nome)
+            coluna_base, variacao = "-", ""
+            if anterior:
+                coluna_base = f"{anterior['p50_ms']:.3f}"
+                razao = tempos['p50_ms'] / anterior['p50_ms'] if anterior['p50_ms'] else 1.0
+                variacao = f"{(razao - 1) * 100:+.0f}%"
+                if razao > 1 + tolerancia and tempos['p50_ms'] - anterior['p50_ms'] > DIFERENCA_MINIMA_MS:
+                    variacao += " ⚠️"
+                    regressoes.append((tamanho, nome, anterior['p50_ms'], tempos['p50_ms']))
+            print(f"{nome:<46} {tempos['p50_ms']:>10.3f} {tempos['p95_ms']:>10.3f} {coluna_base:>10} {variacao:>10}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das funções de database.py em bancos SQLite sintéticos.")
+    parser.add_argument('--tamanhos', default="100,500,2000", help="Quantidades de clientes, separadas por vírgula")
+    parser.add_argument('--anos', type=int, default=3, help="Anos de agendamentos em cada banco")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--funcoes', default="", help="Mede só estas funções (separadas por vírgula)")
+    parser.add_argument('--pasta', default="", help="Pasta dos bancos gerados (padrão: Data/benchmark)")
+    parser.add_argument('--base', default="", help="Arquivo JSON da base (padrão: Data/benchmark/base.json)")
+    parser.add_argument('--salvar-base', action='store_true', help="Grava o resultado desta execução como a nova base")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Aumento do p50 aceito antes de acusar regressão (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    pasta = args.pasta or os.path.join(database._pasta_dados(), "benchmark")
+    os.makedirs(pasta, exist_ok=True)
+    caminho_base = args.base or os.path.join(pasta, "base.json")
+    nomes = [n.strip() for n in args.funcoes.split(',') if n.strip()] or list(CASOS)
+    desconhecidas = [n for n in nomes if n not in CASOS]
+    if desconhecidas:
+        parser.error(f"Funções sem caso de benchmark: {', '.join(desconhecidas)}")
+    faltando = funcoes_sem_caso()
+    if faltando:
+        print(f"⚠️ Funções públicas de database.py sem caso de benchmark: {', '.join(faltando)}")
+
+    resultados = {}
+    try:
+        for clientes in (int(t) for t in args.tamanhos.split(',')):
+            resultados[str(clientes)] = medir_tamanho(pasta, clientes, args.anos, args.semente, args.repeticoes, nomes)
+    finally:
+        configuracoes.substituir({})
+
+    base = {}
+    if os.path.exists(caminho_base):
+        with open(caminho_base, encoding="utf-8") as f:
+            base = json.load(f).get('resultados', {})
+    regressoes = comparar(resultados, base, args.tolerancia)
+
+    if args.salvar_base:
+        with open(caminho_base, "w", encoding="utf-8") as f:
+            json.dump({'criado_em': datetime.now().isoformat(timespec='seconds'), 'anos': args.anos, 'semente': args.semente,
+                       'repeticoes': args.repeticoes, 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Base gravada em {caminho_base}")
+    elif regressoes:
+        print(f"\n❌ {len(regressoes)} regressões acima de {args.tolerancia:.0%} em relação à base:")
+        for tamanho, nome, antes, depois in regressoes:
+            print(f"   {nome} ({tamanho} clientes): {antes:.3f} ms -> {depois:.3f} ms")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# configuracoes.py
+import threading
+from PyQt5.QtCore import QSettings
+
+# Chaves lidas pelo programa e seus valores padrão. O tipo do padrão define
+# a conversão aplicada ao valor salvo (ex: porta e intervalos são inteiros).
+PADROES = {
+    "database/modo": "local",
+    "database/motor": "firebird", # Motor do modo local: "firebird" ou "sqlite" (ver backends.py)
+    "database/usuario": "sysdba",
+    "database/senha": "masterkey",
+    "database/caminho_local": "",
+    "database/host_remoto": "localhost",
+    "database/porta_remota": 3050,
+    "database/caminho_remoto": "",
+    "database/pool_tamanho": 5,
+    "database/pool_ocioso_segundos": 300,
+    "database/pool_verificacao_segundos": 30,
+    "database/cache_sql_tamanho": 64, # Comandos preparados guardados por conexão do pool
+    "horarios/modo": "automatico",
+    "horarios/hora_inicio": "08:30",
+    "horarios/hora_fim": "17:30",
+    "horarios/intervalo_minutos": 30,
+    "horarios/lista_manual": "09:00,10:00,11:00",
+    "geral/minutos_lembrete": 15,
+    "geral/refresh_intervalo_segundos": 30,
+    "geral/refresh_reserva_segundos": 300, # Intervalo do timer enquanto os avisos do banco estão ativos
+    "diagnostico/ativo": 0, # 1 liga a medição das funções de database.py (ver instrumentacao.py)
+    "diagnostico/limite_ms": 200, # Chamadas a partir deste tempo vão para o log de consultas lentas
+    "diagnostico/arquivo": "", # Vazio: Data/consultas_lentas.log
+    "diagnostico/tamanho_kb": 1024, # Tamanho de cada arquivo do log antes da rotação
+}
+
+class SnapshotConfiguracoes:
+    """
+    Cópia em memória das configurações salvas (registro/ini), lida uma única vez.
+    Os caminhos "quentes" do programa consultam este objeto em vez do QSettings.
+    """
+    def __init__(self):
+        settings = QSettings()
+        self._valores = {}
+        for chave, padrao in PADROES.items():
+            if chave in _substituicoes:
+                self._valores[chave] = _substituicoes[chave]
+            elif isinstance(padrao, int):
+                self._valores[chave] = settings.value(chave, padrao, type=int)
+            else:
+                self._valores[chave] = settings.value(chave, padrao)
+        self._derivados = {}
+
+    def __getitem__(self, chave):
+        return self._valores[chave]
+
+    def obter_derivado(self, nome, calcular):
+        """Calcula (uma vez por snapshot) um valor que depende apenas das configurações."""
+        if nome not in self._derivados:
+            self._derivados[nome] = calcular(self)
+        return self._derivados[nome]
+
+_snapshot = None
+_lock = threading.Lock()
+_ouvintes = []
+_substituicoes = {} # Valores que passam na frente dos salvos (ver substituir)
+
+def obter():
+    """Retorna o snapshot atual, carregando-o do armazenamento se necessário."""
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = SnapshotConfiguracoes()
+        return _snapshot
+
+def invalidar():
+    """
+    Descarta o snapshot atual. Deve ser chamada sempre que as configurações
+    forem gravadas (ex: ConfigDialog.salvar), para que a próxima leitura
+    reflita os novos valores.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = None
+        ouvintes = list(_ouvintes)
+    for callback in ouvintes:
+        callback()
+
+def ao_invalidar(callback):
+    """Registra uma função chamada sempre que o snapshot for invalidado."""
+    with _lock:
+        _ouvintes.append(callback)
+
+def substituir(valores):
+    """
+    Fixa valores que passam na frente dos salvos pelo usuário, sem gravá-los
+    (ex: benchmark.py apontando o programa para um banco de teste). Um
+    dicionário vazio volta a usar só os valores salvos.
+    """
+    global _substituicoes
+    with _lock:
+        _substituicoes = dict(valores)
+    invalidar()
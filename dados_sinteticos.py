@@ -0,0 +1,176 @@
+# dados_sinteticos.py
+# Gera um banco SQLite com volumes realistas (clientes, anos de agendamentos,
+# logs e feriados) para medir o desempenho de database.py (ver benchmark.py).
+# A carga passa pelas próprias funções de database.py, então os gatilhos de
+# RESUMO_DIA_PARCELAS, RESUMO_MES_PARCELAS, ALTERACOES e do índice de busca são exercitados.
+#
+# Uso: python dados_sinteticos.py CAMINHO.sqlite3 [--clientes 500] [--anos 3] [--semente 42]
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+import configuracoes
+import database
+
+# Proporções observadas na base real: a maioria dos atendimentos é agendada e
+# termina como "Feito e enviado"; os demais status são exceções
+PESOS_STATUS_CONCLUIDOS = [
+    ('Feito e enviado', 55), ('Feito', 25), ('Retificado', 5), ('Remarcado', 5),
+    ('Chamado', 4), ('Houve Algum Erro', 3), ('Realocado', 3),
+]
+PROPORCAO_SOLICITADOS = 0.15    # TIPO_ATENDIMENTO = 'SOLICITADO'
+PROPORCAO_RETIFICACOES = 0.05   # Atendimentos extras de retificação no mesmo mês
+PROPORCAO_PENDENTES_PASSADOS = 0.02 # Pendentes esquecidos em datas passadas
+HORARIOS = [f"{h:02d}:{m:02d}" for h in range(8, 18) for m in (0, 30)][1:] # 08:30 a 17:30, como o modo automático
+FERIADOS_NACIONAIS = [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25)]
+RESPONSAVEIS = ['admin', 'ana', 'bruno', 'carla', 'diego']
+ACOES_LOG = ['CRIAR_AGENDAMENTO', 'ATUALIZAR_AGENDAMENTO', 'ATUALIZAR_AGENDAMENTO', 'CRIAR_RECORRENCIA']
+TAMANHO_LOTE = 5000
+
+_PREFIXOS = ['Padaria', 'Mercado', 'Farmácia', 'Auto Peças', 'Loja', 'Distribuidora', 'Restaurante', 'Papelaria', 'Ótica', 'Materiais de Construção']
+_NOMES = ['São João', 'Boa Vista', 'Santa Luzia', 'Central', 'Do Povo', 'Nova Era', 'Bom Preço', 'Real', 'Estrela', 'Primavera', 'Aliança', 'Progresso']
+_OBSERVACOES = ['', '', '', 'Cliente pediu retorno por telefone', 'Enviar XMLs junto', 'Aguardando senha do certificado',
+                'Conferir notas canceladas', 'Contador vai buscar', 'Remarcado a pedido do cliente', 'Arquivo enviado por e-mail']
+
+def usar_banco(caminho):
+    """Aponta database.py para o banco SQLite em 'caminho' (sem alterar as configurações salvas)."""
+    configuracoes.substituir({
+        "database/modo": "local",
+        "database/motor": "sqlite",
+        "database/caminho_local": os.path.abspath(caminho),
+    })
+
+def _dia_util(dia, feriados):
+    while dia.weekday() >= 5 or dia in feriados:
+        dia += timedelta(days=1)
+    return dia
+
+def _gerar_feriados(rnd, anos):
+    feriados = {}
+    for ano in anos:
+        for mes, dia in FERIADOS_NACIONAIS:
+            feriados[date(ano, mes, dia)] = 'nacional'
+        for _ in range(3):
+            feriados.setdefault(date(ano, rnd.randint(1, 12), rnd.randint(1, 28)), 'municipal')
+    return feriados
+
+def _gerar_clientes(rnd, quantidade):
+    clientes = []
+    for i in range(quantidade):
+        nome = f"{rnd.choice(_PREFIXOS)} {rnd.choice(_NOMES)} {i + 1}"
+        clientes.append({
+            'nome': nome,
+            'tipo_envio': rnd.choice(["Nosso", "Nosso", "Deles"]),
+            'contato': f"contato{i + 1}@exemplo.com.br",
+            'gera_recibo': rnd.random() < 0.6,
+            'conta_xmls': rnd.random() < 0.3,
+            'nivel': rnd.choice(['A', 'B', 'C']),
+            'detalhes': rnd.choice(_OBSERVACOES),
+            'numero_computadores': rnd.randint(1, 12),
+            'telefone1': f"(11) 9{rnd.randint(1000, 9999)}-{rnd.randint(1000, 9999)}",
+            'telefone2': '',
+        })
+    return clientes
+
+def _gerar_entregas(rnd, cliente_ids, meses, feriados, status_ids, hoje):
+    """Uma entrega por cliente por mês (mais retificações), com status de acordo com a data."""
+    nomes_concluidos, pesos = zip(*PESOS_STATUS_CONCLUIDOS)
+    for cliente_id in cliente_ids:
+        dia_preferido = rnd.randint(1, 25) # Cada cliente costuma entregar no mesmo dia do mês
+        horario_preferido = rnd.choice(HORARIOS)
+        for ano, mes in meses:
+            datas = [date(ano, mes, dia_preferido)]
+            if rnd.random() < PROPORCAO_RETIFICACOES:
+                datas.append(date(ano, mes, rnd.randint(1, 28)))
+            for indice, dia in enumerate(datas):
+                dia = _dia_util(dia, feriados)
+                horario = horario_preferido if rnd.random() < 0.7 else rnd.choice(HORARIOS)
+                if dia >= hoje or rnd.random() < PROPORCAO_PENDENTES_PASSADOS:
+                    status = 'Pendente'
+                else:
+                    status = rnd.choices(nomes_concluidos, pesos)[0]
+                conclusao = None
+                if 'feito' in status.lower() or 'retificado' in status.lower():
+                    hora, minuto = map(int, horario.split(':'))
+                    conclusao = datetime(dia.year, dia.month, dia.day, hora, minuto) + timedelta(minutes=rnd.randint(10, 240))
+                yield (dia, horario, status_ids[status], cliente_id, rnd.choice(RESPONSAVEIS), rnd.choice(_OBSERVACOES),
+                       1 if indice > 0 else 0, 'SOLICITADO' if rnd.random() < PROPORCAO_SOLICITADOS else 'AGENDADO', conclusao)
+
+def _inserir_em_lotes(sql, linhas):
+    total = 0
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= TAMANHO_LOTE:
+            with database.transacao() as trans:
+                trans.cursor().executemany(sql, lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        with database.transacao() as trans:
+            trans.cursor().executemany(sql, lote)
+        total += len(lote)
+    return total
+
+def gerar(caminho, clientes=500, anos=3, semente=42, logs_por_entrega=2, hoje=None):
+    """
+    Cria (ou recria) em 'caminho' um banco SQLite com 'clientes' clientes e 'anos'
+    anos de agendamentos terminando no fim do ano corrente, além de logs e feriados.
+    A mesma 'semente' gera sempre os mesmos dados. Deixa database.py apontado para
+    o banco criado. Retorna a quantidade de registros gerados por tabela.
+    """
+    rnd = random.Random(semente)
+    hoje = hoje or date.today()
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    usar_banco(caminho)
+    database.iniciar_db()
+
+    inicio = time.perf_counter()
+    lista_anos = range(hoje.year - anos + 1, hoje.year + 1)
+    meses = [(ano, mes) for ano in lista_anos for mes in range(1, 13)]
+
+    feriados = _gerar_feriados(rnd, lista_anos)
+    for dia, tipo in feriados.items():
+        database.adicionar_feriado(dia.isoformat(), tipo)
+
+    for nome in RESPONSAVEIS[1:]:
+        database.criar_usuario(nome, nome, False, 'admin')
+
+    importados, _ = database.adicionar_clientes_em_lote(_gerar_clientes(rnd, clientes), 'admin')
+    cliente_ids = [c['ID'] for c in database.listar_clientes()]
+    status_ids = {s['NOME']: s['ID'] for s in database.listar_status()}
+
+    total_entregas = _inserir_em_lotes(
+        "INSERT INTO ENTREGAS (DATA_VENCIMENTO, HORARIO, STATUS_ID, CLIENTE_ID, RESPONSAVEL, OBSERVACOES, IS_RETIFICACAO, TIPO_ATENDIMENTO, DATA_CONCLUSAO) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        _gerar_entregas(rnd, cliente_ids, meses, feriados, status_ids, hoje)
+    )
+
+    def logs():
+        primeiro_dia = date(lista_anos[0], 1, 1)
+        dias = (hoje - primeiro_dia).days # Logs só até hoje
+        for _ in range(total_entregas * logs_por_entrega):
+            datahora = datetime.combine(primeiro_dia + timedelta(days=rnd.randint(0, dias)), datetime.min.time()) + timedelta(seconds=rnd.randint(8 * 3600, 18 * 3600))
+            acao = rnd.choice(ACOES_LOG)
+            yield (datahora, rnd.choice(RESPONSAVEIS), acao, f"{acao} cliente ID {rnd.choice(cliente_ids)}.")
+    total_logs = _inserir_em_lotes("INSERT INTO LOGS (DATAHORA, USUARIO_NOME, ACAO, DETALHES) VALUES (?, ?, ?, ?)", logs())
+
+    indexados = database.atualizar_indice_busca()
+    database.limpar_alteracoes_antigas(dias=0) # A carga não é uma alteração que as telas precisem ver
+    database.compactar_resumos()
+    database.fechar_pool()
+    print(f"✅ Banco sintético gerado em {time.perf_counter() - inicio:.1f} s: {caminho}")
+    return {'CLIENTES': importados, 'ENTREGAS': total_entregas, 'LOGS': total_logs, 'FERIADOS': len(feriados), 'INDEXADOS': indexados}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite com dados sintéticos do Agendador.")
+    parser.add_argument('caminho', help="Arquivo .sqlite3 a criar (substituído se existir)")
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--logs-por-entrega', type=int, default=2)
+    args = parser.parse_args()
+    print(gerar(args.caminho, args.clientes, args.anos, args.semente, args.logs_por_entrega))
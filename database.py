@@ -1,26 +1,49 @@
 # database.py — Versão FINAL completa com conexão dinâmica e campo de retificação
-import fdb
+import bisect
+import collections.abc
+import contextlib
 import hashlib
 import os
+import queue
+import re
 import sys
-from datetime import datetime
-from PyQt5.QtCore import QSettings,QDate # Importa a classe para ler as configurações
+import threading
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from PyQt5.QtCore import QDate
+import configuracoes # Snapshot em memória das configurações salvas pelo usuário
+import backends # Motores de banco (Firebird e SQLite)
+from backends import ErroBanco
 
 #==============================================================================
 # FUNÇÕES DE CONEXÃO E INICIALIZAÇÃO
 #==============================================================================
 
-def conectar():
+def _pasta_dados():
+    """Pasta 'Data' ao lado do executável (PyInstaller) ou do script, criada se não existir."""
+    if getattr(sys, 'frozen', False):  # Se for executável compilado (PyInstaller)
+        base_path = os.path.dirname(sys.executable)
+    else:  # Se estiver rodando como script .py
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    data_folder = os.path.join(base_path, 'Data')
+    os.makedirs(data_folder, exist_ok=True)
+    return data_folder
+
+def _parametros_conexao():
     """
-    Conecta ao banco de dados Firebird lendo as configurações salvas pelo usuário
-    (local ou remoto). Inclui tratamento de erro aprimorado.
+    Lê as configurações salvas pelo usuário (local ou remoto) e devolve os
+    parâmetros de conexão. No modo local, cria o banco se ele ainda não existir.
+    O motor ('firebird' ou 'sqlite', ver backends.py) só pode ser escolhido no
+    modo local; o modo remoto é sempre um servidor Firebird.
     """
-    settings = QSettings()
+    settings = configuracoes.obter()
     
     # --- Carrega as configurações salvas ---
-    modo = settings.value("database/modo", "local")
-    user = settings.value("database/usuario", "sysdba")
-    password = settings.value("database/senha", "masterkey")
+    modo = settings["database/modo"]
+    motor = settings["database/motor"] if modo == "local" else "firebird"
+    user = settings["database/usuario"]
+    password = settings["database/senha"]
     
     host = ""
     port = 0
@@ -30,170 +53,1223 @@ def conectar():
         host = "localhost"
         port = 3050 # Porta padrão para Firebird local
 
-        # --- INÍCIO DA CORREÇÃO ---
-        
         # 1. Tenta carregar o caminho salvo nas configurações pelo usuário
-        database_path = settings.value("database/caminho_local", "")
+        database_path = settings["database/caminho_local"]
 
-        # 2. Se nenhum caminho foi salvo (string vazia), usa a lógica antiga como PADRÃO.
+        # 2. Se nenhum caminho foi salvo (string vazia), usa o arquivo padrão na pasta 'Data'.
         #    Isso mantém o comportamento de criar um banco automático na primeira vez.
         if not database_path:
             print(" Nenhum caminho de banco de dados local configurado. Usando caminho padrão.")
-            # Determina o caminho base (onde o executável ou script está)
-            if getattr(sys, 'frozen', False):  # Se for executável compilado (PyInstaller)
-                base_path = os.path.dirname(sys.executable)
-            else:  # Se estiver rodando como script .py
-                base_path = os.path.dirname(os.path.abspath(__file__))
-
-            # Constrói o caminho para a pasta 'Data'
-            data_folder = os.path.join(base_path, 'Data')
-
-            # Cria a pasta 'Data' se ela não existir
-            os.makedirs(data_folder, exist_ok=True)
-
-            # Define o caminho completo e final para o arquivo do banco de dados
-            database_path = os.path.join(data_folder, 'CALENDARIO.FDB')
-        
-        # 3. A lógica de criação do banco de dados agora usará o caminho correto
-        #    (seja o que veio das configurações ou o padrão)
-        if not os.path.exists(database_path):
-            print(f"🆕 Criando banco de dados local em: {database_path}")
-            fdb.create_database(dsn=f"{host}/{port}:{database_path}", user=user, password=password)
-        
-        # --- FIM DA CORREÇÃO ---
+            nome_arquivo = 'CALENDARIO.sqlite3' if motor == "sqlite" else 'CALENDARIO.FDB'
+            database_path = os.path.join(_pasta_dados(), nome_arquivo)
 
     else: # modo == "remoto"
-        host = settings.value("database/host_remoto", "localhost")
-        port = settings.value("database/porta_remota", 3050, type=int)
-        database_path = settings.value("database/caminho_remoto", "")
+        host = settings["database/host_remoto"]
+        port = settings["database/porta_remota"]
+        database_path = settings["database/caminho_remoto"]
         if not host or not database_path:
             raise ConnectionError("Configuração remota incompleta: Host ou Caminho do banco não definido.")
 
-    # --- Tenta conectar com as configurações carregadas ---
-    print(f"Conectando ao banco ({modo}): {host}:{port}/{database_path}")
+    params = {
+        'motor': motor, 'modo': modo, 'host': host, 'port': port, 'database': database_path,
+        'user': user, 'password': password,
+        'pool_tamanho': settings["database/pool_tamanho"],
+        'pool_ocioso_segundos': settings["database/pool_ocioso_segundos"],
+        'pool_verificacao_segundos': settings["database/pool_verificacao_segundos"],
+        'cache_sql_tamanho': settings["database/cache_sql_tamanho"],
+    }
+
+    # 3. Cria o banco local no caminho definido (seja o das configurações ou o padrão)
+    if modo == "local" and not os.path.exists(database_path):
+        print(f"🆕 Criando banco de dados local em: {database_path}")
+        backends.obter(motor).criar_banco(params)
+
+    return params
+
+def _abrir_conexao(params):
+    """Abre uma conexão nova com o motor configurado (usada pelo pool e por abrir_conexao_dedicada)."""
+    if params['motor'] == "sqlite":
+        print(f"Conectando ao banco (sqlite): {params['database']}")
+    else:
+        print(f"Conectando ao banco ({params['modo']}): {params['host']}:{params['port']}/{params['database']}")
     try:
-        return fdb.connect(
-            host=host,
-            port=port,
-            database=database_path,
-            user=user,
-            password=password,
-            charset='UTF8'
-        )
-    except fdb.Error as e:
+        return backends.obter(params['motor']).conectar(params)
+    except ErroBanco as e:
         print(f"❌ Erro crítico ao conectar ao banco de dados: {e}")
         raise
-    
+
+def abrir_conexao_dedicada():
+    """
+    Abre uma conexão fora do pool, para usos que a prendem por muito tempo
+    (ex: a escuta de eventos em notificacoes.py). Quem abre deve fechá-la.
+    """
+    return _abrir_conexao(_parametros_conexao())
+
+def motor_atual():
+    """Retorna o motor (backends.Backend) definido nas configurações salvas."""
+    settings = configuracoes.obter()
+    return backends.obter(settings["database/motor"] if settings["database/modo"] == "local" else "firebird")
+
+def suporta_eventos():
+    """Indica se o motor atual avisa alterações feitas por outros computadores (notificacoes.py)."""
+    return motor_atual().suporta_eventos
+
+#==============================================================================
+# POOL DE CONEXÕES
+#==============================================================================
+class ConexaoPool:
+    """
+    Conexão emprestada pelo pool. Repassa tudo para a conexão original do driver,
+    mas close() devolve a conexão ao pool em vez de encerrá-la.
+    Guarda também os comandos preparados por executar(), que sobrevivem
+    enquanto a conexão física estiver aberta.
+    Emprestada por conectar_leitura(), 'somente_leitura' fica ligado e os
+    cursores passam a usar a transação de leitura da conexão (ver _leitura).
+    """
+    def __init__(self, pool, conexao):
+        self._pool = pool
+        self._conexao = conexao
+        self._preparados = collections.OrderedDict() # (somente_leitura, SQL) -> (cursor, PreparedStatement), do menos ao mais recente
+        self._transacao_leitura = None
+        self.somente_leitura = False
+        self.ultimo_uso = time.monotonic()
+        self.ultima_verificacao = self.ultimo_uso
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def cursor(self):
+        if self.somente_leitura:
+            return self._leitura().cursor()
+        return self._conexao.cursor()
+
+    def _leitura(self):
+        # Transação READ COMMITTED somente leitura, aberta uma vez e mantida
+        # enquanto a conexão física existir. O Firebird já inicia esse tipo de
+        # transação como "confirmada": ela não segura a coleta de versões antigas
+        # (OIT/OAT), então pode ficar aberta e cada comando vê o último commit.
+        if self._transacao_leitura is None:
+            self._transacao_leitura = self._pool.backend.transacao_leitura(self._conexao)
+        return self._transacao_leitura
+
+    def executar(self, sql, params=()):
+        """
+        Executa 'sql' reaproveitando o comando já preparado nesta conexão (o
+        servidor não refaz parse/plano) e devolve o cursor para os fetch.
+        Cada texto de SQL tem um cursor próprio no cache: leia o resultado antes
+        de executar o mesmo SQL de novo. Use com SQL de texto fixo; SQL montado
+        com valores (ex: listas IN) apenas ocuparia o cache.
+        """
+        chave = (self.somente_leitura, sql)
+        preparado = self._preparados.pop(chave, None)
+        if preparado is None:
+            cur = self.cursor()
+            preparado = (cur, cur.prep(sql))
+            while len(self._preparados) >= self._pool.tamanho_cache_sql:
+                self._descartar_preparado(self._preparados.popitem(last=False)[1])
+        self._preparados[chave] = preparado
+        cur, comando = preparado
+        cur.execute(comando, params)
+        return cur
+
+    def _descartar_preparado(self, preparado):
+        try:
+            preparado[0].close()
+        except ErroBanco:
+            pass
+
+    def close(self):
+        self._pool.devolver(self)
+
+    def _encerrar(self):
+        while self._preparados:
+            self._descartar_preparado(self._preparados.popitem()[1])
+        try:
+            if self._transacao_leitura is not None:
+                self._transacao_leitura.close()
+            self._conexao.close()
+        except ErroBanco:
+            pass
+
+class PoolConexoes:
+    """
+    Mantém conexões com o banco "aquecidas" para reaproveitamento.
+    - tamanho: número máximo de conexões abertas ao mesmo tempo;
+    - tempo_ocioso: conexões paradas há mais tempo que isso são fechadas;
+    - intervalo_verificacao: conexões paradas há mais tempo que isso passam
+      por um teste rápido antes de serem entregues (e são reabertas se falharem);
+    - tamanho_cache_sql: comandos preparados mantidos por conexão (ConexaoPool.executar).
+    """
+    SQL_VERIFICACAO = "SELECT 1 FROM RDB$DATABASE"
+
+    def __init__(self, fabrica, backend, tamanho=5, tempo_ocioso=300, intervalo_verificacao=30, tamanho_cache_sql=64):
+        self._fabrica = fabrica
+        self.backend = backend
+        self.tamanho = max(1, tamanho)
+        self.tempo_ocioso = tempo_ocioso
+        self.intervalo_verificacao = intervalo_verificacao
+        self.tamanho_cache_sql = max(1, tamanho_cache_sql)
+        self._livres = collections.deque()
+        self._total = 0
+        self._fechado = False
+        self._cond = threading.Condition()
+
+    def obter(self, timeout=30):
+        limite = time.monotonic() + timeout
+        with self._cond:
+            self._descartar_ociosas()
+            while True:
+                if self._fechado:
+                    raise ConnectionError("O pool de conexões foi encerrado.")
+                if self._livres:
+                    conexao = self._livres.pop() # LIFO: a mais recente é a mais "quente"
+                    break
+                if self._total < self.tamanho:
+                    self._total += 1
+                    conexao = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise ConnectionError("Tempo esgotado aguardando uma conexão livre no pool.")
+                self._cond.wait(restante)
+
+        if conexao is None:
+            return self._nova_conexao()
+        if not self._conexao_saudavel(conexao):
+            print("🔁 Conexão do pool inválida. Reconectando...")
+            conexao._encerrar()
+            return self._nova_conexao()
+        return conexao
+
+    def devolver(self, conexao):
+        # Descarta qualquer transação esquecida aberta para o próximo usuário começar limpo
+        try:
+            saudavel = not conexao._conexao.closed
+            if saudavel:
+                conexao._conexao.rollback()
+        except ErroBanco:
+            saudavel = False
+        if not saudavel:
+            conexao._encerrar()
+            self._liberar_vaga()
+            return
+        conexao.somente_leitura = False
+
+        with self._cond:
+            if self._fechado:
+                conexao._encerrar()
+                self._total -= 1
+            else:
+                conexao.ultimo_uso = time.monotonic()
+                self._livres.append(conexao)
+            self._cond.notify()
+
+    def fechar(self):
+        """Encerra todas as conexões livres; as emprestadas são fechadas ao serem devolvidas."""
+        with self._cond:
+            self._fechado = True
+            while self._livres:
+                self._livres.pop()._encerrar()
+                self._total -= 1
+            self._cond.notify_all()
+
+    def _nova_conexao(self):
+        try:
+            conexao = ConexaoPool(self, self._fabrica())
+        except Exception:
+            self._liberar_vaga()
+            raise
+        return conexao
+
+    def _liberar_vaga(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _conexao_saudavel(self, conexao):
+        agora = time.monotonic()
+        if conexao._conexao.closed:
+            return False
+        if agora - conexao.ultima_verificacao < self.intervalo_verificacao:
+            return True
+        try:
+            cur = conexao._conexao.cursor()
+            cur.execute(self.SQL_VERIFICACAO)
+            cur.fetchone()
+            conexao._conexao.rollback()
+        except ErroBanco as e:
+            print(f"⚠️ Falha na verificação de conexão do pool: {e}")
+            return False
+        conexao.ultima_verificacao = agora
+        return True
+
+    def _descartar_ociosas(self):
+        # Chamado com o lock adquirido. As mais antigas ficam no início da fila.
+        agora = time.monotonic()
+        while self._livres and agora - self._livres[0].ultimo_uso > self.tempo_ocioso:
+            self._livres.popleft()._encerrar()
+            self._total -= 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            params = _parametros_conexao()
+            _pool = PoolConexoes(
+                lambda: _abrir_conexao(params),
+                backends.obter(params['motor']),
+                tamanho=params['pool_tamanho'],
+                tempo_ocioso=params['pool_ocioso_segundos'],
+                intervalo_verificacao=params['pool_verificacao_segundos'],
+                tamanho_cache_sql=params['cache_sql_tamanho']
+            )
+        return _pool
+
+def conectar():
+    """
+    Empresta uma conexão do pool (criando-o a partir das configurações salvas
+    pelo usuário, local ou remoto). Chamar close() na conexão a devolve ao pool.
+    """
+    return _obter_pool().obter()
+
+def conectar_leitura():
+    """
+    Como conectar(), para funções que apenas consultam: os cursores usam a
+    transação READ COMMITTED somente leitura compartilhada da conexão, que não
+    prende versões antigas de registros no servidor. Gravações continuam em
+    transacao(), com transações curtas de escrita.
+    """
+    conexao = _obter_pool().obter()
+    conexao.somente_leitura = True
+    return conexao
+
+def fechar_pool():
+    """
+    Encerra as conexões do pool. Deve ser chamada ao fechar o programa; também é
+    chamada quando as configurações mudam, para que o próximo conectar() use os
+    novos parâmetros.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+        _pool = None
+
+configuracoes.ao_invalidar(fechar_pool)
+
+#==============================================================================
+# TRANSAÇÕES (UNIDADE DE TRABALHO)
+#==============================================================================
+_contexto = threading.local()
+
+class UnidadeDeTrabalho:
+    """
+    Transação em andamento: todas as escritas feitas dentro dela (inclusive o
+    registro em LOGS) usam a mesma conexão e são confirmadas com um único commit.
+    """
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self._apos_confirmar = []
+
+    def cursor(self):
+        return self.conexao.cursor()
+
+    def apos_confirmar(self, callback):
+        """Agenda uma função para rodar somente depois do commit da unidade mais externa."""
+        self._apos_confirmar.append(callback)
+
+def transacao_ativa():
+    """Retorna a unidade de trabalho aberta na thread atual, ou None."""
+    return getattr(_contexto, 'unidade', None)
+
+@contextlib.contextmanager
+def transacao(alterar_versao=True):
+    """
+    Abre uma unidade de trabalho. Uso:
+
+        with database.transacao():
+            database.adicionar_entrega(...)
+            database.deletar_entrega(...)
+
+    Se já existir uma unidade aberta na thread, a nova chamada se junta a ela:
+    nada é confirmado até o bloco mais externo terminar. Qualquer exceção
+    desfaz tudo com um único rollback.
+    Após o commit, a versão dos dados é incrementada (ver get_versao_dados);
+    gravações que não mudam o que as telas mostram (ex: LOGS) passam alterar_versao=False.
+    Funções que tratam o próprio erro de banco (imprimem e devolvem um valor
+    padrão) só podem fazê-lo quando abriram a transação: dentro de uma unidade
+    maior elas repassam o erro, para que a unidade inteira seja desfeita.
+    """
+    atual = transacao_ativa()
+    if atual is not None:
+        yield atual
+        return
+
+    conn = conectar()
+    unidade = UnidadeDeTrabalho(conn)
+    _contexto.unidade = unidade
+    try:
+        yield unidade
+        conn.commit()
+        if alterar_versao:
+            _incrementar_versao_dados(conn)
+            _avisar_indexador_busca()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _contexto.unidade = None
+        conn.close()
+
+    for callback in unidade._apos_confirmar:
+        callback()
+
+#==============================================================================
+# VERSÃO DOS DADOS
+#==============================================================================
+# GEN_VERSAO_DADOS avança a cada alteração em ENTREGAS, CLIENTES, STATUS e FERIADOS.
+# Os triggers da migração 4 cobrem gravações feitas por fora do programa, mas
+# rodam ANTES do commit (generators não são transacionais): quem lesse a versão
+# nesse intervalo a guardaria junto com dados antigos. Por isso transacao()
+# também incrementa o generator logo DEPOIS de confirmar.
+def _incrementar_versao_dados(conn):
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT GEN_ID(GEN_VERSAO_DADOS, 1) FROM RDB$DATABASE")
+        cur.fetchone()
+    except ErroBanco as e:
+        # Os dados já foram confirmados; no pior caso as telas demoram um ciclo a mais
+        print(f"Erro ao incrementar a versão dos dados: {e}")
+
+def get_versao_dados():
+    """Retorna o número da versão atual dos dados (consulta de uma linha, sem ler tabelas)."""
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.executar("SELECT GEN_ID(GEN_VERSAO_DADOS, 0) FROM RDB$DATABASE")
+        return cur.fetchone()[0]
+    finally:
+        if conn: conn.close()
+
+#==============================================================================
+# REGISTRO DE ALTERAÇÕES (ALTERACOES)
+#==============================================================================
+# Os triggers da migração 6 gravam uma linha em ALTERACOES para cada linha
+# inserida/alterada/excluída em ENTREGAS, FERIADOS, CLIENTES e STATUS. Assim as
+# telas descobrem O QUE mudou (e em que data) sem reler tudo.
+def get_ultimo_seq_alteracoes():
+    """Retorna o número da última alteração registrada."""
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.executar("SELECT GEN_ID(GEN_ALTERACOES_ID, 0) FROM RDB$DATABASE")
+        return cur.fetchone()[0]
+    finally:
+        if conn: conn.close()
+
+def get_alteracoes_desde(seq, limite=1000):
+    """
+    Retorna até 'limite' alterações com número maior que 'seq', em ordem, como
+    dicionários com SEQ, ENTIDADE, ENTIDADE_ID, OPERACAO ('I', 'U' ou 'D') e DATA_REF
+    (data do agendamento/feriado afetado; None para CLIENTES e STATUS).
+    """
+    sql = """
+        SELECT FIRST ? ID AS SEQ, ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF
+        FROM ALTERACOES
+        WHERE ID > ?
+        ORDER BY ID
+    """
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (limite, seq))
+        return linhas_do_cursor(cur)
+    finally:
+        if conn: conn.close()
+
+def limpar_alteracoes_antigas(dias=7):
+    """Apaga do registro as alterações com mais de 'dias' dias."""
+    sql = "DELETE FROM ALTERACOES WHERE DATAHORA < ?"
+    try:
+        with transacao(alterar_versao=False) as trans:
+            trans.cursor().execute(sql, (datetime.now() - timedelta(days=dias),))
+    except ErroBanco as e:
+        if transacao_ativa() is not None:
+            raise
+        print(f"Erro ao limpar o registro de alterações: {e}")
+
+class LeitorAlteracoes:
+    """
+    Acompanha ALTERACOES a partir do momento da criação, entregando cada alteração uma única vez.
+    Os números são gerados antes do commit, então uma transação mais lenta pode
+    confirmar um número MENOR que outro já lido. Por isso cada leitura volta
+    'sobreposicao' números e descarta os que já foram entregues.
+    """
+    def __init__(self, sobreposicao=200):
+        self.sobreposicao = sobreposicao
+        self.ultimo_seq = get_ultimo_seq_alteracoes()
+        self._entregues = set()
+
+    def novas(self):
+        """Retorna as alterações ainda não entregues (lista de dicionários, ver get_alteracoes_desde)."""
+        inicio = max(0, self.ultimo_seq - self.sobreposicao)
+        limite = 1000
+        novas = []
+        while True:
+            lote = get_alteracoes_desde(inicio, limite)
+            novas.extend(a for a in lote if a['SEQ'] not in self._entregues)
+            if len(lote) < limite:
+                break
+            inicio = lote[-1]['SEQ']
+        for alteracao in novas:
+            self._entregues.add(alteracao['SEQ'])
+            self.ultimo_seq = max(self.ultimo_seq, alteracao['SEQ'])
+        piso = self.ultimo_seq - self.sobreposicao
+        self._entregues = {seq for seq in self._entregues if seq > piso}
+        return novas
+
+#==============================================================================
+# INICIALIZAÇÃO DO BANCO
+#==============================================================================
 def tabela_existe(cur, nome_tabela):
-    cur.execute("SELECT RDB$RELATION_NAME FROM RDB$RELATIONS WHERE RDB$RELATION_NAME = ?", (nome_tabela.upper(),))
-    return cur.fetchone() is not None
+    return motor_atual().tabela_existe(cur, nome_tabela)
 
 def criar_generator_e_trigger(cur, tabela):
-    gen_name = f"GEN_{tabela}_ID"
-    trg_name = f"TRG_{tabela}_BI"
-    cur.execute(f"SELECT RDB$GENERATOR_NAME FROM RDB$GENERATORS WHERE RDB$GENERATOR_NAME = '{gen_name}'")
-    if cur.fetchone() is None:
-        cur.execute(f'CREATE GENERATOR {gen_name}')
+    motor_atual().criar_chave_automatica(cur, tabela)
+
+def indice_existe(cur, nome_tabela, colunas):
+    """
+    Verifica se a tabela já tem um índice que comece pelas colunas informadas (na mesma ordem).
+    Índices criados automaticamente pelo banco (chaves primárias, UNIQUE e, no Firebird,
+    estrangeiras) também contam.
+    """
+    colunas = [c.upper() for c in colunas]
+    return any(campos[:len(colunas)] == colunas for campos in motor_atual().colunas_dos_indices(cur, nome_tabela))
+
+def criar_indice(cur, nome_indice, nome_tabela, colunas):
+    """Cria o índice se nenhum índice existente já atender às mesmas colunas."""
+    if not indice_existe(cur, nome_tabela, colunas):
+        print(f"🔧 Criando índice {nome_indice}...")
+        cur.execute(f"CREATE INDEX {nome_indice} ON {nome_tabela} ({', '.join(colunas)})")
+
+def coluna_existe(cur, nome_tabela, nome_coluna):
+    """Verifica se uma coluna existe em uma tabela."""
+    return motor_atual().coluna_existe(cur, nome_tabela, nome_coluna)
+
+def _criar_gatilhos(conn, cur, firebird, sqlite):
+    """
+    Triggers e procedures de uma migração, a única parte escrita para cada motor.
+    No Firebird executa os comandos PSQL da lista 'firebird', confirmando um a um
+    (um trigger só enxerga a procedure já confirmada); no SQLite, o script
+    equivalente montado em backends.py.
+    """
+    if not motor_atual().suporta_psql:
+        conn.executar_script(sqlite)
+        return
+    for comando in firebird:
+        cur.execute(comando)
+        conn.commit()
+
+#------------------------------------------------------------------------------
+# MIGRAÇÕES
+# Cada migração recebe (conn, cur) e é aplicada uma única vez, na ordem da lista
+# MIGRACOES. Depois de aplicada, seu número é gravado em SCHEMA_VERSION.
+# Para mudar a estrutura do banco, acrescente uma nova migração ao FINAL da lista
+# (nunca altere uma que já foi distribuída). Escreva-as de forma idempotente
+# (verificando antes de criar): uma migração que falhe no meio é refeita por
+# inteiro na próxima inicialização. A mesma lista serve aos dois motores: só os
+# triggers e procedures são escritos para cada um (ver _criar_gatilhos).
+#------------------------------------------------------------------------------
+def _migracao_estrutura_inicial(conn, cur):
+    """Estrutura e dados padrão que o iniciar_db criava/verificava a cada inicialização."""
+    # --- ETAPA 1: CRIAÇÃO E ATUALIZAÇÃO DE TABELAS ---
+
+    # Tabela USUARIOS
+    if not tabela_existe(cur, 'USUARIOS'):
+        print("🆕 Criando tabela USUARIOS...")
+        cur.execute("CREATE TABLE USUARIOS (ID INTEGER NOT NULL PRIMARY KEY, USERNAME VARCHAR(50) UNIQUE NOT NULL, PASSWORD_HASH VARCHAR(64) NOT NULL, IS_ADMIN SMALLINT DEFAULT 0 NOT NULL)")
+        criar_generator_e_trigger(cur, 'USUARIOS')
     
-    cur.execute(f"SELECT RDB$TRIGGER_NAME FROM RDB$TRIGGERS WHERE RDB$TRIGGER_NAME = '{trg_name}'")
-    if cur.fetchone() is None:
+    if not coluna_existe(cur, 'USUARIOS', 'IS_ADMIN'):
+        print("🔧 Atualizando tabela USUARIOS: Adicionando coluna IS_ADMIN...")
+        cur.execute("ALTER TABLE USUARIOS ADD IS_ADMIN SMALLINT DEFAULT 0 NOT NULL")
+        conn.commit()
+
+    # Tabela STATUS (sem alterações)
+    if not tabela_existe(cur, 'STATUS'):
+        print("🆕 Criando tabela STATUS...")
+        cur.execute("CREATE TABLE STATUS (ID INTEGER NOT NULL PRIMARY KEY, NOME VARCHAR(50) UNIQUE NOT NULL, COR_HEX VARCHAR(10) NOT NULL)")
+        criar_generator_e_trigger(cur, 'STATUS')
+
+    # Tabela CLIENTES (sem alterações)
+    if not tabela_existe(cur, 'CLIENTES'):
+        cur.execute("CREATE TABLE CLIENTES (ID INTEGER NOT NULL PRIMARY KEY, NOME VARCHAR(150) NOT NULL, TIPO_ENVIO VARCHAR(100) NOT NULL, CONTATO VARCHAR(100) NOT NULL, GERA_RECIBO SMALLINT DEFAULT 0, CONTA_XMLS SMALLINT DEFAULT 0, NIVEL VARCHAR(20), OUTROS_DETALHES BLOB SUB_TYPE TEXT, NUMERO_COMPUTADORES INTEGER DEFAULT 0)")
+        criar_generator_e_trigger(cur, 'CLIENTES')
+
+    # Tabela ENTREGAS
+    if not tabela_existe(cur, 'ENTREGAS'):
+        cur.execute("""CREATE TABLE ENTREGAS (ID INTEGER NOT NULL PRIMARY KEY,DATA_VENCIMENTO DATE NOT NULL,HORARIO VARCHAR(10) NOT NULL,STATUS_ID INTEGER,CLIENTE_ID INTEGER NOT NULL,RESPONSAVEL VARCHAR(150),OBSERVACOES BLOB SUB_TYPE TEXT,IS_RETIFICACAO SMALLINT DEFAULT 0,TIPO_ATENDIMENTO VARCHAR(20) DEFAULT 'AGENDADO' NOT NULL,FOREIGN KEY (STATUS_ID) REFERENCES STATUS (ID) ON DELETE SET NULL,FOREIGN KEY (CLIENTE_ID) REFERENCES CLIENTES (ID) ON DELETE CASCADE)""")
+        criar_generator_e_trigger(cur, 'ENTREGAS')
+
+    # --- Verificação para atualizar a tabela ENTREGAS de bancos antigos ---
+    if not coluna_existe(cur, 'ENTREGAS', 'TIPO_ATENDIMENTO'):
+        print("🔧 Atualizando tabela ENTREGAS: Adicionando coluna TIPO_ATENDIMENTO...")
+        cur.execute("ALTER TABLE ENTREGAS ADD TIPO_ATENDIMENTO VARCHAR(20) DEFAULT 'AGENDADO' NOT NULL")
+        conn.commit() # Aplica a alteração da estrutura
+
+    if not coluna_existe(cur, 'ENTREGAS', 'DATA_CONCLUSAO'):
+        print("🔧 Atualizando tabela ENTREGAS: Adicionando coluna DATA_CONCLUSAO...")
+        cur.execute("ALTER TABLE ENTREGAS ADD DATA_CONCLUSAO TIMESTAMP")
+        conn.commit()
+
+    # Tabela LOGS 
+    if not tabela_existe(cur, 'LOGS'):
+        cur.execute("CREATE TABLE LOGS (ID INTEGER NOT NULL PRIMARY KEY, DATAHORA TIMESTAMP DEFAULT CURRENT_TIMESTAMP, USUARIO_NOME VARCHAR(50), ACAO VARCHAR(50), DETALHES BLOB SUB_TYPE TEXT)")
+        criar_generator_e_trigger(cur, 'LOGS')
+
+    # Tabela FERIADOS 
+    if not tabela_existe(cur, 'FERIADOS'):
+        print("📅 Criando tabela de Feriados...")
+        cur.execute("CREATE TABLE FERIADOS (ID INTEGER NOT NULL PRIMARY KEY, DATA DATE NOT NULL UNIQUE, TIPO VARCHAR(20) NOT NULL)")
+        criar_generator_e_trigger(cur, 'FERIADOS')
+
+    conn.commit() # Salva todas as alterações de estrutura
+
+    # --- ETAPA 2: INSERÇÃO DE DADOS PADRÃO ---
+    _inserir_dados_padrao(cur)
+
+def _inserir_dados_padrao(cur):
+    """Usuário 'admin' e status padrão, se as tabelas estiverem vazias."""
+    # Insere o usuário 'admin' se a tabela estiver vazia
+    cur.execute("SELECT COUNT(*) FROM USUARIOS")
+    if cur.fetchone()[0] == 0:
+        print("👤 Inserindo usuário 'admin' padrão...")
+        senha_hash = hashlib.sha256('admin'.encode('utf-8')).hexdigest()
+        cur.execute("INSERT INTO USUARIOS (USERNAME, PASSWORD_HASH, IS_ADMIN) VALUES (?, ?, ?)", ('admin', senha_hash, 1))
+        
+    # Insere os status padrão se a tabela estiver vazia
+    cur.execute("SELECT COUNT(*) FROM STATUS")
+    if cur.fetchone()[0] == 0:
+        print("🎨 Inserindo status padrão...")
+        status_padrao = [('Pendente', '#ffc107'), ('Feito e enviado', '#28a745'), ('Feito', '#007bff'), ('Retificado', '#17a2b8'), ('Houve Algum Erro', '#dc3545'), ('Chamado', '#6f42c1'), ('Remarcado', '#fd7e14'), ('Realocado', '#6c757d')]
+        cur.executemany("INSERT INTO STATUS (NOME, COR_HEX) VALUES (?, ?)", status_padrao)
+
+def _migracao_indices_de_data(conn, cur):
+    """Índices usados pelas consultas por período."""
+    # O composto vem antes para que o de DATA_VENCIMENTO sozinho só seja criado se ainda
+    # não houver um que comece por ela. CLIENTE_ID e STATUS_ID normalmente já são
+    # cobertos pelos índices das chaves estrangeiras.
+    criar_indice(cur, 'IDX_ENTREGAS_DATA_HORARIO', 'ENTREGAS', ['DATA_VENCIMENTO', 'HORARIO'])
+    criar_indice(cur, 'IDX_ENTREGAS_DATA', 'ENTREGAS', ['DATA_VENCIMENTO'])
+    criar_indice(cur, 'IDX_ENTREGAS_CLIENTE', 'ENTREGAS', ['CLIENTE_ID'])
+    criar_indice(cur, 'IDX_ENTREGAS_STATUS', 'ENTREGAS', ['STATUS_ID'])
+    criar_indice(cur, 'IDX_LOGS_DATAHORA', 'LOGS', ['DATAHORA'])
+    criar_indice(cur, 'IDX_FERIADOS_DATA_TIPO', 'FERIADOS', ['DATA', 'TIPO'])
+
+def _migracao_telefones_clientes(conn, cur):
+    """Colunas de telefone usadas pelo cadastro de clientes (bancos criados do zero não as tinham)."""
+    for coluna in ('TELEFONE1', 'TELEFONE2'):
+        if not coluna_existe(cur, 'CLIENTES', coluna):
+            print(f"🔧 Atualizando tabela CLIENTES: Adicionando coluna {coluna}...")
+            cur.execute(f"ALTER TABLE CLIENTES ADD {coluna} VARCHAR(30)")
+
+def _migracao_versao_dados(conn, cur):
+    """Generator GEN_VERSAO_DADOS e triggers que o incrementam a cada alteração."""
+    motor_atual().criar_gerador(cur, 'GEN_VERSAO_DADOS')
+    conn.commit()
+    _criar_gatilhos(conn, cur, [f"""
+        CREATE OR ALTER TRIGGER TRG_{tabela}_VERSAO FOR {tabela}
+        ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 10
+        AS
+        DECLARE VARIABLE VERSAO BIGINT;
+        BEGIN
+            VERSAO = GEN_ID(GEN_VERSAO_DADOS, 1);
+        END
+        """ for tabela in ('ENTREGAS', 'CLIENTES', 'STATUS', 'FERIADOS')], backends.gatilhos_versao_dados())
+
+def _migracao_eventos_alteracao(conn, cur):
+    """Triggers que avisam os outros computadores (POST_EVENT '<tabela>_changed') a cada alteração."""
+    if not motor_atual().suporta_eventos:
+        return # Sem avisos entre computadores (ver notificacoes.py)
+    for tabela in ('ENTREGAS', 'CLIENTES', 'STATUS', 'FERIADOS'):
         cur.execute(f"""
-        CREATE TRIGGER {trg_name} FOR {tabela}
-        ACTIVE BEFORE INSERT POSITION 0
+        CREATE OR ALTER TRIGGER TRG_{tabela}_EVENTO FOR {tabela}
+        ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 20
         AS
         BEGIN
-            IF (NEW.ID IS NULL) THEN NEW.ID = GEN_ID({gen_name}, 1);
+            POST_EVENT '{tabela.lower()}_changed';
         END
         """)
 
-def coluna_existe(cur, nome_tabela, nome_coluna):
-    """Verifica se uma coluna existe em uma tabela."""
+def _trigger_alteracoes(tabela, coluna_data=None):
+    """
+    Monta o trigger que registra em ALTERACOES cada linha alterada de 'tabela'.
+    'coluna_data' (opcional) vai para DATA_REF; se ela mudar num UPDATE, a data
+    antiga também é registrada, para que a tela que a exibia seja atualizada.
+    """
+    data_nova = f"NEW.{coluna_data}" if coluna_data else "NULL"
+    data_antiga = f"OLD.{coluna_data}" if coluna_data else "NULL"
+    mudanca_de_data = ""
+    if coluna_data:
+        mudanca_de_data = f"""
+            IF (UPDATING AND OLD.{coluna_data} IS DISTINCT FROM NEW.{coluna_data}) THEN
+                INSERT INTO ALTERACOES (ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF) VALUES ('{tabela}', NEW.ID, 'U', OLD.{coluna_data});"""
+    return f"""
+    CREATE OR ALTER TRIGGER TRG_{tabela}_ALTERACOES FOR {tabela}
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 30
+    AS
+    BEGIN
+        IF (DELETING) THEN
+            INSERT INTO ALTERACOES (ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF) VALUES ('{tabela}', OLD.ID, 'D', {data_antiga});
+        ELSE
+        BEGIN
+            INSERT INTO ALTERACOES (ENTIDADE, ENTIDADE_ID, OPERACAO, DATA_REF) VALUES ('{tabela}', NEW.ID, IIF(INSERTING, 'I', 'U'), {data_nova});{mudanca_de_data}
+        END
+    END
+    """
+
+def _migracao_registro_alteracoes(conn, cur):
+    """Tabela ALTERACOES, preenchida por triggers, com cada linha alterada nas tabelas exibidas pelas telas."""
+    if not tabela_existe(cur, 'ALTERACOES'):
+        cur.execute("CREATE TABLE ALTERACOES (ID BIGINT NOT NULL PRIMARY KEY, ENTIDADE VARCHAR(20) NOT NULL, ENTIDADE_ID INTEGER NOT NULL, OPERACAO CHAR(1) NOT NULL, DATA_REF DATE, DATAHORA TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        criar_generator_e_trigger(cur, 'ALTERACOES')
+        conn.commit() # Os triggers abaixo só enxergam a tabela depois de confirmada
+    _criar_gatilhos(conn, cur, [
+        _trigger_alteracoes('ENTREGAS', 'DATA_VENCIMENTO'),
+        _trigger_alteracoes('FERIADOS', 'DATA'),
+        _trigger_alteracoes('CLIENTES'),
+        _trigger_alteracoes('STATUS'),
+    ], backends.gatilhos_registro_alteracoes())
+
+def _migracao_resumo_dia(conn, cur):
+    """
+    Tabela RESUMO_DIA: uma linha por data com agendamentos (quantidade, menor
+    STATUS_ID — o status que define a cor do dia — e contagem por tipo de
+    atendimento). Mantida pelo trigger de ENTREGAS via RECALCULAR_RESUMO_DIA.
+    """
+    if not tabela_existe(cur, 'RESUMO_DIA'):
+        cur.execute("CREATE TABLE RESUMO_DIA (DATA DATE NOT NULL PRIMARY KEY, CONTAGEM INTEGER NOT NULL, STATUS_ID INTEGER, QTD_AGENDADO INTEGER NOT NULL, QTD_SOLICITADO INTEGER NOT NULL)")
+        conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER PROCEDURE RECALCULAR_RESUMO_DIA (P_DATA DATE)
+    AS
+    DECLARE VARIABLE V_CONTAGEM INTEGER;
+    DECLARE VARIABLE V_STATUS_ID INTEGER;
+    DECLARE VARIABLE V_AGENDADO INTEGER;
+    DECLARE VARIABLE V_SOLICITADO INTEGER;
+    BEGIN
+        SELECT COUNT(*), MIN(STATUS_ID),
+               COALESCE(SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1)), 0),
+               COALESCE(SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0)), 0)
+        FROM ENTREGAS WHERE DATA_VENCIMENTO = :P_DATA
+        INTO :V_CONTAGEM, :V_STATUS_ID, :V_AGENDADO, :V_SOLICITADO;
+
+        IF (V_CONTAGEM = 0) THEN
+            DELETE FROM RESUMO_DIA WHERE DATA = :P_DATA;
+        ELSE
+            UPDATE OR INSERT INTO RESUMO_DIA (DATA, CONTAGEM, STATUS_ID, QTD_AGENDADO, QTD_SOLICITADO)
+            VALUES (:P_DATA, :V_CONTAGEM, :V_STATUS_ID, :V_AGENDADO, :V_SOLICITADO)
+            MATCHING (DATA);
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_ENTREGAS_RESUMO_DIA FOR ENTREGAS
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 40
+    AS
+    BEGIN
+        IF (NOT DELETING) THEN
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_DIA(NEW.DATA_VENCIMENTO);
+        IF (DELETING OR (UPDATING AND OLD.DATA_VENCIMENTO IS DISTINCT FROM NEW.DATA_VENCIMENTO)) THEN
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_DIA(OLD.DATA_VENCIMENTO);
+    END
+    """], backends.gatilhos_resumo_dia())
+    # Carga inicial com os agendamentos já existentes
+    cur.execute("DELETE FROM RESUMO_DIA")
     cur.execute("""
-        SELECT 1
-        FROM RDB$RELATION_FIELDS
-        WHERE RDB$RELATION_NAME = ? AND RDB$FIELD_NAME = ?
-    """, (nome_tabela.upper(), nome_coluna.upper()))
-    return cur.fetchone() is not None
+        INSERT INTO RESUMO_DIA (DATA, CONTAGEM, STATUS_ID, QTD_AGENDADO, QTD_SOLICITADO)
+        SELECT DATA_VENCIMENTO, COUNT(*), MIN(STATUS_ID),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1)),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0))
+        FROM ENTREGAS
+        GROUP BY DATA_VENCIMENTO
+    """)
 
-def iniciar_db():
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        
-        # --- ETAPA 1: CRIAÇÃO E ATUALIZAÇÃO DE TABELAS ---
+def _migracao_resumo_mes(conn, cur):
+    """
+    Tabela RESUMO_MES: números do painel por (ANO, MES) — concluídos, retificados,
+    solicitados pendentes e clientes atendidos. A cada gravação em ENTREGAS apenas o
+    mês afetado é recalculado; renomear um status recalcula todos os meses, pois
+    muda quais agendamentos contam como "feito"/"retificado"/"pendente".
+    """
+    if not tabela_existe(cur, 'RESUMO_MES'):
+        cur.execute("CREATE TABLE RESUMO_MES (ANO SMALLINT NOT NULL, MES SMALLINT NOT NULL, CONCLUIDOS INTEGER NOT NULL, RETIFICADOS INTEGER NOT NULL, SOLICITADOS_PENDENTES INTEGER NOT NULL, CLIENTES_ATENDIDOS INTEGER NOT NULL, PRIMARY KEY (ANO, MES))")
+        conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER PROCEDURE RECALCULAR_RESUMO_MES (P_DATA DATE)
+    AS
+    DECLARE VARIABLE V_INICIO DATE;
+    DECLARE VARIABLE V_FIM DATE;
+    DECLARE VARIABLE V_CONCLUIDOS INTEGER;
+    DECLARE VARIABLE V_RETIFICADOS INTEGER;
+    DECLARE VARIABLE V_PENDENTES INTEGER;
+    DECLARE VARIABLE V_CLIENTES INTEGER;
+    BEGIN
+        V_INICIO = DATEADD(1 - EXTRACT(DAY FROM P_DATA) DAY TO P_DATA);
+        V_FIM = DATEADD(1 MONTH TO V_INICIO);
+        SELECT
+            COALESCE(SUM(IIF(UPPER(s.NOME) LIKE '%FEITO%', 1, 0)), 0),
+            COALESCE(SUM(IIF(UPPER(s.NOME) LIKE '%RETIFICADO%', 1, 0)), 0),
+            COALESCE(SUM(IIF(e.TIPO_ATENDIMENTO = 'SOLICITADO' AND UPPER(s.NOME) = 'PENDENTE', 1, 0)), 0),
+            COUNT(DISTINCT IIF(UPPER(s.NOME) LIKE '%FEITO%', e.CLIENTE_ID, NULL))
+        FROM ENTREGAS e
+        JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE e.DATA_VENCIMENTO >= :V_INICIO AND e.DATA_VENCIMENTO < :V_FIM
+        INTO :V_CONCLUIDOS, :V_RETIFICADOS, :V_PENDENTES, :V_CLIENTES;
+
+        UPDATE OR INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+        VALUES (EXTRACT(YEAR FROM :V_INICIO), EXTRACT(MONTH FROM :V_INICIO), :V_CONCLUIDOS, :V_RETIFICADOS, :V_PENDENTES, :V_CLIENTES)
+        MATCHING (ANO, MES);
+    END
+    """, """
+    CREATE OR ALTER PROCEDURE RECALCULAR_RESUMO_MES_TODOS
+    AS
+    DECLARE VARIABLE V_MES DATE;
+    BEGIN
+        DELETE FROM RESUMO_MES;
+        FOR SELECT DISTINCT DATEADD(1 - EXTRACT(DAY FROM DATA_VENCIMENTO) DAY TO DATA_VENCIMENTO) FROM ENTREGAS
+            INTO :V_MES
+        DO
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_MES(:V_MES);
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_ENTREGAS_RESUMO_MES FOR ENTREGAS
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 50
+    AS
+    BEGIN
+        IF (NOT DELETING) THEN
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_MES(NEW.DATA_VENCIMENTO);
+        IF (DELETING OR (UPDATING AND (EXTRACT(YEAR FROM OLD.DATA_VENCIMENTO) <> EXTRACT(YEAR FROM NEW.DATA_VENCIMENTO)
+                                       OR EXTRACT(MONTH FROM OLD.DATA_VENCIMENTO) <> EXTRACT(MONTH FROM NEW.DATA_VENCIMENTO)))) THEN
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_MES(OLD.DATA_VENCIMENTO);
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_STATUS_RESUMO_MES FOR STATUS
+    ACTIVE AFTER UPDATE POSITION 50
+    AS
+    BEGIN
+        IF (OLD.NOME IS DISTINCT FROM NEW.NOME) THEN
+            EXECUTE PROCEDURE RECALCULAR_RESUMO_MES_TODOS;
+    END
+    """,
+    # Carga inicial com os agendamentos já existentes
+    "EXECUTE PROCEDURE RECALCULAR_RESUMO_MES_TODOS"], backends.gatilhos_resumo_mes())
+
+def _migracao_indice_busca(conn, cur):
+    """
+    Tabelas do índice da busca global (ver atualizar_indice_busca). Os triggers só
+    marcam o agendamento em BUSCA_PENDENTES; os trigramas são gerados pelo programa.
+    """
+    if not tabela_existe(cur, 'BUSCA_TRIGRAMAS'):
+        cur.execute("CREATE TABLE BUSCA_TRIGRAMAS (TRIGRAMA VARCHAR(3) NOT NULL, ENTREGA_ID INTEGER NOT NULL, PRIMARY KEY (TRIGRAMA, ENTREGA_ID))")
+        cur.execute("CREATE TABLE BUSCA_PENDENTES (ENTREGA_ID INTEGER NOT NULL PRIMARY KEY, SEQ BIGINT NOT NULL)")
+        conn.commit()
+    criar_indice(cur, 'IDX_BUSCA_TRIGRAMAS_ENTREGA', 'BUSCA_TRIGRAMAS', ['ENTREGA_ID'])
+    motor_atual().criar_gerador(cur, 'GEN_BUSCA_PENDENTES_SEQ')
+    conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER TRIGGER TRG_ENTREGAS_BUSCA FOR ENTREGAS
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 60
+    AS
+    BEGIN
+        IF (DELETING) THEN
+            UPDATE OR INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ) VALUES (OLD.ID, GEN_ID(GEN_BUSCA_PENDENTES_SEQ, 1)) MATCHING (ENTREGA_ID);
+        ELSE IF (INSERTING OR OLD.CLIENTE_ID IS DISTINCT FROM NEW.CLIENTE_ID OR OLD.RESPONSAVEL IS DISTINCT FROM NEW.RESPONSAVEL
+                 OR OLD.OBSERVACOES IS DISTINCT FROM NEW.OBSERVACOES) THEN
+            UPDATE OR INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ) VALUES (NEW.ID, GEN_ID(GEN_BUSCA_PENDENTES_SEQ, 1)) MATCHING (ENTREGA_ID);
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_CLIENTES_BUSCA FOR CLIENTES
+    ACTIVE AFTER UPDATE POSITION 60
+    AS
+    DECLARE VARIABLE V_ENTREGA_ID INTEGER;
+    BEGIN
+        IF (OLD.NOME IS DISTINCT FROM NEW.NOME) THEN
+            FOR SELECT ID FROM ENTREGAS WHERE CLIENTE_ID = NEW.ID INTO :V_ENTREGA_ID DO
+                UPDATE OR INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ) VALUES (:V_ENTREGA_ID, GEN_ID(GEN_BUSCA_PENDENTES_SEQ, 1)) MATCHING (ENTREGA_ID);
+    END
+    """], backends.gatilhos_indice_busca())
+    # Todos os agendamentos existentes entram na fila; a primeira busca monta o índice
+    cur.execute("""
+        INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ)
+        SELECT e.ID, 0 FROM ENTREGAS e
+        WHERE NOT EXISTS (SELECT 1 FROM BUSCA_PENDENTES p WHERE p.ENTREGA_ID = e.ID)
+    """)
 
-        # Tabela USUARIOS
-        if not tabela_existe(cur, 'USUARIOS'):
-            print("🆕 Criando tabela USUARIOS...")
-            cur.execute("CREATE TABLE USUARIOS (ID INTEGER NOT NULL PRIMARY KEY, USERNAME VARCHAR(50) UNIQUE NOT NULL, PASSWORD_HASH VARCHAR(64) NOT NULL, IS_ADMIN SMALLINT DEFAULT 0 NOT NULL)")
-            criar_generator_e_trigger(cur, 'USUARIOS')
-        
-        if not coluna_existe(cur, 'USUARIOS', 'IS_ADMIN'):
-            print("🔧 Atualizando tabela USUARIOS: Adicionando coluna IS_ADMIN...")
-            cur.execute("ALTER TABLE USUARIOS ADD IS_ADMIN SMALLINT DEFAULT 0 NOT NULL")
+def _migracao_resumo_mes_incremental(conn, cur):
+    """
+    RESUMO_MES passa a ser ajustada linha a linha (AJUSTAR_RESUMO_MES): cada gravação em
+    ENTREGAS subtrai a contribuição de OLD e soma a de NEW, sem reler o mês. Gravações que
+    não mudam status, cliente, tipo ou mês não tocam a tabela. CLIENTES_ATENDIDOS usa o
+    contador por cliente e mês de RESUMO_MES_CLIENTES. Renomear um status só ajusta os
+    agendamentos dele, e só se o novo nome mudar o que conta como feito/retificado/pendente.
+    """
+    if not tabela_existe(cur, 'RESUMO_MES_CLIENTES'):
+        cur.execute("CREATE TABLE RESUMO_MES_CLIENTES (ANO SMALLINT NOT NULL, MES SMALLINT NOT NULL, CLIENTE_ID INTEGER NOT NULL, CONCLUIDOS INTEGER NOT NULL, PRIMARY KEY (ANO, MES, CLIENTE_ID))")
+        conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER PROCEDURE AJUSTAR_RESUMO_MES (P_DATA DATE, P_CLIENTE_ID INTEGER, P_TIPO VARCHAR(20), P_NOME_STATUS VARCHAR(50), P_QTD INTEGER)
+    AS
+    DECLARE VARIABLE V_ANO SMALLINT;
+    DECLARE VARIABLE V_MES SMALLINT;
+    DECLARE VARIABLE V_FEITO INTEGER;
+    DECLARE VARIABLE V_RETIFICADO INTEGER;
+    DECLARE VARIABLE V_PENDENTE INTEGER;
+    DECLARE VARIABLE V_ANTES INTEGER = 0;
+    DECLARE VARIABLE V_CLIENTES INTEGER = 0;
+    BEGIN
+        V_FEITO = IIF(UPPER(P_NOME_STATUS) LIKE '%FEITO%', 1, 0);
+        V_RETIFICADO = IIF(UPPER(P_NOME_STATUS) LIKE '%RETIFICADO%', 1, 0);
+        V_PENDENTE = IIF(P_TIPO = 'SOLICITADO' AND UPPER(P_NOME_STATUS) = 'PENDENTE', 1, 0);
+        IF (P_QTD = 0 OR V_FEITO + V_RETIFICADO + V_PENDENTE = 0) THEN
+            EXIT;
+        V_ANO = EXTRACT(YEAR FROM P_DATA);
+        V_MES = EXTRACT(MONTH FROM P_DATA);
+
+        IF (V_FEITO = 1) THEN
+        BEGIN
+            SELECT CONCLUIDOS FROM RESUMO_MES_CLIENTES
+            WHERE ANO = :V_ANO AND MES = :V_MES AND CLIENTE_ID = :P_CLIENTE_ID
+            INTO :V_ANTES;
+            IF (V_ANTES + P_QTD > 0) THEN
+                UPDATE OR INSERT INTO RESUMO_MES_CLIENTES (ANO, MES, CLIENTE_ID, CONCLUIDOS)
+                VALUES (:V_ANO, :V_MES, :P_CLIENTE_ID, :V_ANTES + :P_QTD)
+                MATCHING (ANO, MES, CLIENTE_ID);
+            ELSE
+                DELETE FROM RESUMO_MES_CLIENTES WHERE ANO = :V_ANO AND MES = :V_MES AND CLIENTE_ID = :P_CLIENTE_ID;
+            -- O cliente entra (0 -> 1) ou sai (1 -> 0) dos atendidos do mês
+            V_CLIENTES = IIF(V_ANTES + P_QTD > 0, 1, 0) - IIF(V_ANTES > 0, 1, 0);
+        END
+
+        UPDATE RESUMO_MES SET
+            CONCLUIDOS = CONCLUIDOS + :V_FEITO * :P_QTD,
+            RETIFICADOS = RETIFICADOS + :V_RETIFICADO * :P_QTD,
+            SOLICITADOS_PENDENTES = SOLICITADOS_PENDENTES + :V_PENDENTE * :P_QTD,
+            CLIENTES_ATENDIDOS = CLIENTES_ATENDIDOS + :V_CLIENTES
+        WHERE ANO = :V_ANO AND MES = :V_MES;
+        IF (ROW_COUNT = 0) THEN
+            INSERT INTO RESUMO_MES (ANO, MES, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES, CLIENTES_ATENDIDOS)
+            VALUES (:V_ANO, :V_MES, :V_FEITO * :P_QTD, :V_RETIFICADO * :P_QTD, :V_PENDENTE * :P_QTD, :V_CLIENTES);
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_ENTREGAS_RESUMO_MES FOR ENTREGAS
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 50
+    AS
+    DECLARE VARIABLE V_NOME VARCHAR(50);
+    BEGIN
+        IF (UPDATING AND OLD.STATUS_ID IS NOT DISTINCT FROM NEW.STATUS_ID AND OLD.CLIENTE_ID = NEW.CLIENTE_ID
+            AND OLD.TIPO_ATENDIMENTO = NEW.TIPO_ATENDIMENTO
+            AND EXTRACT(YEAR FROM OLD.DATA_VENCIMENTO) = EXTRACT(YEAR FROM NEW.DATA_VENCIMENTO)
+            AND EXTRACT(MONTH FROM OLD.DATA_VENCIMENTO) = EXTRACT(MONTH FROM NEW.DATA_VENCIMENTO)) THEN
+            EXIT;
+        IF (NOT INSERTING) THEN
+        BEGIN
+            V_NOME = NULL;
+            SELECT NOME FROM STATUS WHERE ID = OLD.STATUS_ID INTO :V_NOME;
+            EXECUTE PROCEDURE AJUSTAR_RESUMO_MES(OLD.DATA_VENCIMENTO, OLD.CLIENTE_ID, OLD.TIPO_ATENDIMENTO, :V_NOME, -1);
+        END
+        IF (NOT DELETING) THEN
+        BEGIN
+            V_NOME = NULL;
+            SELECT NOME FROM STATUS WHERE ID = NEW.STATUS_ID INTO :V_NOME;
+            EXECUTE PROCEDURE AJUSTAR_RESUMO_MES(NEW.DATA_VENCIMENTO, NEW.CLIENTE_ID, NEW.TIPO_ATENDIMENTO, :V_NOME, 1);
+        END
+    END
+    """, """
+    CREATE OR ALTER TRIGGER TRG_STATUS_RESUMO_MES FOR STATUS
+    ACTIVE AFTER UPDATE POSITION 50
+    AS
+    DECLARE VARIABLE V_MES DATE;
+    DECLARE VARIABLE V_CLIENTE_ID INTEGER;
+    DECLARE VARIABLE V_TIPO VARCHAR(20);
+    DECLARE VARIABLE V_QTD INTEGER;
+    BEGIN
+        IF (IIF(UPPER(OLD.NOME) LIKE '%FEITO%', 1, 0) = IIF(UPPER(NEW.NOME) LIKE '%FEITO%', 1, 0)
+            AND IIF(UPPER(OLD.NOME) LIKE '%RETIFICADO%', 1, 0) = IIF(UPPER(NEW.NOME) LIKE '%RETIFICADO%', 1, 0)
+            AND IIF(UPPER(OLD.NOME) = 'PENDENTE', 1, 0) = IIF(UPPER(NEW.NOME) = 'PENDENTE', 1, 0)) THEN
+            EXIT;
+        FOR SELECT DATEADD(1 - EXTRACT(DAY FROM DATA_VENCIMENTO) DAY TO DATA_VENCIMENTO), CLIENTE_ID, TIPO_ATENDIMENTO, COUNT(*)
+            FROM ENTREGAS WHERE STATUS_ID = NEW.ID
+            GROUP BY 1, 2, 3
+            INTO :V_MES, :V_CLIENTE_ID, :V_TIPO, :V_QTD
+        DO
+        BEGIN
+            EXECUTE PROCEDURE AJUSTAR_RESUMO_MES(:V_MES, :V_CLIENTE_ID, :V_TIPO, OLD.NOME, -:V_QTD);
+            EXECUTE PROCEDURE AJUSTAR_RESUMO_MES(:V_MES, :V_CLIENTE_ID, :V_TIPO, NEW.NOME, :V_QTD);
+        END
+    END
+    """,
+    # O ON DELETE SET NULL é feito aqui, com o status ainda existente, para que
+    # TRG_ENTREGAS_RESUMO_MES desconte os agendamentos que ele contava
+    """
+    CREATE OR ALTER TRIGGER TRG_STATUS_RESUMO_MES_EXCLUSAO FOR STATUS
+    ACTIVE BEFORE DELETE POSITION 50
+    AS
+    BEGIN
+        UPDATE ENTREGAS SET STATUS_ID = NULL WHERE STATUS_ID = OLD.ID;
+    END
+    """], backends.gatilhos_resumo_mes_incremental())
+    if motor_atual().suporta_psql:
+        for procedimento in ('RECALCULAR_RESUMO_MES_TODOS', 'RECALCULAR_RESUMO_MES'):
+            cur.execute("SELECT 1 FROM RDB$PROCEDURES WHERE RDB$PROCEDURE_NAME = ?", (procedimento,))
+            if cur.fetchone():
+                cur.execute(f"DROP PROCEDURE {procedimento}")
+                conn.commit()
+    # Carga inicial do contador por cliente (RESUMO_MES já está em dia pela migração 8)
+    cur.execute("DELETE FROM RESUMO_MES_CLIENTES")
+    cur.execute("""
+        INSERT INTO RESUMO_MES_CLIENTES (ANO, MES, CLIENTE_ID, CONCLUIDOS)
+        SELECT EXTRACT(YEAR FROM e.DATA_VENCIMENTO), EXTRACT(MONTH FROM e.DATA_VENCIMENTO), e.CLIENTE_ID, COUNT(*)
+        FROM ENTREGAS e
+        JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE UPPER(s.NOME) LIKE '%FEITO%'
+        GROUP BY 1, 2, 3
+    """)
+
+def _migracao_textos_busca(conn, cur):
+    """
+    Tabela BUSCA_TEXTOS: o texto já normalizado de cada agendamento (nome do cliente,
+    responsável e observações), gravado junto com os trigramas. A busca confere o termo
+    inteiro nessas colunas VARCHAR, sem reler CLIENTES nem o BLOB de OBSERVACOES.
+    Todos os agendamentos voltam para a fila, que o IndexadorBusca processa em segundo plano.
+    """
+    if not tabela_existe(cur, 'BUSCA_TEXTOS'):
+        cur.execute(f"""CREATE TABLE BUSCA_TEXTOS (ENTREGA_ID INTEGER NOT NULL PRIMARY KEY,
+            CLIENTE VARCHAR(150) CHARACTER SET UTF8, RESPONSAVEL VARCHAR(150) CHARACTER SET UTF8,
+            OBSERVACOES VARCHAR({TAMANHO_TEXTO_BUSCA}) CHARACTER SET UTF8, OBSERVACOES_CORTADAS SMALLINT DEFAULT 0 NOT NULL)""")
+        conn.commit()
+    cur.execute("""
+        INSERT INTO BUSCA_PENDENTES (ENTREGA_ID, SEQ)
+        SELECT e.ID, 0 FROM ENTREGAS e
+        WHERE NOT EXISTS (SELECT 1 FROM BUSCA_PENDENTES p WHERE p.ENTREGA_ID = e.ID)
+    """)
+
+def _migracao_nomes_triggers_sqlite(conn, cur):
+    """
+    Bancos SQLite criados antes de o SQLite seguir esta lista (de uma vez, já na versão 9)
+    têm os mesmos triggers com outros nomes e agrupamentos. Recria todos com os nomes das
+    migrações 4 a 10 (ver backends.py), que as próximas migrações usam para trocá-los.
+    No Firebird não há o que fazer.
+    """
+    if motor_atual().suporta_psql:
+        return
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    remocoes = [f"DROP TRIGGER {nome};" for (nome,) in cur.fetchall()]
+    conn.executar_script("\n".join(["BEGIN;", *remocoes,
+        backends.gatilhos_versao_dados(), backends.gatilhos_registro_alteracoes(), backends.gatilhos_resumo_dia(),
+        backends.gatilhos_indice_busca(), backends.gatilhos_resumo_mes_incremental(), "COMMIT;"]))
+
+def _migracao_resumo_dia_parcelas(conn, cur):
+    """
+    RESUMO_DIA_PARCELAS substitui RESUMO_DIA. Cada gravação em ENTREGAS só insere
+    parcelas (a linha antiga entra com -1 e a nova com +1) em vez de atualizar a
+    linha da data: dois computadores gravando agendamentos do mesmo dia não
+    disputam mais a mesma linha (no Firebird, o segundo recebia um conflito de
+    atualização). As leituras somam as parcelas por DATA e STATUS_ID, e
+    compactar_resumos junta as parcelas de cada grupo numa só linha.
+    """
+    if not tabela_existe(cur, 'RESUMO_DIA_PARCELAS'):
+        cur.execute("CREATE TABLE RESUMO_DIA_PARCELAS (ID BIGINT NOT NULL PRIMARY KEY, DATA DATE NOT NULL, STATUS_ID INTEGER, CONTAGEM INTEGER NOT NULL, QTD_AGENDADO INTEGER NOT NULL, QTD_SOLICITADO INTEGER NOT NULL)")
+        criar_generator_e_trigger(cur, 'RESUMO_DIA_PARCELAS')
+        conn.commit()
+    criar_indice(cur, 'IDX_RESUMO_DIA_PARCELAS_DATA', 'RESUMO_DIA_PARCELAS', ['DATA', 'STATUS_ID'])
+    conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER TRIGGER TRG_ENTREGAS_RESUMO_DIA FOR ENTREGAS
+    ACTIVE AFTER INSERT OR UPDATE OR DELETE POSITION 40
+    AS
+    BEGIN
+        IF (UPDATING AND OLD.DATA_VENCIMENTO = NEW.DATA_VENCIMENTO AND OLD.STATUS_ID IS NOT DISTINCT FROM NEW.STATUS_ID
+            AND OLD.TIPO_ATENDIMENTO = NEW.TIPO_ATENDIMENTO) THEN
+            EXIT;
+        IF (NOT INSERTING) THEN
+            INSERT INTO RESUMO_DIA_PARCELAS (DATA, STATUS_ID, CONTAGEM, QTD_AGENDADO, QTD_SOLICITADO)
+            VALUES (OLD.DATA_VENCIMENTO, OLD.STATUS_ID, -1,
+                    IIF(OLD.TIPO_ATENDIMENTO = 'SOLICITADO', 0, -1), IIF(OLD.TIPO_ATENDIMENTO = 'SOLICITADO', -1, 0));
+        IF (NOT DELETING) THEN
+            INSERT INTO RESUMO_DIA_PARCELAS (DATA, STATUS_ID, CONTAGEM, QTD_AGENDADO, QTD_SOLICITADO)
+            VALUES (NEW.DATA_VENCIMENTO, NEW.STATUS_ID, 1,
+                    IIF(NEW.TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1), IIF(NEW.TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0));
+    END
+    """], backends.gatilhos_resumo_dia_parcelas())
+    if motor_atual().suporta_psql:
+        cur.execute("SELECT 1 FROM RDB$PROCEDURES WHERE RDB$PROCEDURE_NAME = 'RECALCULAR_RESUMO_DIA'")
+        if cur.fetchone():
+            cur.execute("DROP PROCEDURE RECALCULAR_RESUMO_DIA")
+            conn.commit()
+    if tabela_existe(cur, 'RESUMO_DIA'):
+        cur.execute("DROP TABLE RESUMO_DIA")
+        conn.commit()
+    # Carga inicial: uma parcela por data e status com os agendamentos já existentes
+    cur.execute("DELETE FROM RESUMO_DIA_PARCELAS")
+    cur.execute("""
+        INSERT INTO RESUMO_DIA_PARCELAS (DATA, STATUS_ID, CONTAGEM, QTD_AGENDADO, QTD_SOLICITADO)
+        SELECT DATA_VENCIMENTO, STATUS_ID, COUNT(*),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1)),
+               SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0))
+        FROM ENTREGAS
+        GROUP BY DATA_VENCIMENTO, STATUS_ID
+    """)
+
+def _migracao_resumo_mes_parcelas(conn, cur):
+    """
+    RESUMO_MES_PARCELAS substitui RESUMO_MES e RESUMO_MES_CLIENTES, pelo mesmo motivo
+    da migração 13: AJUSTAR_RESUMO_MES passa a só inserir uma parcela por cliente e mês
+    (com os números negativos ao descontar), em vez de atualizar a linha do mês que
+    todos os computadores disputavam. Os triggers de ENTREGAS e STATUS da migração 10
+    continuam os mesmos no Firebird. CLIENTES_ATENDIDOS é a quantidade de clientes
+    cujas parcelas de CONCLUIDOS somam mais que zero no mês.
+
+    As migrações 8 e 10 não foram fundidas: bancos já distribuídos podem estar na
+    versão 8 ou 9 e precisam da 10 (e desta). Num banco novo as três rodam com as
+    tabelas ainda vazias, então criar e trocar os triggers não custa nada.
+    """
+    if not tabela_existe(cur, 'RESUMO_MES_PARCELAS'):
+        cur.execute("CREATE TABLE RESUMO_MES_PARCELAS (ID BIGINT NOT NULL PRIMARY KEY, ANO SMALLINT NOT NULL, MES SMALLINT NOT NULL, CLIENTE_ID INTEGER NOT NULL, CONCLUIDOS INTEGER NOT NULL, RETIFICADOS INTEGER NOT NULL, SOLICITADOS_PENDENTES INTEGER NOT NULL)")
+        criar_generator_e_trigger(cur, 'RESUMO_MES_PARCELAS')
+        conn.commit()
+    criar_indice(cur, 'IDX_RESUMO_MES_PARCELAS_MES', 'RESUMO_MES_PARCELAS', ['ANO', 'MES', 'CLIENTE_ID'])
+    conn.commit()
+    _criar_gatilhos(conn, cur, ["""
+    CREATE OR ALTER PROCEDURE AJUSTAR_RESUMO_MES (P_DATA DATE, P_CLIENTE_ID INTEGER, P_TIPO VARCHAR(20), P_NOME_STATUS VARCHAR(50), P_QTD INTEGER)
+    AS
+    DECLARE VARIABLE V_FEITO INTEGER;
+    DECLARE VARIABLE V_RETIFICADO INTEGER;
+    DECLARE VARIABLE V_PENDENTE INTEGER;
+    BEGIN
+        V_FEITO = IIF(UPPER(P_NOME_STATUS) LIKE '%FEITO%', 1, 0);
+        V_RETIFICADO = IIF(UPPER(P_NOME_STATUS) LIKE '%RETIFICADO%', 1, 0);
+        V_PENDENTE = IIF(P_TIPO = 'SOLICITADO' AND UPPER(P_NOME_STATUS) = 'PENDENTE', 1, 0);
+        IF (P_QTD = 0 OR V_FEITO + V_RETIFICADO + V_PENDENTE = 0) THEN
+            EXIT;
+        INSERT INTO RESUMO_MES_PARCELAS (ANO, MES, CLIENTE_ID, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES)
+        VALUES (EXTRACT(YEAR FROM :P_DATA), EXTRACT(MONTH FROM :P_DATA), :P_CLIENTE_ID,
+                :V_FEITO * :P_QTD, :V_RETIFICADO * :P_QTD, :V_PENDENTE * :P_QTD);
+    END
+    """], backends.gatilhos_resumo_mes_parcelas())
+    for tabela in ('RESUMO_MES', 'RESUMO_MES_CLIENTES'):
+        if tabela_existe(cur, tabela):
+            cur.execute(f"DROP TABLE {tabela}")
             conn.commit()
+    # Carga inicial: uma parcela por cliente e mês com os agendamentos já existentes
+    cur.execute("DELETE FROM RESUMO_MES_PARCELAS")
+    cur.execute("""
+        INSERT INTO RESUMO_MES_PARCELAS (ANO, MES, CLIENTE_ID, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES)
+        SELECT EXTRACT(YEAR FROM e.DATA_VENCIMENTO), EXTRACT(MONTH FROM e.DATA_VENCIMENTO), e.CLIENTE_ID,
+               SUM(IIF(UPPER(s.NOME) LIKE '%FEITO%', 1, 0)),
+               SUM(IIF(UPPER(s.NOME) LIKE '%RETIFICADO%', 1, 0)),
+               SUM(IIF(e.TIPO_ATENDIMENTO = 'SOLICITADO' AND UPPER(s.NOME) = 'PENDENTE', 1, 0))
+        FROM ENTREGAS e
+        JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE UPPER(s.NOME) LIKE '%FEITO%' OR UPPER(s.NOME) LIKE '%RETIFICADO%'
+              OR (e.TIPO_ATENDIMENTO = 'SOLICITADO' AND UPPER(s.NOME) = 'PENDENTE')
+        GROUP BY 1, 2, 3
+    """)
+
+# (número, descrição, função) — em ordem crescente de número
+MIGRACOES = [
+    (1, "Estrutura inicial e dados padrão", _migracao_estrutura_inicial),
+    (2, "Índices das consultas por data", _migracao_indices_de_data),
+    (3, "Telefones dos clientes", _migracao_telefones_clientes),
+    (4, "Versão dos dados", _migracao_versao_dados),
+    (5, "Eventos de alteração", _migracao_eventos_alteracao),
+    (6, "Registro de alterações", _migracao_registro_alteracoes),
+    (7, "Resumo diário de agendamentos", _migracao_resumo_dia),
+    (8, "Resumo mensal do painel", _migracao_resumo_mes),
+    (9, "Índice da busca global", _migracao_indice_busca),
+    (10, "Resumo mensal incremental", _migracao_resumo_mes_incremental),
+    (11, "Texto normalizado da busca global", _migracao_textos_busca),
+    (12, "Nomes dos triggers do SQLite", _migracao_nomes_triggers_sqlite),
+    (13, "Resumo diário em parcelas", _migracao_resumo_dia_parcelas),
+    (14, "Resumo mensal em parcelas", _migracao_resumo_mes_parcelas),
+]
+
+def versao_do_banco(conn, cur):
+    """Retorna a última migração aplicada (0 se o banco ainda não tem SCHEMA_VERSION)."""
+    try:
+        cur.execute("SELECT MAX(VERSAO) FROM SCHEMA_VERSION")
+        return cur.fetchone()[0] or 0
+    except ErroBanco:
+        # Tabela inexistente: banco anterior ao controle de versão (ou recém-criado)
+        conn.rollback()
+        return 0
 
-        # Tabela STATUS (sem alterações)
-        if not tabela_existe(cur, 'STATUS'):
-            print("🆕 Criando tabela STATUS...")
-            cur.execute("CREATE TABLE STATUS (ID INTEGER NOT NULL PRIMARY KEY, NOME VARCHAR(50) UNIQUE NOT NULL, COR_HEX VARCHAR(10) NOT NULL)")
-            criar_generator_e_trigger(cur, 'STATUS')
-
-        # Tabela CLIENTES (sem alterações)
-        if not tabela_existe(cur, 'CLIENTES'):
-            cur.execute("CREATE TABLE CLIENTES (ID INTEGER NOT NULL PRIMARY KEY, NOME VARCHAR(150) NOT NULL, TIPO_ENVIO VARCHAR(100) NOT NULL, CONTATO VARCHAR(100) NOT NULL, GERA_RECIBO SMALLINT DEFAULT 0, CONTA_XMLS SMALLINT DEFAULT 0, NIVEL VARCHAR(20), OUTROS_DETALHES BLOB SUB_TYPE TEXT, NUMERO_COMPUTADORES INTEGER DEFAULT 0)")
-            criar_generator_e_trigger(cur, 'CLIENTES')
-
-        # Tabela ENTREGAS
-        if not tabela_existe(cur, 'ENTREGAS'):
-            cur.execute("""CREATE TABLE ENTREGAS (ID INTEGER NOT NULL PRIMARY KEY,DATA_VENCIMENTO DATE NOT NULL,HORARIO VARCHAR(10) NOT NULL,STATUS_ID INTEGER,CLIENTE_ID INTEGER NOT NULL,RESPONSAVEL VARCHAR(150),OBSERVACOES BLOB SUB_TYPE TEXT,IS_RETIFICACAO SMALLINT DEFAULT 0,TIPO_ATENDIMENTO VARCHAR(20) DEFAULT 'AGENDADO' NOT NULL,FOREIGN KEY (STATUS_ID) REFERENCES STATUS (ID) ON DELETE SET NULL,FOREIGN KEY (CLIENTE_ID) REFERENCES CLIENTES (ID) ON DELETE CASCADE)""")
-            criar_generator_e_trigger(cur, 'ENTREGAS')
-
-        # --- Verificação para atualizar a tabela ENTREGAS de bancos antigos ---
-        if not coluna_existe(cur, 'ENTREGAS', 'TIPO_ATENDIMENTO'):
-            print("🔧 Atualizando tabela ENTREGAS: Adicionando coluna TIPO_ATENDIMENTO...")
-            cur.execute("ALTER TABLE ENTREGAS ADD TIPO_ATENDIMENTO VARCHAR(20) DEFAULT 'AGENDADO' NOT NULL")
-            conn.commit() # Aplica a alteração da estrutura
-
-        if not coluna_existe(cur, 'ENTREGAS', 'DATA_CONCLUSAO'):
-            print("🔧 Atualizando tabela ENTREGAS: Adicionando coluna DATA_CONCLUSAO...")
-            cur.execute("ALTER TABLE ENTREGAS ADD DATA_CONCLUSAO TIMESTAMP")
+def _preparar_schema_version(conn, cur):
+    """
+    Cria SCHEMA_VERSION e a linha sentinela (VERSAO = 0) travada por
+    Backend.bloqueio_migracoes. Dois computadores podem chegar aqui ao mesmo
+    tempo: se o outro criar primeiro, o erro é ignorado.
+    """
+    if not tabela_existe(cur, 'SCHEMA_VERSION'):
+        try:
+            cur.execute("CREATE TABLE SCHEMA_VERSION (VERSAO INTEGER NOT NULL PRIMARY KEY, DESCRICAO VARCHAR(200), APLICADA_EM TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+            conn.commit()
+        except ErroBanco:
+            conn.rollback()
+            if not tabela_existe(cur, 'SCHEMA_VERSION'):
+                raise
+    cur.execute("SELECT 1 FROM SCHEMA_VERSION WHERE VERSAO = 0")
+    if cur.fetchone() is None:
+        try:
+            cur.execute("INSERT INTO SCHEMA_VERSION (VERSAO, DESCRICAO) VALUES (0, 'Trava das migrações')")
             conn.commit()
+        except ErroBanco:
+            conn.rollback()
 
-        # Tabela LOGS 
-        if not tabela_existe(cur, 'LOGS'):
-            cur.execute("CREATE TABLE LOGS (ID INTEGER NOT NULL PRIMARY KEY, DATAHORA TIMESTAMP DEFAULT CURRENT_TIMESTAMP, USUARIO_NOME VARCHAR(50), ACAO VARCHAR(50), DETALHES BLOB SUB_TYPE TEXT)")
-            criar_generator_e_trigger(cur, 'LOGS')
+def _migracao_registrada(cur, numero):
+    cur.execute("SELECT 1 FROM SCHEMA_VERSION WHERE VERSAO = ?", (numero,))
+    return cur.fetchone() is not None
 
-        # Tabela FERIADOS 
-        if not tabela_existe(cur, 'FERIADOS'):
-            print("📅 Criando tabela de Feriados...")
-            cur.execute("CREATE TABLE FERIADOS (ID INTEGER NOT NULL PRIMARY KEY, DATA DATE NOT NULL UNIQUE, TIPO VARCHAR(20) NOT NULL)")
-            criar_generator_e_trigger(cur, 'FERIADOS')
+def iniciar_db():
+    """
+    Leva o banco à versão atual aplicando apenas as migrações pendentes.
+    Com o banco já atualizado, custa uma única consulta à SCHEMA_VERSION.
+    Cada migração é aplicada com a trava de Backend.bloqueio_migracoes: um
+    computador que inicie junto espera, relê a versão e pula o que o outro já aplicou.
+    """
+    conn = None
+    try:
+        conn = conectar()
+        cur = conn.cursor()
 
-        conn.commit() # Salva todas as alterações de estrutura
+        versao_atual = versao_do_banco(conn, cur)
+        pendentes = [m for m in MIGRACOES if m[0] > versao_atual]
+        if not pendentes:
+            return
 
-        # --- ETAPA 2: INSERÇÃO DE DADOS PADRÃO ---
-        
-        # Insere o usuário 'admin' se a tabela estiver vazia
-        cur.execute("SELECT COUNT(*) FROM USUARIOS")
-        if cur.fetchone()[0] == 0:
-            print("👤 Inserindo usuário 'admin' padrão...")
-            senha_hash = hashlib.sha256('admin'.encode('utf-8')).hexdigest()
-            cur.execute("INSERT INTO USUARIOS (USERNAME, PASSWORD_HASH, IS_ADMIN) VALUES (?, ?, ?)", ('admin', senha_hash, 1))
-            
-        # Insere os status padrão se a tabela estiver vazia
-        cur.execute("SELECT COUNT(*) FROM STATUS")
-        if cur.fetchone()[0] == 0:
-            print("🎨 Inserindo status padrão...")
-            status_padrao = [('Pendente', '#ffc107'), ('Feito e enviado', '#28a745'), ('Feito', '#007bff'), ('Retificado', '#17a2b8'), ('Houve Algum Erro', '#dc3545'), ('Chamado', '#6f42c1'), ('Remarcado', '#fd7e14'), ('Realocado', '#6c757d')]
-            cur.executemany("INSERT INTO STATUS (NOME, COR_HEX) VALUES (?, ?)", status_padrao)
-        
-        conn.commit()
+        _preparar_schema_version(conn, cur)
+        params = _parametros_conexao()
+        for numero, descricao, migracao in pendentes:
+            with motor_atual().bloqueio_migracoes(params):
+                conn.commit() # Transação nova: enxerga o que outro computador aplicou enquanto esperávamos
+                if versao_do_banco(conn, cur) >= numero:
+                    print(f"Migração {numero} já aplicada por outro computador.")
+                    continue
+                print(f"🔧 Aplicando migração {numero}: {descricao}...")
+                migracao(conn, cur)
+                conn.commit() # DDL precisa estar confirmado antes de a versão ser registrada
+                try:
+                    cur.execute("INSERT INTO SCHEMA_VERSION (VERSAO, DESCRICAO) VALUES (?, ?)", (numero, descricao))
+                    conn.commit()
+                except ErroBanco:
+                    # Versão já gravada por quem migrou sem a trava (ex: versão anterior do programa)
+                    conn.rollback()
+                    if not _migracao_registrada(cur, numero):
+                        raise
         print("✅ Banco de dados verificado e inicializado com sucesso!")
 
-    except fdb.Error as e:
+    except ErroBanco as e:
         print(f"❌ Erro CRÍTICO durante a inicialização do banco de dados: {e}")
         if conn:
             conn.rollback()
@@ -206,6 +1282,111 @@ def iniciar_db():
 #==============================================================================
 # FUNÇÃO AUXILIAR
 #==============================================================================
+def _intervalo_mes(ano, mes):
+    """
+    Retorna (primeiro dia do mês, primeiro dia do mês seguinte) para filtros
+    no formato "DATA >= ? AND DATA < ?", que conseguem usar os índices de data.
+    """
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, fim
+
+def _intervalo_periodo(data_inicio, data_fim):
+    """
+    Converte o período fechado [data_inicio, data_fim] (date ou texto 'yyyy-MM-dd')
+    em (data_inicio, dia seguinte a data_fim), para comparar colunas TIMESTAMP sem CAST.
+    """
+    if isinstance(data_inicio, str):
+        data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date()
+    if isinstance(data_fim, str):
+        data_fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
+    return data_inicio, data_fim + timedelta(days=1)
+
+class Linha(collections.abc.Mapping):
+    """
+    Linha de resultado somente leitura: a tupla devolvida pelo driver mais um
+    mapa {NOME_COLUNA: posição} compartilhado por todas as linhas da consulta.
+    Aceita linha['CHAVE'], linha.get('CHAVE'), 'CHAVE' in linha e dict(linha),
+    como os dicionários da dict_factory, sem criar um dicionário por linha.
+    """
+    __slots__ = ('_colunas', '_valores')
+
+    def __init__(self, colunas, valores):
+        self._colunas = colunas
+        self._valores = valores
+
+    def __getitem__(self, chave):
+        return self._valores[self._colunas[chave]]
+
+    def __iter__(self):
+        return iter(self._colunas)
+
+    def __len__(self):
+        return len(self._colunas)
+
+    def __repr__(self):
+        return f"Linha({dict(self)!r})"
+
+def colunas_do_cursor(cursor):
+    """Monta o mapa {NOME_COLUNA: posição} da consulta executada no cursor (nomes em maiúsculas)."""
+    colunas = {}
+    for idx, col in enumerate(cursor.description):
+        col_name = col[0]
+        if isinstance(col_name, bytes):
+            col_name = col_name.decode('utf-8', errors='ignore')
+        colunas[col_name.upper()] = idx
+    return colunas
+
+def linhas_do_cursor(cursor):
+    """Lê todas as linhas pendentes do cursor como objetos Linha."""
+    colunas = colunas_do_cursor(cursor)
+    return [Linha(colunas, row) for row in cursor.fetchall()]
+
+TAMANHO_LOTE_FLUXO = 500
+
+def _iterar_em_lotes(cursor, tamanho_lote):
+    colunas = colunas_do_cursor(cursor)
+    while True:
+        lote = cursor.fetchmany(tamanho_lote)
+        if not lote:
+            return
+        for row in lote:
+            yield Linha(colunas, row)
+
+def consulta_tem_linhas(sql, params=()):
+    """
+    Indica se a consulta retorna ao menos uma linha, sem executá-la inteira
+    (EXISTS para na primeira linha encontrada). Útil antes de um fluxo_consulta.
+    """
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        cur.execute(f"SELECT 1 FROM RDB$DATABASE WHERE EXISTS ({sql})", params)
+        return cur.fetchone() is not None
+    finally:
+        if conn: conn.close()
+
+@contextlib.contextmanager
+def fluxo_consulta(sql, params=(), tamanho_lote=TAMANHO_LOTE_FLUXO):
+    """
+    Executa a consulta e entrega um gerador de Linha lido do cursor aberto em
+    lotes de 'tamanho_lote' (fetchmany), em vez de montar a lista inteira.
+    O gerador só pode ser consumido dentro do bloco with; ao sair dele a
+    conexão volta ao pool.
+
+        with fluxo_consulta(sql, params) as linhas:
+            for linha in linhas: ...
+    """
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        yield _iterar_em_lotes(cur, tamanho_lote)
+    finally:
+        if conn: conn.close()
+
 def dict_factory(cursor, row):
     """
     Converte uma tupla de resultado do Firebird em um dicionário.
@@ -233,54 +1414,158 @@ def dict_factory(cursor, row):
 # LOGS
 #==============================================================================
 def registrar_log(usuario_nome, acao, detalhes):
+    """
+    Registra uma entrada em LOGS.
+    Com o escritor de auditoria ativo, a entrada vai para a fila em memória e é
+    gravada em lote em segundo plano (dentro de uma unidade de trabalho, só
+    entra na fila depois do commit). Sem ele, o INSERT é feito na hora, na
+    mesma conexão e no mesmo commit da operação que está sendo registrada.
+    """
+    escritor = _escritor_auditoria
+    if escritor is not None and escritor.is_alive():
+        entrada = (datetime.now(), usuario_nome, acao, detalhes)
+        trans = transacao_ativa()
+        if trans is not None:
+            trans.apos_confirmar(lambda: escritor.enfileirar(entrada))
+        else:
+            escritor.enfileirar(entrada)
+        return
+
     sql = "INSERT INTO LOGS (USUARIO_NOME, ACAO, DETALHES) VALUES (?, ?, ?)"
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (usuario_nome, acao, detalhes))
-        conn.commit()
-    except fdb.Error as e:
+        with transacao(alterar_versao=False) as trans:
+            trans.cursor().execute(sql, (usuario_nome, acao, detalhes))
+    except ErroBanco as e:
         print(f"Erro ao registrar log: {e}")
-    finally:
-        if conn: conn.close()
+
+class EscritorAuditoria(threading.Thread):
+    """
+    Thread que grava as entradas de LOGS em lotes (executemany), sempre que
+    junta 'tamanho_lote' entradas ou a cada 'intervalo' segundos.
+    A fila é limitada: quando está cheia, quem registra o log espera até
+    'espera_maxima' segundos por uma vaga e, se ainda assim não houver, grava
+    a entrada diretamente para não perdê-la.
+    """
+    SQL = "INSERT INTO LOGS (DATAHORA, USUARIO_NOME, ACAO, DETALHES) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, tamanho_lote=50, intervalo=2.0, capacidade=1000, espera_maxima=5.0):
+        super().__init__(name="EscritorAuditoria", daemon=True)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._parar = threading.Event()
+
+    def enfileirar(self, entrada):
+        try:
+            self._fila.put(entrada, timeout=self.espera_maxima)
+        except queue.Full:
+            print("⚠️ Fila de auditoria cheia. Gravando o log diretamente.")
+            self._gravar([entrada])
+
+    def run(self):
+        while not (self._parar.is_set() and self._fila.empty()):
+            lote = self._coletar_lote()
+            if lote:
+                self._gravar(lote)
+
+    def parar(self, timeout=10):
+        """Pede a gravação do que restou na fila e aguarda a thread terminar."""
+        self._parar.set()
+        self.join(timeout)
+        # Entradas que chegaram enquanto a thread terminava são gravadas aqui mesmo
+        resto = []
+        while True:
+            try:
+                resto.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        if resto:
+            self._gravar(resto)
+
+    def _coletar_lote(self):
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            try:
+                if self._parar.is_set():
+                    lote.append(self._fila.get_nowait())
+                else:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    # Acorda periodicamente para perceber um pedido de parada
+                    lote.append(self._fila.get(timeout=min(restante, 0.5)))
+            except queue.Empty:
+                if self._parar.is_set():
+                    break
+        return lote
+
+    def _gravar(self, lote):
+        """
+        Grava o lote em uma transação, tentando de novo uma vez se falhar.
+        Se ainda assim falhar, grava entrada por entrada, para que uma linha
+        com problema não leve o lote inteiro junto.
+        """
+        for tentativa in range(2):
+            try:
+                with transacao(alterar_versao=False) as trans:
+                    trans.cursor().executemany(self.SQL, lote)
+                return
+            except ErroBanco as e:
+                print(f"Erro ao gravar lote de {len(lote)} logs (tentativa {tentativa + 1}): {e}")
+        for entrada in lote:
+            try:
+                with transacao(alterar_versao=False) as trans:
+                    trans.cursor().execute(self.SQL, entrada)
+            except ErroBanco as e:
+                print(f"Erro ao gravar log {entrada!r}: {e}")
+
+_escritor_auditoria = None
+
+def iniciar_escritor_auditoria():
+    """Passa a gravar os logs em segundo plano. Chamada uma vez após o login."""
+    global _escritor_auditoria
+    if _escritor_auditoria is None or not _escritor_auditoria.is_alive():
+        _escritor_auditoria = EscritorAuditoria()
+        _escritor_auditoria.start()
+
+def parar_escritor_auditoria():
+    """Grava os logs pendentes e encerra o escritor. Chamada ao fechar o programa."""
+    global _escritor_auditoria
+    escritor = _escritor_auditoria
+    _escritor_auditoria = None
+    if escritor is not None:
+        escritor.parar()
 
 def adicionar_feriado(data_str, tipo):
     """Adiciona ou atualiza um feriado no banco de dados."""
-    # Tenta remover primeiro para evitar duplicatas e permitir a troca de tipo (ex: de municipal para nacional)
-    remover_feriado(data_str)
     sql = "INSERT INTO FERIADOS (DATA, TIPO) VALUES (?, ?)"
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (data_str, tipo))
-        conn.commit()
-    except fdb.Error as e:
+        with transacao() as trans:
+            # Remove primeiro para evitar duplicatas e permitir a troca de tipo (ex: de municipal para nacional)
+            remover_feriado(data_str)
+            trans.cursor().execute(sql, (data_str, tipo))
+            trans.apos_confirmar(_calendario_uteis.invalidar)
+    except ErroBanco as e:
+        if transacao_ativa() is not None:
+            raise
         print(f"Erro ao adicionar feriado: {e}")
-    finally:
-        if conn: conn.close()
 
 def remover_feriado(data_str):
     """Remove um feriado do banco de dados."""
     sql = "DELETE FROM FERIADOS WHERE DATA = ?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (data_str,))
-        conn.commit()
-    finally:
-        if conn: conn.close()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (data_str,))
+        trans.apos_confirmar(_calendario_uteis.invalidar)
 
 def get_feriados_do_mes(ano, mes):
     """Busca todos os feriados de um determinado mês e ano."""
-    sql = "SELECT DATA, TIPO FROM FERIADOS WHERE EXTRACT(YEAR FROM DATA) = ? AND EXTRACT(MONTH FROM DATA) = ?"
+    sql = "SELECT DATA, TIPO FROM FERIADOS WHERE DATA >= ? AND DATA < ?"
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
+        conn = conectar_leitura()
+        cur = conn.executar(sql, _intervalo_mes(ano, mes))
         # Retorna um dicionário no formato {QDate: 'tipo'}
         return {QDate(row[0].year, row[0].month, row[0].day): row[1] for row in cur.fetchall()}
     finally:
@@ -290,24 +1575,225 @@ def is_dia_invalido(data_qdate):
     """
     Função central que verifica se uma data é fim de semana OU feriado nacional.
     Retorna True se for um dia inválido para agendamento, False caso contrário.
+    Respondida pelo calendário de dias úteis em memória (ver CalendarioUteis).
     """
-    # 1. Verifica se é Sábado (6) ou Domingo (7)
-    if data_qdate.dayOfWeek() >= 6:
-        return True
-    
-    # 2. Verifica no banco de dados se é um feriado do tipo 'nacional'
-    sql = "SELECT ID FROM FERIADOS WHERE DATA = ? AND TIPO = 'nacional'"
+    return not _calendario_uteis.is_dia_util(data_qdate)
+
+#==============================================================================
+# CALENDÁRIO DE DIAS ÚTEIS
+#==============================================================================
+def _para_date(dia):
+    return dia.toPyDate() if isinstance(dia, QDate) else dia
+
+class CalendarioUteis:
+    """
+    Responde da memória se um dia é útil (segunda a sexta, fora dos feriados
+    nacionais). Os feriados de vários anos em torno do ano atual são lidos em
+    uma única consulta; anos fora dessa faixa são lidos quando pedidos.
+    É invalidado por adicionar_feriado/remover_feriado e, como outros
+    computadores podem alterar os feriados, expira após 'validade_segundos'.
+    """
+    def __init__(self, anos_antes=1, anos_depois=2, validade_segundos=300):
+        self.anos_antes = anos_antes
+        self.anos_depois = anos_depois
+        self.validade_segundos = validade_segundos
+        self._lock = threading.Lock()
+        self._carregado_em = None
+        self._anos = set()      # Anos cujos feriados já estão em _feriados
+        self._feriados = set()  # date de cada feriado nacional
+        self._geracao = 0       # Muda a cada invalidação; evita guardar uma carga feita antes dela
+
+    def _carregar(self, ano_inicio, ano_fim):
+        sql = "SELECT DATA FROM FERIADOS WHERE DATA >= ? AND DATA < ? AND TIPO = 'nacional'"
+        conn = None
+        try:
+            conn = conectar_leitura()
+            cur = conn.executar(sql, (date(ano_inicio, 1, 1), date(ano_fim + 1, 1, 1)))
+            return {row[0] for row in cur.fetchall()}
+        finally:
+            if conn: conn.close()
+
+    def _feriados_do_ano(self, ano):
+        """Feriados nacionais em memória, garantindo que os de 'ano' já foram lidos."""
+        with self._lock:
+            if self._carregado_em is not None and time.monotonic() - self._carregado_em >= self.validade_segundos:
+                self._anos, self._feriados, self._carregado_em = set(), set(), None
+            if ano in self._anos:
+                return self._feriados
+            geracao = self._geracao
+            if self._anos:
+                ano_inicio = ano_fim = ano
+            else:
+                atual = date.today().year
+                ano_inicio, ano_fim = min(ano, atual - self.anos_antes), max(ano, atual + self.anos_depois)
+
+        feriados = self._carregar(ano_inicio, ano_fim)
+        with self._lock:
+            if geracao != self._geracao:
+                return feriados # Invalidado durante a leitura: usa, mas não guarda
+            if not self._anos:
+                self._carregado_em = time.monotonic()
+            self._feriados = self._feriados | feriados
+            self._anos.update(range(ano_inicio, ano_fim + 1))
+            return self._feriados
+
+    def invalidar(self):
+        """Descarta os feriados em memória; a próxima pergunta os lê de novo."""
+        with self._lock:
+            self._geracao += 1
+            self._anos, self._feriados, self._carregado_em = set(), set(), None
+
+    def is_dia_util(self, dia):
+        """'dia' (date ou QDate) é de segunda a sexta e não é feriado nacional?"""
+        dia = _para_date(dia)
+        return dia.weekday() < 5 and dia not in self._feriados_do_ano(dia.year)
+
+    def proximo_dia_util(self, dia):
+        """O próprio 'dia', se for útil, ou o primeiro dia útil depois dele (no mesmo tipo: date ou QDate)."""
+        atual = _para_date(dia)
+        while not self.is_dia_util(atual):
+            atual += timedelta(days=1)
+        return QDate(atual.year, atual.month, atual.day) if isinstance(dia, QDate) else atual
+
+    def dias_uteis_entre(self, inicio, fim):
+        """Quantidade de dias úteis no intervalo [inicio, fim) (date ou QDate)."""
+        atual, fim = _para_date(inicio), _para_date(fim)
+        total = 0
+        while atual < fim:
+            if self.is_dia_util(atual):
+                total += 1
+            atual += timedelta(days=1)
+        return total
+
+_calendario_uteis = CalendarioUteis()
+configuracoes.ao_invalidar(_calendario_uteis.invalidar) # Outro banco pode ter sido configurado
+
+def is_dia_util(dia):
+    return _calendario_uteis.is_dia_util(dia)
+
+def proximo_dia_util(dia):
+    return _calendario_uteis.proximo_dia_util(dia)
+
+def dias_uteis_entre(inicio, fim):
+    return _calendario_uteis.dias_uteis_entre(inicio, fim)
+
+def invalidar_calendario_uteis():
+    """Descarta os feriados em memória. Usada quando outro computador avisa que alterou FERIADOS."""
+    _calendario_uteis.invalidar()
+
+#==============================================================================
+# CACHE DE DADOS DE REFERÊNCIA (STATUS, USUÁRIOS, CLIENTES)
+#==============================================================================
+class CacheReferencia:
+    """
+    Guarda em memória tabelas pequenas e muito consultadas pelas telas.
+    Cada entrada expira após 'validade_segundos' (outros computadores podem alterar
+    o banco remoto) e é descartada na hora quando uma escrita feita por este módulo
+    a altera (ver _invalidar_referencia).
+    """
+    def __init__(self, validade_segundos=300):
+        self.validade_segundos = validade_segundos
+        self._lock = threading.Lock()
+        self._itens = {}    # nome -> (instante da carga, valor)
+        self._geracao = 0   # muda a cada invalidação; evita guardar uma carga feita antes dela
+
+    def obter(self, nome, carregar):
+        with self._lock:
+            item = self._itens.get(nome)
+            if item is not None and time.monotonic() - item[0] < self.validade_segundos:
+                return item[1]
+            geracao = self._geracao
+        valor = carregar()
+        with self._lock:
+            if geracao == self._geracao:
+                self._itens[nome] = (time.monotonic(), valor)
+        return valor
+
+    def invalidar(self, *nomes):
+        """Descarta as entradas informadas (ou todas, se nenhuma for informada)."""
+        with self._lock:
+            self._geracao += 1
+            if not nomes:
+                self._itens.clear()
+            for nome in nomes:
+                self._itens.pop(nome, None)
+
+_cache_referencia = CacheReferencia()
+configuracoes.ao_invalidar(_cache_referencia.invalidar) # Outro banco pode ter sido configurado
+
+def _invalidar_referencia(*nomes):
+    """
+    Invalida o cache após uma escrita. Dentro de uma transação, espera o commit:
+    invalidar antes permitiria que outra thread recarregasse os dados antigos.
+    """
+    trans = transacao_ativa()
+    if trans is not None:
+        trans.apos_confirmar(lambda: _cache_referencia.invalidar(*nomes))
+    else:
+        _cache_referencia.invalidar(*nomes)
+
+def invalidar_cache_referencia(*nomes):
+    """
+    Descarta dados de referência ('status', 'usuarios', 'clientes'; todos se nenhum
+    for informado). Usada quando outro computador avisa que alterou essas tabelas.
+    """
+    _cache_referencia.invalidar(*nomes)
+
+def _carregar_status():
+    sql = "SELECT ID, NOME, COR_HEX FROM STATUS ORDER BY ID"
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
-        cur.execute(sql, (data_qdate.toString("yyyy-MM-dd"),))
-        if cur.fetchone():
-            return True # Encontrou um feriado nacional
+        cur.execute(sql)
+        lista = linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
-        
-    return False # Se não for fim de semana nem feriado, é um dia útil
+    por_id = {s['ID']: s for s in lista}
+    por_nome = {s['NOME'].strip().upper(): s for s in lista}
+    return lista, por_id, por_nome
+
+def _carregar_usuarios():
+    sql = "SELECT USERNAME FROM USUARIOS ORDER BY USERNAME"
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        cur.execute(sql)
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        if conn: conn.close()
+
+def _carregar_clientes():
+    sql = "SELECT * FROM CLIENTES ORDER BY NOME"
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        cur.execute(sql)
+        lista = linhas_do_cursor(cur)
+    finally:
+        if conn: conn.close()
+    return lista, {c['ID']: c['NOME'] for c in lista}
+
+def get_status_por_id(status_id):
+    """Retorna uma cópia do status (ID, NOME, COR_HEX) ou None."""
+    status = _cache_referencia.obter('status', _carregar_status)[1].get(status_id)
+    return dict(status) if status else None
+
+def get_status_por_nome(nome):
+    """Busca o status pelo nome, sem diferenciar maiúsculas/minúsculas nem espaços nas pontas."""
+    status = _cache_referencia.obter('status', _carregar_status)[2].get(nome.strip().upper())
+    return dict(status) if status else None
+
+def get_id_status_pendente():
+    """Retorna o ID do status 'Pendente' (ou None se ele não existir)."""
+    status = get_status_por_nome('Pendente')
+    return status['ID'] if status else None
+
+def get_nomes_clientes():
+    """Retorna {ID do cliente: nome}."""
+    return dict(_cache_referencia.obter('clientes', _carregar_clientes)[1])
 
 #==============================================================================
 # USUÁRIOS
@@ -318,7 +1804,7 @@ def verificar_usuario(username, password):
     sql = "SELECT ID, USERNAME, IS_ADMIN FROM USUARIOS WHERE USERNAME = ? AND PASSWORD_HASH = ?" # <-- ALTERADO
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql, (username.strip(), senha_hash))
         return dict_factory(cur, cur.fetchone())
@@ -326,22 +1812,14 @@ def verificar_usuario(username, password):
         if conn: conn.close()
 
 def listar_usuarios():
-    sql = "SELECT USERNAME FROM USUARIOS ORDER BY USERNAME"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql)
-        return [row[0] for row in cur.fetchall()]
-    finally:
-        if conn: conn.close()
+    return list(_cache_referencia.obter('usuarios', _carregar_usuarios))
         
 def get_usuario_por_nome(username):
     # Adicionamos IS_ADMIN ao SELECT
     sql = "SELECT ID, USERNAME, IS_ADMIN FROM USUARIOS WHERE USERNAME = ?" # <-- ALTERADO
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql, (username,))
         return dict_factory(cur, cur.fetchone())
@@ -357,51 +1835,39 @@ def criar_usuario(username, password, is_admin, usuario_logado): # <-- NOVO PAR
     senha_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
     # Adicionamos IS_ADMIN ao INSERT
     sql = "INSERT INTO USUARIOS (USERNAME, PASSWORD_HASH, IS_ADMIN) VALUES (?, ?, ?)" # <-- ALTERADO
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (username, senha_hash, 1 if is_admin else 0)) # <-- ALTERADO
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (username, senha_hash, 1 if is_admin else 0)) # <-- ALTERADO
         detalhes = f"Usuário '{username}' criado."
         if is_admin:
             detalhes += " (Como Administrador)"
         registrar_log(usuario_logado, "CRIAR_USUARIO", detalhes)
-        return True
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('usuarios')
+    return True
 
 def atualizar_usuario(user_id, novo_username, nova_senha, is_admin, usuario_logado): # <-- NOVO PARÂMETRO
     senha_hash = hashlib.sha256(nova_senha.encode('utf-8')).hexdigest()
     # Adicionamos IS_ADMIN ao UPDATE
     sql = "UPDATE USUARIOS SET USERNAME = ?, PASSWORD_HASH = ?, IS_ADMIN = ? WHERE ID = ?" # <-- ALTERADO
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (novo_username, senha_hash, 1 if is_admin else 0, user_id)) # <-- ALTERADO
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (novo_username, senha_hash, 1 if is_admin else 0, user_id)) # <-- ALTERADO
         detalhes = f"Usuário ID {user_id} atualizado para '{novo_username}'."
         if is_admin:
             detalhes += " (Status de Administrador Concedido)"
         registrar_log(usuario_logado, "ATUALIZAR_USUARIO", detalhes)
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('usuarios')
 
 def deletar_usuario(user_id, usuario_logado):
     sql = "DELETE FROM USUARIOS WHERE ID = ?"
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (user_id,))
-        conn.commit()
-        registrar_log(usuario_logado, "DELETAR_USUARIO", f"Usuário ID {user_id} excluído.")
+        with transacao() as trans:
+            trans.cursor().execute(sql, (user_id,))
+            registrar_log(usuario_logado, "DELETAR_USUARIO", f"Usuário ID {user_id} excluído.")
+            _invalidar_referencia('usuarios')
         return True
-    except fdb.Error:
+    except ErroBanco:
+        if transacao_ativa() is not None:
+            raise
         return False
-    finally:
-        if conn: conn.close()
 
 def get_admin_count():
     """
@@ -410,12 +1876,12 @@ def get_admin_count():
     sql = "SELECT COUNT(ID) FROM USUARIOS WHERE IS_ADMIN = 1"
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql)
         # Retorna o primeiro (e único) resultado da contagem
         return cur.fetchone()[0]
-    except fdb.Error as e:
+    except ErroBanco as e:
         print(f"Erro ao contar administradores: {e}")
         return 0 # Em caso de erro, retorna 0 para segurança
     finally:
@@ -427,7 +1893,7 @@ def get_total_clientes():
     sql = "SELECT COUNT(*) FROM CLIENTES"
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql)
         return cur.fetchone()[0]
@@ -435,127 +1901,119 @@ def get_total_clientes():
         if conn: conn.close()
 
 def listar_clientes():
-    sql = "SELECT * FROM CLIENTES ORDER BY NOME"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
-    finally:
-        if conn: conn.close()
+    # Cópias: as telas costumam acrescentar chaves aos dicionários recebidos
+    return [dict(c) for c in _cache_referencia.obter('clientes', _carregar_clientes)[0]]
 
 def adicionar_cliente(nome, tipo_envio, contato, gera_recibo, conta_xmls, nivel, detalhes, numero_computadores, telefone1, telefone2, usuario_logado):
     sql = "INSERT INTO CLIENTES (NOME, TIPO_ENVIO, CONTATO, GERA_RECIBO, CONTA_XMLS, NIVEL, OUTROS_DETALHES, NUMERO_COMPUTADORES, TELEFONE1, TELEFONE2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (nome, tipo_envio, contato, 1 if gera_recibo else 0, 1 if conta_xmls else 0, nivel, detalhes, numero_computadores, telefone1, telefone2))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (nome, tipo_envio, contato, 1 if gera_recibo else 0, 1 if conta_xmls else 0, nivel, detalhes, numero_computadores, telefone1, telefone2))
         registrar_log(usuario_logado, "CRIAR_CLIENTE", f"Cliente '{nome}' adicionado.")
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('clientes')
+
+def adicionar_clientes_em_lote(clientes, usuario_logado, tamanho_lote=500):
+    """
+    Importa muitos clientes de uma vez. Os registros são inseridos em lotes de
+    'tamanho_lote' com executemany, cada lote em uma transação. Se o banco
+    recusar algum registro, aquele lote é refeito linha a linha para que só os
+    registros com problema fiquem de fora.
+    Cada item de 'clientes' usa as mesmas chaves de adicionar_cliente.
+    Retorna (quantidade_importada, [(indice_em_clientes, motivo), ...]).
+    Grava um único log de resumo ao final.
+    """
+    if transacao_ativa() is not None:
+        # Cada lote precisa da própria transação para poder ser refeito em caso de erro
+        raise RuntimeError("adicionar_clientes_em_lote não pode ser chamada dentro de uma transação aberta.")
+
+    sql = "INSERT INTO CLIENTES (NOME, TIPO_ENVIO, CONTATO, GERA_RECIBO, CONTA_XMLS, NIVEL, OUTROS_DETALHES, NUMERO_COMPUTADORES, TELEFONE1, TELEFONE2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    importados = 0
+    rejeitados = []
+    for inicio in range(0, len(clientes), tamanho_lote):
+        linhas = [
+            (c['nome'], c['tipo_envio'], c['contato'], 1 if c.get('gera_recibo') else 0, 1 if c.get('conta_xmls') else 0,
+             c.get('nivel'), c.get('detalhes'), int(c.get('numero_computadores') or 0), c.get('telefone1'), c.get('telefone2'))
+            for c in clientes[inicio:inicio + tamanho_lote]
+        ]
+        try:
+            with transacao() as trans:
+                trans.cursor().executemany(sql, linhas)
+            importados += len(linhas)
+        except ErroBanco:
+            # O lote inteiro foi desfeito: refaz linha a linha para isolar os registros recusados
+            with transacao() as trans:
+                cur = trans.cursor()
+                for deslocamento, linha in enumerate(linhas):
+                    try:
+                        cur.execute(sql, linha)
+                        importados += 1
+                    except ErroBanco as e:
+                        rejeitados.append((inicio + deslocamento, f"Recusado pelo banco de dados: {e}"))
+
+    if importados:
+        _invalidar_referencia('clientes')
+        detalhes = f"{importados} clientes importados em lote."
+        if rejeitados:
+            detalhes += f" {len(rejeitados)} registros recusados pelo banco de dados."
+        registrar_log(usuario_logado, "IMPORTAR_CLIENTES", detalhes)
+    return importados, rejeitados
 
 def atualizar_cliente(cliente_id, nome, tipo_envio, contato, gera_recibo, conta_xmls, nivel, detalhes, numero_computadores, telefone1, telefone2, usuario_logado):
     sql = "UPDATE CLIENTES SET NOME=?, TIPO_ENVIO=?, CONTATO=?, GERA_RECIBO=?, CONTA_XMLS=?, NIVEL=?, OUTROS_DETALHES=?, NUMERO_COMPUTADORES=?, TELEFONE1=?, TELEFONE2=? WHERE ID=?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (nome, tipo_envio, contato, 1 if gera_recibo else 0, 1 if conta_xmls else 0, nivel, detalhes, numero_computadores, telefone1, telefone2, cliente_id))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (nome, tipo_envio, contato, 1 if gera_recibo else 0, 1 if conta_xmls else 0, nivel, detalhes, numero_computadores, telefone1, telefone2, cliente_id))
         registrar_log(usuario_logado, "ATUALIZAR_CLIENTE", f"Cliente '{nome}' (ID: {cliente_id}) atualizado.")
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('clientes')
 
 def deletar_cliente(cliente_id, usuario_logado):
     sql = "DELETE FROM CLIENTES WHERE ID = ?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (cliente_id,))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (cliente_id,))
         registrar_log(usuario_logado, "DELETAR_CLIENTE", f"Cliente ID {cliente_id} excluído.")
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('clientes')
 
 #==============================================================================
 # STATUS
 #==============================================================================
 def listar_status():
-    sql = "SELECT ID, NOME, COR_HEX FROM STATUS ORDER BY ID"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
-    finally:
-        if conn: conn.close()
+    return [dict(s) for s in _cache_referencia.obter('status', _carregar_status)[0]]
 
 def adicionar_status(nome, cor_hex, usuario_logado):
     sql = "INSERT INTO STATUS (NOME, COR_HEX) VALUES (?, ?)"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (nome, cor_hex))
-        conn.commit()
-        registrar_log(usuario_logado, "CRIAR_STATUS", f"Status '{nome}' criado.")
-    finally:
-        if conn: conn.close()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (nome, cor_hex))
+        registrar_log(usuario_logado, "CRIAR_STATUS", f"Status '{nome}' criado.")
+        _invalidar_referencia('status')
 
 def atualizar_status(status_id, nome, cor_hex, usuario_logado):
     sql = "UPDATE STATUS SET NOME = ?, COR_HEX = ? WHERE ID = ?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (nome, cor_hex, status_id))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (nome, cor_hex, status_id))
         registrar_log(usuario_logado, "ATUALIZAR_STATUS", f"Status '{nome}' (ID: {status_id}) atualizado.")
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('status')
 
 def deletar_status(status_id, usuario_logado):
     sql = "DELETE FROM STATUS WHERE ID = ?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (status_id,))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (status_id,))
         registrar_log(usuario_logado, "DELETAR_STATUS", f"Status ID {status_id} excluído.")
-    finally:
-        if conn: conn.close()
+        _invalidar_referencia('status')
 
 #==============================================================================
 # ENTREGAS / AGENDAMENTOS
 #==============================================================================
 def adicionar_entrega(data, horario, status_id, cliente_id, responsavel, observacoes, is_retificacao, usuario_logado, tipo_atendimento='AGENDADO'):
     sql = "INSERT INTO ENTREGAS (DATA_VENCIMENTO, HORARIO, STATUS_ID, CLIENTE_ID, RESPONSAVEL, OBSERVACOES, IS_RETIFICACAO, TIPO_ATENDIMENTO) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (data, horario, status_id, cliente_id, responsavel, observacoes, 1 if is_retificacao else 0, tipo_atendimento))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (data, horario, status_id, cliente_id, responsavel, observacoes, 1 if is_retificacao else 0, tipo_atendimento))
         registrar_log(usuario_logado, "CRIAR_AGENDAMENTO", f"Agendamento para cliente ID {cliente_id} em {data} às {horario}.")
-    finally:
-        if conn: conn.close()
 
 def atualizar_entrega(entrega_id, horario, status_id, cliente_id, responsavel, observacoes, is_retificacao, usuario_logado, tipo_atendimento):
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
+    with transacao() as trans:
+        cur = trans.cursor()
 
         # Descobre o nome do novo status para a lógica de conclusão
-        cur.execute("SELECT NOME FROM STATUS WHERE ID = ?", (status_id,))
-        status_result = cur.fetchone()
-        status_nome = status_result[0].lower() if status_result else ""
+        status = get_status_por_id(status_id)
+        status_nome = status['NOME'].lower() if status else ""
 
         # Verifica se o status é um dos que marcam a tarefa como concluída
         is_status_concluido = 'feito' in status_nome or 'retificado' in status_nome
@@ -570,25 +2028,15 @@ def atualizar_entrega(entrega_id, horario, status_id, cliente_id, responsavel, o
 
         # Executa a atualização
         cur.execute(sql, (horario, status_id, cliente_id, responsavel, observacoes, 1 if is_retificacao else 0, tipo_atendimento, entrega_id))
-        conn.commit()
 
-        # Registra o log da operação
+        # Registra o log da operação na mesma transação
         registrar_log(usuario_logado, "ATUALIZAR_AGENDAMENTO", f"Agendamento ID {entrega_id} atualizado.")
-    finally:
-        if conn:
-            conn.close()
 
 def deletar_entrega(entrega_id, usuario_logado):
     sql = "DELETE FROM ENTREGAS WHERE ID = ?"
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (entrega_id,))
-        conn.commit()
+    with transacao() as trans:
+        trans.cursor().execute(sql, (entrega_id,))
         registrar_log(usuario_logado, "DELETAR_AGENDAMENTO", f"Agendamento ID {entrega_id} excluído.")
-    finally:
-        if conn: conn.close()
 
 def get_entregas_por_dia(data_str):
     sql = """
@@ -604,15 +2052,9 @@ def get_entregas_por_dia(data_str):
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (data_str,))
-        entregas = {}
-        for row in cur.fetchall():
-            entrega_dict = dict_factory(cur, row)
-            if entrega_dict:
-                entregas[entrega_dict['HORARIO']] = entrega_dict
-        return entregas
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (data_str,))
+        return {entrega['HORARIO']: entrega for entrega in linhas_do_cursor(cur)}
     finally:
         if conn: conn.close()
 
@@ -627,81 +2069,102 @@ def get_solicitados_do_mes(ano, mes):
         FROM ENTREGAS e
         JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
         LEFT JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE EXTRACT(YEAR FROM e.DATA_VENCIMENTO) = ? AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
+        WHERE e.DATA_VENCIMENTO >= ? AND e.DATA_VENCIMENTO < ?
         AND e.TIPO_ATENDIMENTO = 'SOLICITADO'
         ORDER BY e.DATA_VENCIMENTO DESC, e.HORARIO DESC
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        conn = conectar_leitura()
+        cur = conn.executar(sql, _intervalo_mes(ano, mes))
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
+
+def _remover_pendentes_futuros(cur, cliente_id, status_pendente_id):
+    """Remove os agendamentos futuros pendentes do cliente e retorna quantos foram removidos."""
+    cur.execute("DELETE FROM ENTREGAS WHERE CLIENTE_ID = ? AND STATUS_ID = ? AND DATA_VENCIMENTO > CURRENT_DATE", (cliente_id, status_pendente_id))
+    return cur.rowcount
+
 def limpar_agendamentos_futuros_pendentes(cliente_id, usuario_logado):
     """
     Exclui todos os agendamentos FUTUROS com status 'Pendente' para um cliente específico.
     Isso evita a duplicação ao atualizar uma regra de recorrência.
     """
-    sql_status = "SELECT ID FROM STATUS WHERE UPPER(NOME) = 'PENDENTE'"
-    sql_delete = "DELETE FROM ENTREGAS WHERE CLIENTE_ID = ? AND STATUS_ID = ? AND DATA_VENCIMENTO > CURRENT_DATE"
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        
-        cur.execute(sql_status)
-        resultado_status = cur.fetchone()
-        if not resultado_status:
-            print("⚠️ Status 'Pendente' não encontrado. Não foi possível limpar agendamentos.")
-            return
-
-        status_pendente_id = resultado_status[0]
-        
-        cur.execute(sql_delete, (cliente_id, status_pendente_id))
-        conn.commit()
-        
-        if cur.rowcount > 0:
-            registrar_log(usuario_logado, "LIMPEZA_RECORRENCIA", f"{cur.rowcount} agendamentos futuros pendentes do cliente ID {cliente_id} foram removidos.")
+        with transacao() as trans:
+            cur = trans.cursor()
+            status_pendente_id = get_id_status_pendente()
+            if status_pendente_id is None:
+                print("⚠️ Status 'Pendente' não encontrado. Não foi possível limpar agendamentos.")
+                return
+
+            removidos = _remover_pendentes_futuros(cur, cliente_id, status_pendente_id)
             
-    except fdb.Error as e:
+            if removidos > 0:
+                registrar_log(usuario_logado, "LIMPEZA_RECORRENCIA", f"{removidos} agendamentos futuros pendentes do cliente ID {cliente_id} foram removidos.")
+            
+    except ErroBanco as e:
+        if transacao_ativa() is not None:
+            raise
         print(f"Erro ao limpar agendamentos futuros: {e}")
-    finally:
-        if conn: conn.close()
+
+def adicionar_entregas_em_lote(entregas):
+    """
+    Insere várias entregas de uma vez (um único executemany, uma única transação).
+    Cada item é um dicionário com as chaves: data, horario, status_id, cliente_id,
+    responsavel, observacoes e, opcionalmente, is_retificacao e tipo_atendimento.
+    Não grava log: quem chama registra um resumo da operação.
+    Retorna a quantidade de entregas inseridas.
+    """
+    if not entregas:
+        return 0
+    sql = "INSERT INTO ENTREGAS (DATA_VENCIMENTO, HORARIO, STATUS_ID, CLIENTE_ID, RESPONSAVEL, OBSERVACOES, IS_RETIFICACAO, TIPO_ATENDIMENTO) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    linhas = [
+        (e['data'], e['horario'], e['status_id'], e['cliente_id'], e['responsavel'], e['observacoes'],
+         1 if e.get('is_retificacao') else 0, e.get('tipo_atendimento', 'AGENDADO'))
+        for e in entregas
+    ]
+    with transacao() as trans:
+        trans.cursor().executemany(sql, linhas)
+    return len(linhas)
 
 def criar_agendamentos_recorrentes(agendamentos_para_criar, usuario_logado):
     """
     Recebe uma lista de agendamentos já validados (com data, hora, etc.) e os insere no banco.
+    A limpeza dos pendentes futuros, a inserção em lote e um único log de resumo
+    são feitos na mesma transação.
     """
     if not agendamentos_para_criar:
         return
         
     cliente_id = agendamentos_para_criar[0]['cliente_id']
     
-    # Primeiro, limpa os agendamentos pendentes futuros para este cliente
-    limpar_agendamentos_futuros_pendentes(cliente_id, usuario_logado)
-
-    conn = conectar()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT ID FROM STATUS WHERE UPPER(NOME) = 'PENDENTE'")
-    status_pendente_id = cur.fetchone()[0]
-
-    for agendamento in agendamentos_para_criar:
-        adicionar_entrega(
-            data=agendamento['data'],
-            horario=agendamento['hora'],
-            status_id=status_pendente_id,
-            cliente_id=cliente_id,
-            responsavel=usuario_logado,
-            observacoes=agendamento['obs'],
-            is_retificacao=False,
-            usuario_logado=usuario_logado
-        )
-
-    conn.close()
-    registrar_log(usuario_logado, "CRIAR_RECORRENCIA", f"Criados {len(agendamentos_para_criar)} agendamentos recorrentes para o cliente ID {cliente_id}.")
+    with transacao() as trans:
+        cur = trans.cursor()
+        status_pendente_id = get_id_status_pendente()
+        if status_pendente_id is None:
+            raise LookupError("Status 'Pendente' não encontrado. Não foi possível criar a recorrência.")
+
+        # Primeiro, limpa os agendamentos pendentes futuros para este cliente
+        removidos = _remover_pendentes_futuros(cur, cliente_id, status_pendente_id)
+
+        criados = adicionar_entregas_em_lote([
+            {
+                'data': agendamento['data'],
+                'horario': agendamento['hora'],
+                'status_id': status_pendente_id,
+                'cliente_id': cliente_id,
+                'responsavel': usuario_logado,
+                'observacoes': agendamento['obs'],
+            }
+            for agendamento in agendamentos_para_criar
+        ])
+
+        detalhes = f"Criados {criados} agendamentos recorrentes para o cliente ID {cliente_id}."
+        if removidos > 0:
+            detalhes += f" {removidos} agendamentos futuros pendentes foram substituídos."
+        registrar_log(usuario_logado, "CRIAR_RECORRENCIA", detalhes)
 
 def limpar_agendamentos_futuros_cliente(cliente_id, usuario_logado):
     """
@@ -711,25 +2174,22 @@ def limpar_agendamentos_futuros_cliente(cliente_id, usuario_logado):
     # A condição DATA_VENCIMENTO >= CURRENT_DATE garante que apenas agendamentos
     # de hoje em diante sejam removidos.
     sql = "DELETE FROM ENTREGAS WHERE CLIENTE_ID = ? AND DATA_VENCIMENTO >= CURRENT_DATE"
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (cliente_id,))
-        conn.commit()
-        
-        # Registra no log quantos agendamentos foram removidos para auditoria
-        if cur.rowcount > 0:
-            registrar_log(usuario_logado, "LIMPEZA_AGENDAMENTOS", f"{cur.rowcount} agendamentos futuros do cliente ID {cliente_id} foram removidos.")
-        return cur.rowcount # Retorna o número de linhas afetadas
+        with transacao() as trans:
+            cur = trans.cursor()
+            cur.execute(sql, (cliente_id,))
+            removidos = cur.rowcount
             
-    except fdb.Error as e:
+            # Registra no log quantos agendamentos foram removidos para auditoria
+            if removidos > 0:
+                registrar_log(usuario_logado, "LIMPEZA_AGENDAMENTOS", f"{removidos} agendamentos futuros do cliente ID {cliente_id} foram removidos.")
+        return removidos # Retorna o número de linhas afetadas
+            
+    except ErroBanco as e:
+        if transacao_ativa() is not None:
+            raise
         print(f"Erro ao limpar agendamentos futuros do cliente: {e}")
-        if conn:
-            conn.rollback()
         return 0
-    finally:
-        if conn: conn.close()
 
 def get_contagem_solicitados_do_mes(ano, mes):
     """
@@ -739,18 +2199,16 @@ def get_contagem_solicitados_do_mes(ano, mes):
     sql = """
         SELECT COUNT(ID)
         FROM ENTREGAS
-        WHERE EXTRACT(YEAR FROM DATA_VENCIMENTO) = ?
-        AND EXTRACT(MONTH FROM DATA_VENCIMENTO) = ?
+        WHERE DATA_VENCIMENTO >= ? AND DATA_VENCIMENTO < ?
         AND TIPO_ATENDIMENTO = 'SOLICITADO'
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
+        conn = conectar_leitura()
+        cur = conn.executar(sql, _intervalo_mes(ano, mes))
         # cur.fetchone()[0] pega o primeiro (e único) resultado da contagem.
         return cur.fetchone()[0]
-    except fdb.Error as e:
+    except ErroBanco as e:
         print(f"Erro ao contar atendimentos solicitados: {e}")
         return 0
     finally:
@@ -760,61 +2218,47 @@ def get_contagem_solicitados_pendentes_do_mes(ano, mes):
     """
     Busca a CONTAGEM de atendimentos 'SOLICITADO' que estão com o status 'Pendente'.
     """
-    sql = """
-        SELECT COUNT(e.ID)
-        FROM ENTREGAS e
-        JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE EXTRACT(YEAR FROM e.DATA_VENCIMENTO) = ?
-        AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
-        AND e.TIPO_ATENDIMENTO = 'SOLICITADO'
-        AND UPPER(s.NOME) = 'PENDENTE'
-    """
-    conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
-        # cur.fetchone()[0] pega o primeiro (e único) resultado da contagem.
-        return cur.fetchone()[0]
-    except fdb.Error as e:
+        return get_estatisticas_mensais(ano, mes)['SOLICITADOS_PENDENTES']
+    except ErroBanco as e:
         print(f"Erro ao contar atendimentos solicitados pendentes: {e}")
         return 0
-    finally:
-        if conn: conn.close()
 
 #==============================================================================
 # FUNÇÕES PARA O DASHBOARD E RELATÓRIOS
 #==============================================================================
+# Números do painel do mês (ANO = ? AND MES = ?), somando as parcelas de RESUMO_MES_PARCELAS
+# por cliente: CLIENTES_ATENDIDOS conta os clientes com concluídos no mês
+_SQL_MES_DAS_PARCELAS = """
+    SELECT COALESCE(SUM(c.CONCLUIDOS), 0) AS CONCLUIDOS, COALESCE(SUM(c.RETIFICADOS), 0) AS RETIFICADOS,
+           COALESCE(SUM(c.SOLICITADOS_PENDENTES), 0) AS SOLICITADOS_PENDENTES,
+           COALESCE(SUM(IIF(c.CONCLUIDOS > 0, 1, 0)), 0) AS CLIENTES_ATENDIDOS
+    FROM (SELECT CLIENTE_ID, SUM(CONCLUIDOS) AS CONCLUIDOS, SUM(RETIFICADOS) AS RETIFICADOS,
+                 SUM(SOLICITADOS_PENDENTES) AS SOLICITADOS_PENDENTES
+          FROM RESUMO_MES_PARCELAS
+          WHERE ANO = ? AND MES = ?
+          GROUP BY CLIENTE_ID) c"""
+
 def get_estatisticas_mensais(ano, mes):
-    sql_concluidos = """
-        SELECT COUNT(*) FROM ENTREGAS e
-        JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE UPPER(s.NOME) LIKE '%FEITO%' AND EXTRACT(YEAR FROM e.DATA_VENCIMENTO) = ? AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
     """
-    sql_retificados = """
-        SELECT COUNT(*) FROM ENTREGAS e
-        JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE UPPER(s.NOME) LIKE '%RETIFICADO%' AND EXTRACT(YEAR FROM e.DATA_VENCIMENTO) = ? AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
+    Lê os números do mês em RESUMO_MES_PARCELAS (mantida pelos triggers de ENTREGAS/STATUS):
+    CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES e CLIENTES_ATENDIDOS.
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql_concluidos, (ano, mes))
-        concluidos = cur.fetchone()[0]
-        cur.execute(sql_retificados, (ano, mes))
-        retificados = cur.fetchone()[0]
-        return {'CONCLUIDOS': concluidos, 'RETIFICADOS': retificados}
+        conn = conectar_leitura()
+        cur = conn.executar(_SQL_MES_DAS_PARCELAS, (ano, mes))
+        return dict_factory(cur, cur.fetchone())
     finally:
         if conn: conn.close()
 
 def get_clientes_com_agendamento_no_mes(ano, mes):
-    sql = "SELECT DISTINCT CLIENTE_ID FROM ENTREGAS WHERE EXTRACT(YEAR FROM DATA_VENCIMENTO) = ? AND EXTRACT(MONTH FROM DATA_VENCIMENTO) = ?"
+    sql = "SELECT DISTINCT CLIENTE_ID FROM ENTREGAS WHERE DATA_VENCIMENTO >= ? AND DATA_VENCIMENTO < ?"
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
+        cur.execute(sql, _intervalo_mes(ano, mes))
         return {row[0] for row in cur.fetchall()}
     finally:
         if conn: conn.close()
@@ -823,40 +2267,140 @@ def get_clientes_com_agendamento_concluido_no_mes(ano, mes):
     sql = """
         SELECT DISTINCT e.CLIENTE_ID FROM ENTREGAS e
         JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE UPPER(s.NOME) LIKE '%FEITO%' AND EXTRACT(YEAR FROM e.DATA_VENCimento) = ? AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
+        WHERE UPPER(s.NOME) LIKE '%FEITO%' AND e.DATA_VENCIMENTO >= ? AND e.DATA_VENCIMENTO < ?
     """
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
+        cur.execute(sql, _intervalo_mes(ano, mes))
         return {row[0] for row in cur.fetchall()}
     finally:
         if conn: conn.close()
 
 def get_status_dias_para_mes(ano, mes):
-    sql = """
-        SELECT
-            EXTRACT(DAY FROM e.DATA_VENCIMENTO),
-            COUNT(e.ID),
-            (SELECT FIRST 1 s.COR_HEX FROM ENTREGAS e2 JOIN STATUS s ON e2.STATUS_ID = s.ID WHERE e2.DATA_VENCIMENTO = e.DATA_VENCIMENTO ORDER BY s.ID)
-        FROM ENTREGAS e
-        WHERE EXTRACT(YEAR FROM e.DATA_VENCIMENTO) = ? AND EXTRACT(MONTH FROM e.DATA_VENCIMENTO) = ?
-        GROUP BY e.DATA_VENCIMENTO
+    return {data.day: info for data, info in get_resumo_dias(*_intervalo_mes(ano, mes)).items()}
+
+# Dias com agendamentos no intervalo [?, ?), somando as parcelas de RESUMO_DIA_PARCELAS.
+# Os status cujas parcelas somam zero já não têm agendamentos no dia; dos que
+# restam, o de menor ID define a cor (STATUS_ID).
+_SQL_DIAS_DAS_PARCELAS = """
+    (SELECT p.DATA, SUM(p.CONTAGEM) AS CONTAGEM, MIN(p.STATUS_ID) AS STATUS_ID,
+            SUM(p.QTD_AGENDADO) AS QTD_AGENDADO, SUM(p.QTD_SOLICITADO) AS QTD_SOLICITADO
+     FROM (SELECT DATA, STATUS_ID, SUM(CONTAGEM) AS CONTAGEM,
+                  SUM(QTD_AGENDADO) AS QTD_AGENDADO, SUM(QTD_SOLICITADO) AS QTD_SOLICITADO
+           FROM RESUMO_DIA_PARCELAS
+           WHERE DATA >= ? AND DATA < ?
+           GROUP BY DATA, STATUS_ID
+           HAVING SUM(CONTAGEM) > 0) p
+     GROUP BY p.DATA) r"""
+
+def get_resumo_dias(data_inicio, data_fim):
+    """
+    Lê o resumo diário no intervalo [data_inicio, data_fim) — no máximo uma linha por dia.
+    Retorna {date: {'CONTAGEM', 'COR', 'QTD_AGENDADO', 'QTD_SOLICITADO'}}; dias sem agendamentos não aparecem.
+    """
+    sql = f"""
+        SELECT r.DATA, r.CONTAGEM, s.COR_HEX, r.QTD_AGENDADO, r.QTD_SOLICITADO
+        FROM {_SQL_DIAS_DAS_PARCELAS}
+        LEFT JOIN STATUS s ON s.ID = r.STATUS_ID
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (ano, mes))
-        status_dias = {}
-        for row in cur.fetchall():
-            dia, contagem, cor = row
-            status_dias[int(dia)] = {'CONTAGEM': contagem, 'COR': cor}
-        return status_dias
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (data_inicio, data_fim))
+        return {
+            data: {'CONTAGEM': contagem, 'COR': cor, 'QTD_AGENDADO': agendado, 'QTD_SOLICITADO': solicitado}
+            for data, contagem, cor, agendado, solicitado in cur.fetchall()
+        }
+    finally:
+        if conn: conn.close()
+
+def get_resumo_mes(ano, mes):
+    """
+    Reúne em uma única consulta (uma ida ao servidor) tudo o que o calendário
+    mostra de um mês. Cada parte do UNION ALL é identificada pela coluna TIPO.
+    Os números do painel vêm de RESUMO_MES_PARCELAS e os dias de RESUMO_DIA_PARCELAS.
+    Retorna um dicionário com:
+      SOLICITADOS_PENDENTES, CONCLUIDOS, RETIFICADOS, TOTAL_CLIENTES, CLIENTES_ATENDIDOS (inteiros),
+      FERIADOS ({QDate: tipo}) e DIAS ({dia do mês: {'CONTAGEM': n, 'COR': cor_hex}}).
+    """
+    sql = f"""
+        WITH PAINEL AS ({_SQL_MES_DAS_PARCELAS})
+        SELECT CAST('SOLICITADOS_PENDENTES' AS VARCHAR(25)) AS TIPO, CAST(NULL AS DATE) AS DATA, m.SOLICITADOS_PENDENTES AS QTD, CAST(NULL AS VARCHAR(20)) AS TEXTO
+        FROM PAINEL m
+        UNION ALL
+        SELECT 'CONCLUIDOS', NULL, m.CONCLUIDOS, NULL FROM PAINEL m
+        UNION ALL
+        SELECT 'RETIFICADOS', NULL, m.RETIFICADOS, NULL FROM PAINEL m
+        UNION ALL
+        SELECT 'CLIENTES_ATENDIDOS', NULL, m.CLIENTES_ATENDIDOS, NULL FROM PAINEL m
+        UNION ALL
+        SELECT 'TOTAL_CLIENTES', NULL, COUNT(*), NULL FROM CLIENTES
+        UNION ALL
+        SELECT 'FERIADO', f.DATA, NULL, f.TIPO
+        FROM FERIADOS f
+        WHERE f.DATA >= ? AND f.DATA < ?
+        UNION ALL
+        SELECT 'DIA', r.DATA, r.CONTAGEM, s.COR_HEX
+        FROM {_SQL_DIAS_DAS_PARCELAS}
+        LEFT JOIN STATUS s ON s.ID = r.STATUS_ID
+    """
+    resumo = {'SOLICITADOS_PENDENTES': 0, 'CONCLUIDOS': 0, 'RETIFICADOS': 0, 'TOTAL_CLIENTES': 0, 'CLIENTES_ATENDIDOS': 0, 'FERIADOS': {}, 'DIAS': {}}
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (ano, mes) + _intervalo_mes(ano, mes) * 2)
+        for tipo, data, qtd, texto in cur.fetchall():
+            tipo = tipo.strip()
+            if tipo == 'FERIADO':
+                resumo['FERIADOS'][QDate(data.year, data.month, data.day)] = texto
+            elif tipo == 'DIA':
+                resumo['DIAS'][data.day] = {'CONTAGEM': qtd, 'COR': texto}
+            else:
+                resumo[tipo] = qtd or 0
+        return resumo
     finally:
         if conn: conn.close()
 
+def _compactar_parcelas(cur, tabela, chaves, valores):
+    """
+    Junta numa só linha as parcelas de cada grupo de 'chaves' em 'tabela' e apaga os
+    grupos cujos 'valores' somam zero. Só as parcelas lidas aqui são apagadas (pelo ID):
+    as que outro computador gravar enquanto isso ficam para a próxima compactação.
+    """
+    cur.execute(f"SELECT ID, {', '.join(chaves + valores)} FROM {tabela}")
+    grupos = collections.defaultdict(list)
+    for linha in cur.fetchall():
+        grupos[tuple(linha[1:1 + len(chaves)])].append((linha[0], linha[1 + len(chaves):]))
+    remover, inserir = [], []
+    for chave, parcelas in grupos.items():
+        somas = tuple(sum(coluna) for coluna in zip(*(quantidades for _, quantidades in parcelas)))
+        if len(parcelas) == 1 and any(somas):
+            continue
+        remover.extend((id_parcela,) for id_parcela, _ in parcelas)
+        if any(somas):
+            inserir.append(chave + somas)
+    cur.executemany(f"DELETE FROM {tabela} WHERE ID = ?", remover)
+    cur.executemany(f"INSERT INTO {tabela} ({', '.join(chaves + valores)}) VALUES ({', '.join('?' * len(chaves + valores))})", inserir)
+
+def compactar_resumos():
+    """
+    Compacta as parcelas dos resumos (RESUMO_DIA_PARCELAS por data e status,
+    RESUMO_MES_PARCELAS por mês e cliente), para que as leituras continuem
+    lendo poucas linhas por dia e por mês. Os números lidos não mudam.
+    """
+    try:
+        with transacao(alterar_versao=False) as trans:
+            cur = trans.cursor()
+            _compactar_parcelas(cur, 'RESUMO_DIA_PARCELAS', ['DATA', 'STATUS_ID'], ['CONTAGEM', 'QTD_AGENDADO', 'QTD_SOLICITADO'])
+            _compactar_parcelas(cur, 'RESUMO_MES_PARCELAS', ['ANO', 'MES', 'CLIENTE_ID'], ['CONCLUIDOS', 'RETIFICADOS', 'SOLICITADOS_PENDENTES'])
+    except ErroBanco as e:
+        if transacao_ativa() is not None:
+            raise
+        # Ex: outro computador compactando ao mesmo tempo; as parcelas continuam válidas
+        print(f"Erro ao compactar os resumos: {e}")
+
 def get_entregas_no_intervalo(data, hora_inicio, hora_fim):
     sql = """
         SELECT e.ID, e.HORARIO, c.NOME AS NOME_CLIENTE, s.NOME AS NOME_STATUS
@@ -867,14 +2411,13 @@ def get_entregas_no_intervalo(data, hora_inicio, hora_fim):
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (data, hora_inicio, hora_fim))
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (data, hora_inicio, hora_fim))
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
-def get_entregas_filtradas(data_inicio, data_fim, status_ids):
+def _sql_entregas_filtradas(data_inicio, data_fim, status_ids):
     base_sql = """
         SELECT e.DATA_VENCIMENTO, e.HORARIO, c.NOME AS NOME_CLIENTE, s.NOME AS NOME_STATUS, e.RESPONSAVEL, c.CONTATO, c.TIPO_ENVIO, e.OBSERVACOES
         FROM ENTREGAS e
@@ -887,33 +2430,58 @@ def get_entregas_filtradas(data_inicio, data_fim, status_ids):
         placeholders = ', '.join(['?' for _ in status_ids])
         base_sql += f" AND s.ID IN ({placeholders})"
         params.extend(status_ids)
-    
+    return base_sql, params
+
+def get_entregas_filtradas(data_inicio, data_fim, status_ids):
+    base_sql, params = _sql_entregas_filtradas(data_inicio, data_fim, status_ids)
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(base_sql, params)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
-def get_logs_filtrados(data_inicio, data_fim, usuario):
-    # A MUDANÇA ESTÁ AQUI: Usamos CAST(DATAHORA AS DATE) para comparar apenas as datas
-    base_sql = "SELECT DATAHORA as data_hora, USUARIO_NOME as usuario_nome, ACAO as acao, DETALHES as detalhes FROM LOGS WHERE CAST(DATAHORA AS DATE) BETWEEN ? AND ?"
-    params = [data_inicio, data_fim]
+def fluxo_entregas_filtradas(data_inicio, data_fim, status_ids, tamanho_lote=TAMANHO_LOTE_FLUXO):
+    """Versão em fluxo de get_entregas_filtradas (use com 'with'), para períodos longos."""
+    base_sql, params = _sql_entregas_filtradas(data_inicio, data_fim, status_ids)
+    return fluxo_consulta(base_sql, params, tamanho_lote)
+
+def existem_entregas_filtradas(data_inicio, data_fim, status_ids):
+    """Indica se get_entregas_filtradas retornaria alguma linha (consulta de uma linha só)."""
+    return consulta_tem_linhas(*_sql_entregas_filtradas(data_inicio, data_fim, status_ids))
+
+def _sql_logs_filtrados(data_inicio, data_fim, usuario):
+    # O período é inclusivo nas duas pontas: compara DATAHORA com [data_inicio, dia seguinte a data_fim)
+    # em vez de CAST(DATAHORA AS DATE), para que o índice de DATAHORA possa ser usado
+    base_sql = "SELECT DATAHORA as data_hora, USUARIO_NOME as usuario_nome, ACAO as acao, DETALHES as detalhes FROM LOGS WHERE DATAHORA >= ? AND DATAHORA < ?"
+    params = list(_intervalo_periodo(data_inicio, data_fim))
     if usuario != "Todos":
         base_sql += " AND USUARIO_NOME = ?"
         params.append(usuario)
+    return base_sql, params
 
+def get_logs_filtrados(data_inicio, data_fim, usuario):
+    base_sql, params = _sql_logs_filtrados(data_inicio, data_fim, usuario)
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(base_sql, params)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
+def fluxo_logs_filtrados(data_inicio, data_fim, usuario, tamanho_lote=TAMANHO_LOTE_FLUXO):
+    """Versão em fluxo de get_logs_filtrados (use com 'with'), para exportar períodos longos."""
+    base_sql, params = _sql_logs_filtrados(data_inicio, data_fim, usuario)
+    return fluxo_consulta(base_sql, params, tamanho_lote)
+
+def existem_logs_filtrados(data_inicio, data_fim, usuario):
+    """Indica se get_logs_filtrados retornaria alguma linha (consulta de uma linha só)."""
+    return consulta_tem_linhas(*_sql_logs_filtrados(data_inicio, data_fim, usuario))
+
 def get_estatisticas_por_usuario_e_status():
     sql = """
         SELECT
@@ -928,40 +2496,10 @@ def get_estatisticas_por_usuario_e_status():
     """
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
-    finally:
-        if conn: conn.close()
-
-def buscar_agendamentos_globais(termo_busca):
-    """
-    Busca agendamentos em todo o banco de dados com base em um termo.
-    A busca é case-insensitive e procura no nome do cliente, responsável e observações.
-    """
-    sql = """
-        SELECT
-            e.ID, e.DATA_VENCIMENTO, e.HORARIO, e.RESPONSAVEL,
-            c.NOME as NOME_CLIENTE,
-            s.NOME as NOME_STATUS
-        FROM ENTREGAS e
-        JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
-        LEFT JOIN STATUS s ON e.STATUS_ID = s.ID
-        WHERE
-            UPPER(c.NOME) LIKE ? OR
-            UPPER(e.RESPONSAVEL) LIKE ? OR
-            UPPER(e.OBSERVACOES) LIKE ?
-        ORDER BY e.DATA_VENCIMENTO DESC
-    """
-    conn = None
-    try:
-        conn = conectar()
-        cur = conn.cursor()
-        # Adiciona os wildcards '%' para buscar o termo em qualquer parte do texto
-        termo_like = f"%{termo_busca.upper()}%"
-        cur.execute(sql, (termo_like, termo_like, termo_like))
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
@@ -988,10 +2526,10 @@ def get_status_de_atividade_clientes():
     """
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql)
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
@@ -1012,7 +2550,7 @@ def get_estatisticas_cliente_periodo(cliente_id, data_inicio, data_fim):
     """
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql, (cliente_id, data_inicio, data_fim))
         # Transforma o resultado em um dicionário: {'Status': contagem}
@@ -1046,10 +2584,10 @@ def get_dados_ranking_clientes_periodo(data_inicio, data_fim):
     """
     conn = None
     try:
-        conn = conectar()
+        conn = conectar_leitura()
         cur = conn.cursor()
         cur.execute(sql, (data_inicio, data_fim))
-        return [dict_factory(cur, row) for row in cur.fetchall()]
+        return linhas_do_cursor(cur)
     finally:
         if conn: conn.close()
 
@@ -1057,9 +2595,8 @@ def get_cliente_por_id(cliente_id):
     sql = "SELECT * FROM CLIENTES WHERE ID = ?"
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (cliente_id,))
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (cliente_id,))
         return dict_factory(cur, cur.fetchone())
     finally:
         if conn: conn.close()
@@ -1077,9 +2614,390 @@ def verificar_agendamento_pendente_existente(cliente_id):
     """
     conn = None
     try:
-        conn = conectar()
-        cur = conn.cursor()
-        cur.execute(sql, (cliente_id,))
+        conn = conectar_leitura()
+        cur = conn.executar(sql, (cliente_id,))
         return dict_factory(cur, cur.fetchone())
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
+
+#==============================================================================
+# BUSCA GLOBAL (ÍNDICE DE TRIGRAMAS)
+#==============================================================================
+# BUSCA_TRIGRAMAS guarda, para cada agendamento, os trigramas (trechos de 3 letras)
+# do nome do cliente, do responsável e das observações, já sem acentos e em
+# minúsculas; BUSCA_TEXTOS guarda esses três textos normalizados, para conferir o
+# termo inteiro sem reler o BLOB de OBSERVACOES. A normalização é feita aqui em
+# Python (unicodedata), por isso os triggers apenas marcam em BUSCA_PENDENTES quais
+# agendamentos precisam ser reindexados. A fila é processada em segundo plano pelo
+# IndexadorBusca, acordado após cada commit; a busca em si só lê.
+TAMANHO_TRIGRAMA = 3
+LIMITE_IN = 1500 # Máximo de itens em um "IN (...)" no Firebird
+TAMANHO_TEXTO_BUSCA = 8000 # Caracteres das observações guardados em BUSCA_TEXTOS
+LIMITE_PENDENTES_NA_BUSCA = 200 # Agendamentos ainda na fila que a busca confere direto
+
+def normalizar_texto_busca(texto):
+    """Remove acentos, ignora maiúsculas/minúsculas e reduz o texto a palavras separadas por um espaço."""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', sem_acentos.casefold()))
+
+def _trigramas(texto_normalizado):
+    """Trigramas de cada palavra com pelo menos 3 letras."""
+    trigramas = set()
+    for palavra in texto_normalizado.split():
+        for i in range(len(palavra) - TAMANHO_TRIGRAMA + 1):
+            trigramas.add(palavra[i:i + TAMANHO_TRIGRAMA])
+    return trigramas
+
+def _em_lotes(itens, tamanho=LIMITE_IN):
+    itens = list(itens)
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+def _textos_para_busca(cur, ids):
+    """
+    Retorna {ID: (data, (nome do cliente, responsável, observações))}, com os textos já
+    normalizados, lidos das tabelas de origem (inclui o BLOB de OBSERVACOES).
+    """
+    textos = {}
+    for lote in _em_lotes(ids):
+        placeholders = ', '.join('?' for _ in lote)
+        cur.execute(f"""
+            SELECT e.ID, e.DATA_VENCIMENTO, c.NOME, e.RESPONSAVEL, e.OBSERVACOES
+            FROM ENTREGAS e JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
+            WHERE e.ID IN ({placeholders})
+        """, lote)
+        for entrega_id, data, nome, responsavel, observacoes in cur.fetchall():
+            textos[entrega_id] = (data, tuple(normalizar_texto_busca(t) for t in (nome, responsavel, observacoes)))
+    return textos
+
+def atualizar_indice_busca(tamanho_lote=500):
+    """
+    Reindexa os agendamentos marcados em BUSCA_PENDENTES, em lotes (uma transação
+    por lote). Retorna quantos agendamentos foram processados.
+    Normalmente chamada pelo IndexadorBusca, fora da thread da interface.
+    """
+    processados = 0
+    while True:
+        try:
+            with transacao(alterar_versao=False) as trans:
+                cur = trans.cursor()
+                cur.execute("SELECT FIRST ? ENTREGA_ID, SEQ FROM BUSCA_PENDENTES", (tamanho_lote,))
+                pendentes = cur.fetchall()
+                if not pendentes:
+                    return processados
+                ids = [entrega_id for entrega_id, _ in pendentes]
+                textos = _textos_para_busca(cur, ids)
+
+                cur.executemany("DELETE FROM BUSCA_TRIGRAMAS WHERE ENTREGA_ID = ?", [(i,) for i in ids])
+                cur.executemany("DELETE FROM BUSCA_TEXTOS WHERE ENTREGA_ID = ?", [(i,) for i in ids])
+                linhas = [
+                    (trigrama, entrega_id)
+                    for entrega_id, (_, campos) in textos.items() # Agendamentos excluídos não aparecem aqui
+                    for trigrama in _trigramas(' '.join(campos))
+                ]
+                if linhas:
+                    cur.executemany("INSERT INTO BUSCA_TRIGRAMAS (TRIGRAMA, ENTREGA_ID) VALUES (?, ?)", linhas)
+                if textos:
+                    cur.executemany(
+                        "INSERT INTO BUSCA_TEXTOS (ENTREGA_ID, CLIENTE, RESPONSAVEL, OBSERVACOES, OBSERVACOES_CORTADAS) VALUES (?, ?, ?, ?, ?)",
+                        [(entrega_id, cliente[:150], responsavel[:150], observacoes[:TAMANHO_TEXTO_BUSCA],
+                          1 if len(cliente) > 150 or len(responsavel) > 150 or len(observacoes) > TAMANHO_TEXTO_BUSCA else 0)
+                         for entrega_id, (_, (cliente, responsavel, observacoes)) in textos.items()])
+                # Só remove da fila se ninguém alterou o agendamento depois da leitura (SEQ igual)
+                cur.executemany("DELETE FROM BUSCA_PENDENTES WHERE ENTREGA_ID = ? AND SEQ = ?", pendentes)
+            processados += len(pendentes)
+        except ErroBanco as e:
+            # Outro computador provavelmente processou o mesmo lote ao mesmo tempo
+            print(f"Erro ao atualizar o índice de busca: {e}")
+            return processados
+
+class IndexadorBusca(threading.Thread):
+    """
+    Thread que processa a fila BUSCA_PENDENTES (atualizar_indice_busca) sempre que
+    avisada de um commit (agendar) e, para pegar o que outros computadores gravaram,
+    a cada 'intervalo' segundos.
+    """
+    def __init__(self, intervalo=30.0):
+        super().__init__(name="IndexadorBusca", daemon=True)
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def agendar(self):
+        self._acordar.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            if self._parar.is_set():
+                break
+            try:
+                if atualizar_indice_busca():
+                    _descartar_ultima_busca() # A lista guardada pode não ter os recém-indexados
+            except Exception as e:
+                # Sem conexão, por exemplo: a próxima rodada tenta de novo
+                print(f"Erro ao atualizar o índice de busca: {e}")
+
+    def parar(self, timeout=10):
+        """Encerra a thread depois do lote em andamento (a fila continua no banco)."""
+        self._parar.set()
+        self._acordar.set()
+        self.join(timeout)
+
+_indexador_busca = None
+
+def iniciar_indexador_busca():
+    """Passa a manter o índice de busca em segundo plano. Chamada uma vez após o login."""
+    global _indexador_busca
+    if _indexador_busca is None or not _indexador_busca.is_alive():
+        _indexador_busca = IndexadorBusca()
+        _indexador_busca.start()
+    _indexador_busca.agendar() # Processa o que ficou na fila desde a última execução
+
+def parar_indexador_busca():
+    """Encerra o indexador. Chamada ao fechar o programa."""
+    global _indexador_busca
+    indexador = _indexador_busca
+    _indexador_busca = None
+    if indexador is not None:
+        indexador.parar()
+
+def _avisar_indexador_busca():
+    indexador = _indexador_busca
+    if indexador is not None:
+        indexador.agendar()
+
+def _buscar_por_like(termo_busca):
+    """Busca antiga (LIKE), usada para termos curtos demais para o índice de trigramas."""
+    sql = """
+        SELECT
+            e.ID, e.DATA_VENCIMENTO, e.HORARIO, e.RESPONSAVEL,
+            c.NOME as NOME_CLIENTE,
+            s.NOME as NOME_STATUS
+        FROM ENTREGAS e
+        JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
+        LEFT JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE
+            UPPER(c.NOME) LIKE ? OR
+            UPPER(e.RESPONSAVEL) LIKE ? OR
+            UPPER(e.OBSERVACOES) LIKE ?
+        ORDER BY e.DATA_VENCIMENTO DESC
+    """
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        # Adiciona os wildcards '%' para buscar o termo em qualquer parte do texto
+        termo_like = f"%{termo_busca.upper()}%"
+        cur.execute(sql, (termo_like, termo_like, termo_like))
+        return linhas_do_cursor(cur)
+    finally:
+        if conn: conn.close()
+
+def _buscar_no_indice(termo, trigramas):
+    """
+    Agendamentos que contêm o termo normalizado, como (campo, DATA_VENCIMENTO, ID), onde
+    'campo' é 0 (nome do cliente), 1 (responsável) ou 2 (observações) — o primeiro que
+    contém o termo. Sem ordem definida.
+    """
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        # Agendamentos ainda na fila são conferidos nas tabelas de origem, se forem poucos;
+        # com a fila grande (índice sendo montado) a busca usa só o que já foi indexado
+        cur.execute("SELECT FIRST ? ENTREGA_ID FROM BUSCA_PENDENTES", (LIMITE_PENDENTES_NA_BUSCA + 1,))
+        pendentes = [row[0] for row in cur.fetchall()]
+        if len(pendentes) > LIMITE_PENDENTES_NA_BUSCA:
+            pendentes = []
+
+        placeholders = ', '.join('?' for _ in trigramas)
+        # Candidatos: agendamentos que têm TODOS os trigramas do termo
+        cur.execute(f"""
+            SELECT ENTREGA_ID FROM BUSCA_TRIGRAMAS
+            WHERE TRIGRAMA IN ({placeholders})
+            GROUP BY ENTREGA_ID
+            HAVING COUNT(*) = ?
+        """, list(trigramas) + [len(trigramas)])
+        ignorar = set(pendentes)
+        candidatos = [row[0] for row in cur.fetchall() if row[0] not in ignorar]
+
+        # Confere o termo inteiro, pois os trigramas podem estar espalhados pelo texto
+        encontrados = []
+        reler = list(pendentes) # Textos cortados em BUSCA_TEXTOS também são relidos da origem
+        for lote in _em_lotes(candidatos):
+            cur.execute(f"""
+                SELECT t.ENTREGA_ID, e.DATA_VENCIMENTO, t.CLIENTE, t.RESPONSAVEL, t.OBSERVACOES, t.OBSERVACOES_CORTADAS
+                FROM BUSCA_TEXTOS t JOIN ENTREGAS e ON e.ID = t.ENTREGA_ID
+                WHERE t.ENTREGA_ID IN ({', '.join('?' for _ in lote)})
+            """, lote)
+            for entrega_id, data, *campos, cortadas in cur.fetchall():
+                campo = next((i for i, texto in enumerate(campos) if texto and termo in texto), None)
+                if campo is not None:
+                    encontrados.append((campo, data, entrega_id))
+                elif cortadas:
+                    reler.append(entrega_id)
+        for entrega_id, (data, campos) in _textos_para_busca(cur, reler).items():
+            campo = next((i for i, texto in enumerate(campos) if termo in texto), None)
+            if campo is not None:
+                encontrados.append((campo, data, entrega_id))
+        return encontrados
+    finally:
+        if conn: conn.close()
+
+def buscar_ids_agendamentos(termo_busca):
+    """
+    Procura o termo (sem diferenciar acentos nem maiúsculas) no nome do cliente,
+    no responsável e nas observações. Retorna os IDs encontrados, do mais relevante
+    para o menos relevante: primeiro os encontrados no nome do cliente, depois no
+    responsável, depois só nas observações; em cada grupo, os mais recentes primeiro.
+    Retorna None se o termo for curto demais para o índice (menos de 3 letras).
+    """
+    termo = normalizar_texto_busca(termo_busca)
+    trigramas = _trigramas(termo)
+    if not trigramas:
+        return None
+    return [-menos_id for _, _, menos_id in _ordenar_por_relevancia(_buscar_no_indice(termo, trigramas))]
+
+def _ordenar_por_relevancia(encontrados):
+    """
+    Chaves (campo, -DATA_VENCIMENTO, -ID) dos encontrados por _buscar_no_indice, em ordem
+    crescente: é a ordem de relevância e serve de cursor da paginação.
+    """
+    return sorted((campo, -data.toordinal(), -entrega_id) for campo, data, entrega_id in encontrados)
+
+def get_agendamentos_por_ids(ids):
+    """Carrega os agendamentos informados (em lotes de até 1500 IDs), preservando a ordem de 'ids'."""
+    sql = """
+        SELECT
+            e.ID, e.DATA_VENCIMENTO, e.HORARIO, e.RESPONSAVEL,
+            c.NOME as NOME_CLIENTE,
+            s.NOME as NOME_STATUS
+        FROM ENTREGAS e
+        JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
+        LEFT JOIN STATUS s ON e.STATUS_ID = s.ID
+        WHERE e.ID IN ({})
+    """
+    por_id = {}
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        for lote in _em_lotes(ids):
+            cur.execute(sql.format(', '.join('?' for _ in lote)), lote)
+            for linha in linhas_do_cursor(cur):
+                por_id[linha['ID']] = linha
+    finally:
+        if conn: conn.close()
+    return [por_id[i] for i in ids if i in por_id]
+
+def buscar_agendamentos_globais(termo_busca):
+    """
+    Busca agendamentos em todo o banco de dados com base em um termo.
+    A busca ignora acentos e maiúsculas e procura no nome do cliente, responsável e observações.
+    Usa o índice de trigramas; termos com menos de 3 letras usam a busca por LIKE.
+    """
+    ids = buscar_ids_agendamentos(termo_busca)
+    if ids is None:
+        return _buscar_por_like(termo_busca)
+    return get_agendamentos_por_ids(ids)
+
+_ultima_busca = {} # Chaves da última busca por trigramas: {'termo', 'versao', 'chaves'}
+_lock_ultima_busca = threading.Lock()
+
+def _descartar_ultima_busca():
+    with _lock_ultima_busca:
+        _ultima_busca.clear()
+
+configuracoes.ao_invalidar(_descartar_ultima_busca) # Outro banco pode ter sido configurado
+
+def _chaves_busca(termo_busca, conferir_versao=True):
+    """
+    Chaves de relevância (ver _ordenar_por_relevancia) de todos os agendamentos que contêm
+    o termo, via índice de trigramas. A lista da última busca é reaproveitada enquanto a
+    versão dos dados não mudar; com conferir_versao=False (páginas seguintes da mesma
+    busca) ela é usada sem consultar o banco, como um retrato tirado na primeira página.
+    """
+    termo = normalizar_texto_busca(termo_busca)
+    if not conferir_versao:
+        with _lock_ultima_busca:
+            if _ultima_busca.get('termo') == termo:
+                return _ultima_busca['chaves']
+    versao = get_versao_dados()
+    with _lock_ultima_busca:
+        if _ultima_busca.get('termo') == termo and _ultima_busca.get('versao') == versao:
+            return _ultima_busca['chaves']
+
+    # O índice já traz a data de cada agendamento encontrado
+    chaves = _ordenar_por_relevancia(_buscar_no_indice(termo, _trigramas(termo)))
+    with _lock_ultima_busca:
+        _ultima_busca.update(termo=termo, versao=versao, chaves=chaves)
+    return chaves
+
+def buscar_agendamentos_pagina(termo_busca, apos=None, tamanho=100):
+    """
+    Uma página da busca global, na mesma ordem de buscar_agendamentos_globais: por
+    relevância no índice de trigramas, do mais recente para o mais antigo nos termos curtos.
+    'apos' é o cursor devolvido pela página anterior (None na primeira página): a
+    paginação é por chave, então não há OFFSET e cada página custa o mesmo.
+    Retorna (linhas, cursor_da_proxima_pagina); o cursor é None na última.
+    """
+    if not _trigramas(normalizar_texto_busca(termo_busca)):
+        # Termo curto: LIKE com a condição de chave aplicada pelo próprio banco
+        sql = """
+            SELECT FIRST ?
+                e.ID, e.DATA_VENCIMENTO, e.HORARIO, e.RESPONSAVEL,
+                c.NOME as NOME_CLIENTE,
+                s.NOME as NOME_STATUS
+            FROM ENTREGAS e
+            JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
+            LEFT JOIN STATUS s ON e.STATUS_ID = s.ID
+            WHERE (UPPER(c.NOME) LIKE ? OR UPPER(e.RESPONSAVEL) LIKE ? OR UPPER(e.OBSERVACOES) LIKE ?)
+        """
+        termo_like = f"%{termo_busca.upper()}%"
+        params = [tamanho, termo_like, termo_like, termo_like]
+        if apos is not None:
+            sql += " AND (e.DATA_VENCIMENTO < ? OR (e.DATA_VENCIMENTO = ? AND e.ID < ?))"
+            params += [apos[0], apos[0], apos[1]]
+        sql += " ORDER BY e.DATA_VENCIMENTO DESC, e.ID DESC"
+        conn = None
+        try:
+            conn = conectar_leitura()
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            linhas = linhas_do_cursor(cur)
+        finally:
+            if conn: conn.close()
+        proximo = (linhas[-1]['DATA_VENCIMENTO'], linhas[-1]['ID']) if len(linhas) == tamanho else None
+    else:
+        # A versão dos dados só é conferida na primeira página; as demais seguem a mesma lista
+        chaves = _chaves_busca(termo_busca, conferir_versao=apos is None)
+        inicio = 0 if apos is None else bisect.bisect_right(chaves, tuple(apos))
+        pagina = chaves[inicio:inicio + tamanho]
+        linhas = get_agendamentos_por_ids([-menos_id for _, _, menos_id in pagina])
+        proximo = pagina[-1] if inicio + tamanho < len(chaves) else None
+    return linhas, proximo
+
+def contar_agendamentos_busca(termo_busca):
+    """Total de agendamentos encontrados pela busca global (pode ser lento para termos curtos)."""
+    if _trigramas(normalizar_texto_busca(termo_busca)):
+        return len(_chaves_busca(termo_busca))
+    sql = """
+        SELECT COUNT(*)
+        FROM ENTREGAS e
+        JOIN CLIENTES c ON e.CLIENTE_ID = c.ID
+        WHERE UPPER(c.NOME) LIKE ? OR UPPER(e.RESPONSAVEL) LIKE ? OR UPPER(e.OBSERVACOES) LIKE ?
+    """
+    termo_like = f"%{termo_busca.upper()}%"
+    conn = None
+    try:
+        conn = conectar_leitura()
+        cur = conn.cursor()
+        cur.execute(sql, (termo_like, termo_like, termo_like))
+        return cur.fetchone()[0]
+    finally:
+        if conn: conn.close()
@@ -13,7 +13,7 @@ except ImportError:
     REPORTLAB_DISPONIVEL = False
 
 def exportar_para_csv(entregas, nome_arquivo):
-    """Exporta uma lista de entregas para um arquivo CSV."""
+    """Exporta entregas (lista ou fluxo de linhas) para um arquivo CSV, linha a linha."""
     try:
         with open(nome_arquivo, 'w', newline='', encoding='utf-8-sig') as f:
             writer = csv.writer(f)
@@ -76,7 +76,7 @@ def exportar_para_pdf(entregas, nome_arquivo, titulo_relatorio):
         QMessageBox.critical(None, "Erro", f"Não foi possível exportar para PDF: {e}")
 
 def exportar_logs_csv(logs, nome_arquivo):
-    """Exporta uma lista de logs para um arquivo CSV."""
+    """Exporta logs (lista ou fluxo de linhas) para um arquivo CSV, linha a linha."""
     try:
         with open(nome_arquivo, 'w', newline='', encoding='utf-8-sig') as f:
             writer = csv.writer(f)
@@ -0,0 +1,285 @@
+# instrumentacao.py
+# Medição opcional das funções de database.py, para achar consultas lentas.
+# Ativada em configurações (diagnostico/ativo), troca as funções públicas do
+# módulo database por versões que medem, a cada chamada, o tempo total, o
+# tempo para obter a conexão do pool e as linhas lidas. Chamadas acima de
+# diagnostico/limite_ms vão para um log rotativo com o SQL, os parâmetros e o
+# plano de execução de cada comando (cursor.plan).
+import collections
+import functools
+import inspect
+import logging
+import logging.handlers
+import os
+import reprlib
+import threading
+import time
+import configuracoes
+import database
+
+# Funções que não representam uma operação do programa (infraestrutura de
+# conexão/transação, auxiliares de cursor e de migração) ou que devolvem um
+# fluxo lido depois do retorno (fluxo_*): não são medidas
+NAO_MEDIR = {
+    'conectar', 'conectar_leitura', 'abrir_conexao_dedicada', 'fechar_pool', 'motor_atual', 'suporta_eventos',
+    'transacao', 'transacao_ativa', 'dict_factory', 'colunas_do_cursor', 'linhas_do_cursor', 'fluxo_consulta', 'consulta_tem_linhas',
+    'tabela_existe', 'criar_generator_e_trigger', 'indice_existe', 'criar_indice', 'coluna_existe', 'versao_do_banco',
+    'iniciar_escritor_auditoria', 'parar_escritor_auditoria', 'iniciar_indexador_busca', 'parar_indexador_busca',
+    'invalidar_cache_referencia', 'invalidar_calendario_uteis',
+    'normalizar_texto_busca',
+}
+MAX_COMANDOS_POR_CHAMADA = 20 # Comandos guardados por chamada para o log (ex: laços em lote)
+MAX_PLANOS_GUARDADOS = 500 # Planos lembrados por texto de SQL (os mais antigos saem primeiro)
+
+_log = logging.getLogger("agendador.consultas_lentas")
+_log.propagate = False
+_contexto = threading.local()
+_lock = threading.Lock()
+_estatisticas = {} # nome -> [chamadas, tempo_total, tempo_max, linhas, tempo_conexao]
+_originais = {}
+_planos = collections.OrderedDict() # texto do SQL -> plano (ver _plano_do_comando)
+_lock_planos = threading.Lock()
+_limite_segundos = 0.2
+_repr_parametros = reprlib.Repr()
+_repr_parametros.maxstring = 200
+_repr_parametros.maxother = 200
+_repr_parametros.maxlist = _repr_parametros.maxtuple = 20
+
+class Chamada:
+    """Medições de uma chamada em andamento (as chamadas internas somam na de fora)."""
+    __slots__ = ('nome', 'tempo_conexao', 'tempo_planos', 'linhas', 'comandos')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.tempo_conexao = 0.0
+        self.tempo_planos = 0.0 # Tempo gasto lendo planos; descontado do tempo da chamada
+        self.linhas = 0
+        self.comandos = []
+
+def _pilha():
+    pilha = getattr(_contexto, 'pilha', None)
+    if pilha is None:
+        pilha = _contexto.pilha = []
+    return pilha
+
+def _chamada_atual():
+    pilha = _pilha()
+    return pilha[-1] if pilha else None
+
+#==============================================================================
+# CURSOR E CONEXÃO MEDIDOS
+#==============================================================================
+class CursorMedido:
+    """Repassa tudo ao cursor original, anotando comandos, planos e linhas lidas na chamada atual."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def _anotar(self, comando, params):
+        chamada = _chamada_atual()
+        if chamada is None or len(chamada.comandos) >= MAX_COMANDOS_POR_CHAMADA:
+            return
+        sql = getattr(comando, 'sql', comando)
+        inicio = time.perf_counter()
+        plano = _plano_do_comando(self._cursor, sql)
+        chamada.tempo_planos += time.perf_counter() - inicio
+        chamada.comandos.append((sql, params, plano))
+
+    def execute(self, comando, params=()):
+        self._cursor.execute(comando, params)
+        self._anotar(comando, params)
+        return self
+
+    def executemany(self, comando, seq_params):
+        seq_params = list(seq_params)
+        self._cursor.executemany(comando, seq_params)
+        self._anotar(comando, f"{len(seq_params)} conjuntos de parâmetros")
+        return self
+
+    def _contar(self, linhas):
+        chamada = _chamada_atual()
+        if chamada is not None:
+            chamada.linhas += linhas
+
+    def fetchone(self):
+        linha = self._cursor.fetchone()
+        if linha is not None:
+            self._contar(1)
+        return linha
+
+    def fetchmany(self, *args):
+        linhas = self._cursor.fetchmany(*args)
+        self._contar(len(linhas))
+        return linhas
+
+    def fetchall(self):
+        linhas = self._cursor.fetchall()
+        self._contar(len(linhas))
+        return linhas
+
+def _plano_do_comando(cursor, sql):
+    """
+    Plano do comando que o cursor acabou de executar. Ler cursor.plan custa uma ida ao
+    servidor no Firebird; como o comando preparado mantém o plano, ele é lido uma vez
+    por texto de SQL e reaproveitado nas execuções seguintes.
+    """
+    with _lock_planos:
+        if sql in _planos:
+            _planos.move_to_end(sql)
+            return _planos[sql]
+    try:
+        plano = cursor.plan
+    except Exception as e:
+        return f"(plano indisponível: {e})" # Não é guardado: a próxima execução tenta de novo
+    with _lock_planos:
+        _planos[sql] = plano
+        if len(_planos) > MAX_PLANOS_GUARDADOS:
+            _planos.popitem(last=False)
+    return plano
+
+def _descartar_planos():
+    with _lock_planos:
+        _planos.clear()
+
+configuracoes.ao_invalidar(_descartar_planos) # Outro banco pode ter outros índices
+
+class ConexaoMedida:
+    """Conexão do pool cujos cursores (inclusive os de executar) são medidos."""
+    def __init__(self, conexao):
+        self._conexao = conexao
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def cursor(self):
+        return CursorMedido(self._conexao.cursor())
+
+    def executar(self, sql, params=()):
+        cursor = CursorMedido(self._conexao.executar(sql, params))
+        cursor._anotar(sql, params)
+        return cursor
+
+def _obter_conexao_medida(obter):
+    @functools.wraps(obter)
+    def medida():
+        inicio = time.perf_counter()
+        conexao = obter()
+        chamada = _chamada_atual()
+        if chamada is not None:
+            chamada.tempo_conexao += time.perf_counter() - inicio
+        return ConexaoMedida(conexao)
+    return medida
+
+#==============================================================================
+# FUNÇÕES MEDIDAS
+#==============================================================================
+def _medir(nome, funcao):
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        chamada = Chamada(nome)
+        pilha = _pilha()
+        pilha.append(chamada)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            tempo = time.perf_counter() - inicio - chamada.tempo_planos
+            pilha.pop()
+            if pilha:
+                externa = pilha[-1]
+                externa.tempo_conexao += chamada.tempo_conexao
+                externa.tempo_planos += chamada.tempo_planos
+                externa.linhas += chamada.linhas
+                externa.comandos.extend(chamada.comandos[:MAX_COMANDOS_POR_CHAMADA - len(externa.comandos)])
+            _registrar(chamada, tempo)
+    return medida
+
+def _registrar(chamada, tempo):
+    with _lock:
+        estatistica = _estatisticas.setdefault(chamada.nome, [0, 0.0, 0.0, 0, 0.0])
+        estatistica[0] += 1
+        estatistica[1] += tempo
+        estatistica[2] = max(estatistica[2], tempo)
+        estatistica[3] += chamada.linhas
+        estatistica[4] += chamada.tempo_conexao
+    if tempo >= _limite_segundos:
+        partes = [f"LENTA {chamada.nome}: {tempo * 1000:.1f} ms "
+                  f"(conexão {chamada.tempo_conexao * 1000:.1f} ms, {chamada.linhas} linhas)"]
+        for sql, params, plano in chamada.comandos:
+            partes.append(f"  SQL: {' '.join(str(sql).split())}")
+            partes.append(f"  Parâmetros: {_repr_parametros.repr(params)}")
+            partes.append(f"  Plano: {plano}")
+        _log.warning("\n".join(partes))
+
+#==============================================================================
+# ATIVAÇÃO
+#==============================================================================
+def ativar(limite_ms=200, arquivo=None, tamanho_kb=1024, copias=3):
+    """
+    Passa a medir as funções públicas de database.py. As chamadas que levarem
+    'limite_ms' ou mais são gravadas em 'arquivo' (padrão: Data/consultas_lentas.log),
+    rotacionado a cada 'tamanho_kb' KB, guardando 'copias' arquivos antigos.
+    """
+    global _limite_segundos
+    _limite_segundos = limite_ms / 1000
+    if _originais:
+        return
+    arquivo = arquivo or os.path.join(database._pasta_dados(), "consultas_lentas.log")
+    handler = logging.handlers.RotatingFileHandler(arquivo, maxBytes=tamanho_kb * 1024, backupCount=copias, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _log.addHandler(handler)
+    _log.setLevel(logging.INFO)
+
+    for nome, funcao in list(vars(database).items()):
+        if (inspect.isfunction(funcao) and funcao.__module__ == database.__name__
+                and not nome.startswith('_') and not nome.startswith('fluxo_') and nome not in NAO_MEDIR):
+            _originais[nome] = funcao
+            setattr(database, nome, _medir(nome, funcao))
+    for nome in ('conectar', 'conectar_leitura'):
+        _originais[nome] = getattr(database, nome)
+        setattr(database, nome, _obter_conexao_medida(_originais[nome]))
+    print(f"⏱️ Medição de consultas ativa (limite {limite_ms} ms): {arquivo}")
+
+def desativar():
+    """Restaura as funções originais de database.py e fecha o log."""
+    for nome, funcao in _originais.items():
+        setattr(database, nome, funcao)
+    _originais.clear()
+    for handler in list(_log.handlers):
+        _log.removeHandler(handler)
+        handler.close()
+
+def ativar_se_configurado():
+    """Ativa a medição se 'diagnostico/ativo' estiver ligado nas configurações."""
+    settings = configuracoes.obter()
+    if settings["diagnostico/ativo"]:
+        ativar(limite_ms=settings["diagnostico/limite_ms"], arquivo=settings["diagnostico/arquivo"] or None,
+               tamanho_kb=settings["diagnostico/tamanho_kb"])
+
+def resumo():
+    """
+    Retorna as medições acumuladas por função, da que mais tempo consumiu no total
+    para a que menos: dicionários com NOME, CHAMADAS, TEMPO_TOTAL_MS, TEMPO_MEDIO_MS,
+    TEMPO_MAX_MS, LINHAS e TEMPO_CONEXAO_MS.
+    """
+    with _lock:
+        itens = [(nome, list(valores)) for nome, valores in _estatisticas.items()]
+    itens.sort(key=lambda item: item[1][1], reverse=True)
+    return [
+        {'NOME': nome, 'CHAMADAS': chamadas, 'TEMPO_TOTAL_MS': total * 1000, 'TEMPO_MEDIO_MS': total * 1000 / chamadas,
+         'TEMPO_MAX_MS': maximo * 1000, 'LINHAS': linhas, 'TEMPO_CONEXAO_MS': conexao * 1000}
+        for nome, (chamadas, total, maximo, linhas, conexao) in itens
+    ]
+
+def registrar_resumo():
+    """Grava o resumo() no log (chamada ao fechar o programa, se a medição estiver ativa)."""
+    if not _originais:
+        return
+    linhas = ["RESUMO (função: chamadas, total, médio, máximo, linhas, conexão)"]
+    for item in resumo():
+        linhas.append(f"  {item['NOME']}: {item['CHAMADAS']}x, {item['TEMPO_TOTAL_MS']:.1f} ms, "
+                      f"{item['TEMPO_MEDIO_MS']:.1f} ms, {item['TEMPO_MAX_MS']:.1f} ms, "
+                      f"{item['LINHAS']} linhas, {item['TEMPO_CONEXAO_MS']:.1f} ms")
+    _log.info("\n".join(linhas))
@@ -10,14 +10,17 @@ import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QDialog, QLineEdit, QComboBox, QMessageBox, 
                              QFileDialog, QFormLayout, QCheckBox, QTextEdit, QTableWidget, 
-                             QTableWidgetItem, QHeaderView, QColorDialog, QSystemTrayIcon, QStyle,
+                             QTableWidgetItem, QTableView, QHeaderView, QColorDialog, QSystemTrayIcon, QStyle,
                              QTimeEdit, QSpinBox, QRadioButton, QGroupBox, QDateEdit, QListWidget, 
                              QListWidgetItem, QMenu, QTreeWidget, QTreeWidgetItem, QToolTip,QCompleter,QTextBrowser)
 from PyQt5.QtGui import QPainter, QColor, QBrush, QFont, QIcon
-from PyQt5.QtCore import Qt, QDate, pyqtSignal, QTimer, QTime, QSettings,QThread,QStringListModel
+from PyQt5.QtCore import Qt, QDate, pyqtSignal, QTimer, QTime, QSettings,QThread,QStringListModel,QAbstractTableModel,QModelIndex
 
 import database 
 import export
+import configuracoes
+import notificacoes
+import instrumentacao
 #from theme_manager import ThemeManager, load_stylesheet
 
 VERSAO_ATUAL = "1.8"
@@ -119,6 +122,7 @@ class LoginDialog(QDialog):
             try:
                 settings = QSettings()
                 settings.clear()
+                configuracoes.invalidar()
                 QMessageBox.information(self, "Sucesso", 
                                         "As configurações foram resetadas com sucesso. O aplicativo agora será fechado.")
                 QApplication.instance().quit()
@@ -341,7 +345,7 @@ class DialogoCliente(QDialog):
                 cliente_id_salvo = self.cliente_id
             else:
                 database.adicionar_cliente(**dados_cliente, usuario_logado=usuario_nome)
-                conn = database.conectar()
+                conn = database.conectar_leitura()
                 cur = conn.cursor()
                 cur.execute("SELECT MAX(ID) FROM CLIENTES")
                 cliente_id_salvo = cur.fetchone()[0]
@@ -407,9 +411,8 @@ class DialogoCliente(QDialog):
                                 data_final_agendamento = hoje.addDays(1)
                                 continue
                             
-                            if database.is_dia_invalido(data_final_agendamento):
-                                data_final_agendamento = data_final_agendamento.addDays(1)
-                                continue
+                            # Pula fins de semana e feriados nacionais (calendário em memória, sem consulta por dia)
+                            data_final_agendamento = database.proximo_dia_util(data_final_agendamento)
 
                             horarios_possiveis = self.main_window.gerar_horarios_dinamicos(data_final_agendamento)
                             agendamentos_no_dia = database.get_entregas_por_dia(data_final_agendamento.toString("yyyy-MM-dd"))
@@ -570,14 +573,13 @@ class DialogoClientesInativos(QDialog):
             
             # Adiciona à lista apenas se for inativo há 3 meses ou mais (ou nunca agendou)
             if meses_inativo >= 3:
-                cliente['status_formatado'] = status
-                clientes_inativos.append(cliente)
+                clientes_inativos.append((cliente, status))
 
         self.tabela_inativos.setRowCount(len(clientes_inativos))
-        for i, cliente in enumerate(clientes_inativos):
+        for i, (cliente, status) in enumerate(clientes_inativos):
             self.tabela_inativos.setItem(i, 0, QTableWidgetItem(cliente['NOME']))
             self.tabela_inativos.setItem(i, 1, QTableWidgetItem(cliente.get('CONTATO', '')))
-            self.tabela_inativos.setItem(i, 2, QTableWidgetItem(cliente['status_formatado']))
+            self.tabela_inativos.setItem(i, 2, QTableWidgetItem(status))
     
     def filtrar_tabela(self):
         texto_busca = self.busca_edit.text().lower().strip()
@@ -809,66 +811,86 @@ class JanelaClientes(QDialog):
             else:
                 self.tabela_clientes.setRowHidden(i, True)
 
+    # Colunas da planilha -> campos do cliente
+    MAPA_COLUNAS_IMPORTACAO = {
+        'Clientes': 'nome', 'Envia do nosso ou deles?': 'tipo_envio',
+        'Email da contabilidade (Ou local a ser deixado)': 'contato',
+        'Gera Recibo?': 'gera_recibo', 'Contar XMLs?': 'conta_xmls',
+        'Nível': 'nivel', 'Outros detalhes': 'detalhes',
+        'Nº de Computadores': 'numero_computadores',
+        'Telefone 1': 'telefone1',
+        'Telefone 2': 'telefone2'
+    }
+
+    @classmethod
+    def _normalizar_planilha_clientes(cls, df):
+        """
+        Valida e normaliza a planilha inteira de uma vez (operações por coluna).
+        Retorna (clientes_validos, rejeitados), onde clientes_validos é uma lista
+        de (linha_planilha, dados_cliente) e rejeitados é uma lista de (linha_planilha, motivo).
+        """
+        dados = pd.DataFrame(index=df.index)
+        for col_excel, col_db in cls.MAPA_COLUNAS_IMPORTACAO.items():
+            coluna = df[col_excel] if col_excel in df.columns else pd.Series(None, index=df.index, dtype=object)
+            if col_db in ('gera_recibo', 'conta_xmls'):
+                dados[col_db] = coluna.astype(str).str.strip().str.lower().isin(['sim', 'true', '1'])
+            elif col_db == 'numero_computadores':
+                dados[col_db] = pd.to_numeric(coluna, errors='coerce')
+            else:
+                texto = coluna.astype(str).str.strip()
+                dados[col_db] = texto.where(coluna.notna() & (texto != ''), None)
+
+        motivos = pd.Series(None, index=df.index, dtype=object)
+        if 'Nº de Computadores' in df.columns:
+            pc_invalido = df['Nº de Computadores'].notna() & dados['numero_computadores'].isna()
+            motivos = motivos.mask(pc_invalido, "Nº de Computadores inválido")
+        for col_excel in reversed(['Clientes', 'Envia do nosso ou deles?', 'Email da contabilidade (Ou local a ser deixado)']):
+            col_db = cls.MAPA_COLUNAS_IMPORTACAO[col_excel]
+            motivos = motivos.mask(dados[col_db].isna(), f"Coluna obrigatória vazia: {col_excel}")
+
+        # Célula vazia em Nº de Computadores assume 1 computador
+        dados['numero_computadores'] = dados['numero_computadores'].fillna(1).astype(int)
+
+        clientes_validos, rejeitados = [], []
+        # Linha da planilha = índice + 2 (cabeçalho + contagem a partir de 1)
+        for linha, motivo, registro in zip((df.index + 2).tolist(), motivos.tolist(), dados.to_dict('records')):
+            if motivo is None:
+                clientes_validos.append((linha, registro))
+            else:
+                rejeitados.append((linha, motivo))
+        return clientes_validos, rejeitados
+
     def importar_clientes(self):
         caminho_arquivo, _ = QFileDialog.getOpenFileName(self, "Selecionar arquivo XLSX", "", "Arquivos Excel (*.xlsx)")
         if not caminho_arquivo: return
         try:
             df = pd.read_excel(caminho_arquivo)
-            
-            mapa_colunas = { 
-                'Clientes': 'nome', 'Envia do nosso ou deles?': 'tipo_envio', 
-                'Email da contabilidade (Ou local a ser deixado)': 'contato', 
-                'Gera Recibo?': 'gera_recibo', 'Contar XMLs?': 'conta_xmls', 
-                'Nível': 'nivel', 'Outros detalhes': 'detalhes',
-                'Nº de Computadores': 'numero_computadores',
-                'Telefone 1': 'telefone1',
-                'Telefone 2': 'telefone2'
-            }
 
             colunas_obrigatorias = ['Clientes', 'Envia do nosso ou deles?', 'Email da contabilidade (Ou local a ser deixado)']
             if not all(col in df.columns for col in colunas_obrigatorias):
                 QMessageBox.critical(self, "Erro de Importação", f"O arquivo deve conter as colunas obrigatórias: {', '.join(colunas_obrigatorias)}"); return
-            
-            clientes_importados = 0
-            usuario_nome = self.usuario_logado['USERNAME']
-            for _, row in df.iterrows():
-                dados_cliente = {}
-                for col_excel, col_db in mapa_colunas.items():
-                    if col_excel in row:
-                        valor = row[col_excel]
-                        if col_excel in ['Gera Recibo?', 'Contar XMLs?']: 
-                            dados_cliente[col_db] = str(valor).lower() in ['sim', 'true', '1']
-                        elif pd.isna(valor): 
-                            dados_cliente[col_db] = None
-                        else: 
-                            dados_cliente[col_db] = str(valor)
-                    else: 
-                        dados_cliente[col_db] = None
-                
-                if dados_cliente.get('nome') and dados_cliente.get('tipo_envio') and dados_cliente.get('contato'):
-                    # --- INÍCIO DA CORREÇÃO ---
-                    # Pega o valor lido da planilha
-                    num_pc = dados_cliente.get('numero_computadores')
-                    
-                    # Se o valor for None (célula vazia), define um padrão.
-                    if num_pc is None:
-                        num_pc = 1
-                    
-                    database.adicionar_cliente(
-                        nome=dados_cliente['nome'], tipo_envio=dados_cliente['tipo_envio'], 
-                        contato=dados_cliente['contato'], gera_recibo=dados_cliente.get('gera_recibo', False), 
-                        conta_xmls=dados_cliente.get('conta_xmls', False), nivel=dados_cliente.get('nivel'), 
-                        detalhes=dados_cliente.get('detalhes'),
-                        numero_computadores=int(float(num_pc)), # Agora é seguro converter para int
-                        telefone1=dados_cliente.get('telefone1'),
-                        telefone2=dados_cliente.get('telefone2'),
-                        usuario_logado=usuario_nome
-                    )
-                    # --- FIM DA CORREÇÃO ---
-                    clientes_importados += 1
-            QMessageBox.information(self, "Sucesso", f"{clientes_importados} clientes importados com sucesso!"); self.carregar_clientes()
-        except Exception as e: 
-            QMessageBox.critical(self, "Erro de Importação", f"Ocorreu um erro ao ler o arquivo:\n{e}")
+
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                clientes_validos, rejeitados = self._normalizar_planilha_clientes(df)
+                clientes_importados, recusados = database.adicionar_clientes_em_lote(
+                    [dados for _, dados in clientes_validos], self.usuario_logado['USERNAME']
+                )
+            finally:
+                QApplication.restoreOverrideCursor()
+            rejeitados += [(clientes_validos[indice][0], motivo) for indice, motivo in recusados]
+        except Exception as e:
+            QMessageBox.critical(self, "Erro de Importação", f"Ocorreu um erro ao ler o arquivo:\n{e}"); return
+
+        self.carregar_clientes()
+        if not rejeitados:
+            QMessageBox.information(self, "Sucesso", f"{clientes_importados} clientes importados com sucesso!"); return
+        msg = QMessageBox(self)
+        msg.setIcon(QMessageBox.Warning)
+        msg.setWindowTitle("Importação Concluída")
+        msg.setText(f"{clientes_importados} clientes importados com sucesso.\n{len(rejeitados)} linhas não foram importadas.")
+        msg.setDetailedText("\n".join(f"Linha {linha}: {motivo}" for linha, motivo in sorted(rejeitados)))
+        msg.exec_()
     def carregar_clientes(self):
         self.tabela_clientes.setRowCount(0)
         for cliente in database.listar_clientes():
@@ -1592,47 +1614,106 @@ class DayViewDialog(QDialog):
             self.parent().populate_calendar()
 
 
+class ContagemBuscaThread(QThread):
+    """Conta em segundo plano o total de resultados da busca global."""
+    concluida = pyqtSignal(int)
+    def __init__(self, termo, parent=None):
+        super().__init__(parent)
+        self.termo = termo
+    def run(self):
+        try:
+            self.concluida.emit(database.contar_agendamentos_busca(self.termo))
+        except Exception as e:
+            print(f"Erro ao contar resultados da busca: {e}")
+
+class ModeloResultadosBusca(QAbstractTableModel):
+    """
+    Resultados da busca global carregados por páginas: a QTableView pede a próxima
+    página (fetchMore) conforme o usuário rola a tabela.
+    """
+    COLUNAS = ["Data", "Horário", "Cliente", "Status", "Responsável"]
+    TAMANHO_PAGINA = 100
+
+    def __init__(self, termo, parent=None):
+        super().__init__(parent)
+        self.termo = termo
+        self.linhas = []
+        self._cursor = None
+        self._fim = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.linhas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUNAS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUNAS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        res = self.linhas[index.row()]
+        if role == Qt.UserRole:
+            return res
+        if role != Qt.DisplayRole:
+            return None
+        coluna = index.column()
+        if coluna == 0:
+            # Converte a data do DB para o formato dd/MM/yyyy para exibição
+            return QDate.fromString(str(res['DATA_VENCIMENTO']), 'yyyy-MM-dd').toString('dd/MM/yyyy')
+        if coluna == 1:
+            return res.get('HORARIO') or ''
+        if coluna == 2:
+            return res.get('NOME_CLIENTE') or ''
+        if coluna == 3:
+            return res.get('NOME_STATUS') or 'N/A'
+        return res.get('RESPONSAVEL') or ''
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._fim
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fim:
+            return
+        pagina, self._cursor = database.buscar_agendamentos_pagina(self.termo, self._cursor, self.TAMANHO_PAGINA)
+        self._fim = self._cursor is None
+        if pagina:
+            self.beginInsertRows(QModelIndex(), len(self.linhas), len(self.linhas) + len(pagina) - 1)
+            self.linhas.extend(pagina)
+            self.endInsertRows()
+
 class DialogoResultadosBusca(QDialog):
-    def __init__(self, resultados, usuario_logado, parent=None):
+    def __init__(self, modelo, usuario_logado, parent=None):
         super().__init__(parent)
         self.usuario_logado = usuario_logado
         self.setWindowTitle("Resultados da Busca")
         self.setMinimumSize(800, 500)
 
         layout = QVBoxLayout(self)
-        self.tabela_resultados = QTableWidget()
-        self.tabela_resultados.setColumnCount(5)
-        self.tabela_resultados.setHorizontalHeaderLabels(["Data", "Horário", "Cliente", "Status", "Responsável"])
-        self.tabela_resultados.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela_resultados.setSelectionBehavior(QTableWidget.SelectRows)
+        self.modelo = modelo
+        self.tabela_resultados = QTableView()
+        self.tabela_resultados.setModel(self.modelo)
+        self.tabela_resultados.setEditTriggers(QTableView.NoEditTriggers)
+        self.tabela_resultados.setSelectionBehavior(QTableView.SelectRows)
         self.tabela_resultados.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.tabela_resultados.setSortingEnabled(True) # Habilita a ordenação por coluna
 
+        self.total_label = QLabel("Contando resultados...")
         layout.addWidget(QLabel("Clique duplo em uma linha para abrir o dia do agendamento."))
         layout.addWidget(self.tabela_resultados)
+        layout.addWidget(self.total_label)
 
-        self.popular_tabela(resultados)
+        self.tabela_resultados.doubleClicked.connect(self.abrir_agendamento)
 
-        self.tabela_resultados.cellDoubleClicked.connect(self.abrir_agendamento)
+        # O total pode exigir varrer a tabela (termos curtos): é contado em segundo plano
+        self.contagem_thread = ContagemBuscaThread(self.modelo.termo, self)
+        self.contagem_thread.concluida.connect(lambda total: self.total_label.setText(f"{total} agendamento(s) encontrado(s)."))
+        self.contagem_thread.start()
 
-    def popular_tabela(self, resultados):
-        self.tabela_resultados.setRowCount(len(resultados))
-        for i, res in enumerate(resultados):
-            # Converte a data do DB para o formato dd/MM/yyyy para exibição
-            data_obj = QDate.fromString(str(res['DATA_VENCIMENTO']), 'yyyy-MM-dd')
-            item_data = QTableWidgetItem(data_obj.toString('dd/MM/yyyy'))
-            
-            item_data.setData(Qt.UserRole, res)
-
-            self.tabela_resultados.setItem(i, 0, item_data)
-            self.tabela_resultados.setItem(i, 1, QTableWidgetItem(res.get('HORARIO', '')))
-            self.tabela_resultados.setItem(i, 2, QTableWidgetItem(res.get('NOME_CLIENTE', '')))
-            self.tabela_resultados.setItem(i, 3, QTableWidgetItem(res.get('NOME_STATUS', 'N/A')))
-            self.tabela_resultados.setItem(i, 4, QTableWidgetItem(res.get('RESPONSAVEL', '')))
-
-    def abrir_agendamento(self, row, column):
-        item_selecionado = self.tabela_resultados.item(row, 0)
-        dados_agendamento = item_selecionado.data(Qt.UserRole)
+    def abrir_agendamento(self, index):
+        dados_agendamento = self.modelo.data(index, Qt.UserRole)
         
         data_do_agendamento = QDate.fromString(str(dados_agendamento['DATA_VENCIMENTO']), 'yyyy-MM-dd')
 
@@ -1654,13 +1735,17 @@ class ConfigDialog(QDialog):
         db_main_layout.addWidget(self.radio_remoto)
         self.local_db_group = QGroupBox("Conexão Local")
         local_db_layout = QFormLayout()
+        self.motor_combo = QComboBox()
+        self.motor_combo.addItem("Firebird (servidor instalado no computador)", "firebird")
+        self.motor_combo.addItem("SQLite (embutido, apenas este computador)", "sqlite")
+        local_db_layout.addRow("Motor do banco:", self.motor_combo)
         caminho_layout = QHBoxLayout()
         self.caminho_local_edit = QLineEdit()
         procurar_btn = QPushButton("Procurar...")
         procurar_btn.clicked.connect(self.procurar_arquivo_db)
         caminho_layout.addWidget(self.caminho_local_edit)
         caminho_layout.addWidget(procurar_btn)
-        local_db_layout.addRow("Caminho do Arquivo (.FDB):", caminho_layout)
+        local_db_layout.addRow("Caminho do Arquivo:", caminho_layout)
         self.local_db_group.setLayout(local_db_layout)
         db_main_layout.addWidget(self.local_db_group)
         self.remoto_db_group = QGroupBox("Conexão Remota")
@@ -1738,11 +1823,23 @@ class ConfigDialog(QDialog):
         self.radio_auto.toggled.connect(self.atualizar_modo_horario_visivel)
         self.radio_local.toggled.connect(self.atualizar_modo_db_visivel)
         self.carregar_configs()
+        self.motor_combo.currentIndexChanged.connect(self.trocar_extensao_arquivo_db)
 
     def procurar_arquivo_db(self):
-        caminho, _ = QFileDialog.getSaveFileName(self, "Selecionar ou Criar Arquivo de Banco de Dados", "", "Firebird Database (*.fdb)")
+        if self.motor_combo.currentData() == "sqlite":
+            filtro = "Banco SQLite (*.sqlite3 *.db)"
+        else:
+            filtro = "Firebird Database (*.fdb)"
+        caminho, _ = QFileDialog.getSaveFileName(self, "Selecionar ou Criar Arquivo de Banco de Dados", "", filtro)
         if caminho: self.caminho_local_edit.setText(caminho)
 
+    def trocar_extensao_arquivo_db(self):
+        # Evita apontar o SQLite para um arquivo .FDB (ou o contrário) ao trocar de motor
+        base, extensao = os.path.splitext(self.caminho_local_edit.text())
+        if extensao.lower() in ('.fdb', '.sqlite3', '.db'):
+            nova = '.sqlite3' if self.motor_combo.currentData() == "sqlite" else '.FDB'
+            self.caminho_local_edit.setText(base + nova)
+
     def carregar_configs(self):
         modo_horario = self.settings.value("horarios/modo", "automatico")
         if modo_horario == "manual": self.radio_manual.setChecked(True)
@@ -1756,6 +1853,8 @@ class ConfigDialog(QDialog):
         modo_db = self.settings.value("database/modo", "local")
         if modo_db == "remoto": self.radio_remoto.setChecked(True)
         else: self.radio_local.setChecked(True)
+        indice_motor = self.motor_combo.findData(self.settings.value("database/motor", "firebird"))
+        self.motor_combo.setCurrentIndex(max(0, indice_motor))
         if getattr(sys, 'frozen', False):
             base_path = os.path.dirname(sys.executable)
         else:
@@ -1798,6 +1897,7 @@ class ConfigDialog(QDialog):
             self.settings.setValue("database/modo", "local")
         else:
             self.settings.setValue("database/modo", "remoto")
+        self.settings.setValue("database/motor", self.motor_combo.currentData())
         self.settings.setValue("database/caminho_local", self.caminho_local_edit.text())
         self.settings.setValue("database/host_remoto", self.host_remoto_edit.text())
         self.settings.setValue("database/porta_remota", self.porta_remota_spin.value())
@@ -1805,6 +1905,9 @@ class ConfigDialog(QDialog):
         self.settings.setValue("database/usuario", self.usuario_remoto_edit.text())
         self.settings.setValue("database/senha", self.senha_remota_edit.text())
 
+        # Descarta o snapshot em memória para que o programa passe a usar os novos valores
+        configuracoes.invalidar()
+
         QMessageBox.information(self, "Sucesso", "Configurações salvas com sucesso.\nAlgumas alterações podem exigir que o programa seja reiniciado.")
         self.accept()
 
@@ -1927,31 +2030,32 @@ class RelatorioDialog(QDialog):
         if "Agendamentos" in tipo_relatorio:
             dialog.selectFile(f"Relatorio_Agendamentos_{data_inicio}_a_{data_fim}")
             status_selecionados_ids = [item.data(Qt.UserRole) for item in self.status_list_widget.selectedItems()]
-            dados = database.get_entregas_filtradas(data_inicio, data_fim, status_selecionados_ids)
             titulo = f"Relatório de Agendamentos de {self.data_inicio_edit.date().toString('dd/MM/yyyy')} a {self.data_fim_edit.date().toString('dd/MM/yyyy')}"
-            if not dados:
+            # Só confere se há alguma linha; os dados são lidos em fluxo na exportação
+            if not database.existem_entregas_filtradas(data_inicio, data_fim, status_selecionados_ids):
                 QMessageBox.information(self, "Aviso", "Nenhum agendamento encontrado para os filtros selecionados.")
                 return
             if dialog.exec_():
                 nome_arquivo = dialog.selectedFiles()[0]
-                if nome_arquivo.endswith(".pdf"):
-                    export.exportar_para_pdf(dados, nome_arquivo, titulo)
-                elif nome_arquivo.endswith(".csv"):
-                    export.exportar_para_csv(dados, nome_arquivo)
+                with database.fluxo_entregas_filtradas(data_inicio, data_fim, status_selecionados_ids) as dados:
+                    if nome_arquivo.endswith(".pdf"):
+                        export.exportar_para_pdf(dados, nome_arquivo, titulo)
+                    elif nome_arquivo.endswith(".csv"):
+                        export.exportar_para_csv(dados, nome_arquivo)
         else:
             dialog.selectFile(f"Relatorio_Logs_{data_inicio}_a_{data_fim}")
             usuario_selecionado = self.usuario_combo.currentText()
-            dados = database.get_logs_filtrados(data_inicio, data_fim, usuario_selecionado)
             titulo = f"Relatório de Logs de {self.data_inicio_edit.date().toString('dd/MM/yyyy')} a {self.data_fim_edit.date().toString('dd/MM/yyyy')}"
-            if not dados:
+            if not database.existem_logs_filtrados(data_inicio, data_fim, usuario_selecionado):
                 QMessageBox.information(self, "Aviso", "Nenhum log encontrado para os filtros selecionados.")
                 return
             if dialog.exec_():
                 nome_arquivo = dialog.selectedFiles()[0]
-                if nome_arquivo.endswith(".pdf"):
-                    export.exportar_logs_pdf(dados, nome_arquivo, titulo)
-                else:
-                    export.exportar_logs_csv(dados, nome_arquivo)
+                with database.fluxo_logs_filtrados(data_inicio, data_fim, usuario_selecionado) as dados:
+                    if nome_arquivo.endswith(".pdf"):
+                        export.exportar_logs_pdf(dados, nome_arquivo, titulo)
+                    else:
+                        export.exportar_logs_csv(dados, nome_arquivo)
         self.accept()
 
 class DialogoSobre(QDialog):
@@ -2257,21 +2361,37 @@ class CalendarWindow(QMainWindow):
         self.main_layout = QVBoxLayout(self.central_widget)
         self.notificados_nesta_sessao = set()
         self.feriados = {}
+        self._chave_exibida = None # (versão dos dados, mês exibido, dia de hoje) da última pintura
+        try:
+            self.leitor_alteracoes = database.LeitorAlteracoes()
+        except Exception as e:
+            print(f"⚠️ Registro de alterações indisponível: {e}")
+            self.leitor_alteracoes = None
         self.setup_ui()
         self.setup_tray_icon()
         self.setup_timer_notificacoes()
         self.populate_calendar()
         self.verificar_atualizacao()
 
-        settings = QSettings()
-        intervalo_segundos = settings.value("geral/refresh_intervalo_segundos", 30, type=int)
+        intervalo_segundos = configuracoes.obter()["geral/refresh_intervalo_segundos"]
         intervalo_ms = intervalo_segundos * 1000
         
         self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.populate_calendar)
+        self.refresh_timer.timeout.connect(self._atualizar_se_alterado)
         self.refresh_timer.start(intervalo_ms)
         print(f"🔄 Atualização automática configurada para cada {intervalo_segundos} segundos.")
 
+        # Avisos imediatos das alterações feitas em outros computadores.
+        # Enquanto estiverem funcionando, o timer acima passa a ser só uma reserva.
+        # O SQLite embutido atende um único computador e não tem esses avisos.
+        self.ouvinte_alteracoes = None
+        if database.suporta_eventos():
+            self.ouvinte_alteracoes = notificacoes.OuvinteAlteracoes(parent=self)
+            self.ouvinte_alteracoes.alteracao.connect(self._ao_receber_alteracoes)
+            self.ouvinte_alteracoes.conectado.connect(self._ao_conectar_notificacoes)
+            self.ouvinte_alteracoes.desconectado.connect(self._ao_perder_notificacoes)
+            self.ouvinte_alteracoes.start()
+
         self.center()
 
     def center(self):
@@ -2294,10 +2414,16 @@ class CalendarWindow(QMainWindow):
         else: return "#5cb85c"
         
     def gerar_horarios_dinamicos(self, para_data):
-        settings = QSettings()
-        modo = settings.value("horarios/modo", "automatico")
+        # A grade de horários depende apenas das configurações, então é calculada
+        # uma vez por snapshot (e recalculada quando as configurações são salvas).
+        horarios = configuracoes.obter().obter_derivado("horarios", self._calcular_horarios)
+        return list(horarios)
+
+    @staticmethod
+    def _calcular_horarios(settings):
+        modo = settings["horarios/modo"]
         if modo == "manual":
-            lista_manual = settings.value("horarios/lista_manual", "09:00,10:00,11:00")
+            lista_manual = settings["horarios/lista_manual"]
             horarios_validos = []
             for horario_str in lista_manual.split(','):
                 horario_str = horario_str.strip()
@@ -2307,9 +2433,9 @@ class CalendarWindow(QMainWindow):
                 except: pass
             return sorted(horarios_validos)
         else:
-            hora_inicio = QTime.fromString(settings.value("horarios/hora_inicio", "08:30"), 'HH:mm')
-            hora_fim = QTime.fromString(settings.value("horarios/hora_fim", "17:30"), 'HH:mm')
-            intervalo = settings.value("horarios/intervalo_minutos", 30, type=int)
+            hora_inicio = QTime.fromString(settings["horarios/hora_inicio"], 'HH:mm')
+            hora_fim = QTime.fromString(settings["horarios/hora_fim"], 'HH:mm')
+            intervalo = settings["horarios/intervalo_minutos"]
             horarios = []; hora_atual = hora_inicio
             while hora_atual <= hora_fim:
                 horarios.append(hora_atual.toString('HH:mm'))
@@ -2318,15 +2444,19 @@ class CalendarWindow(QMainWindow):
     
     def _atualizar_sugestoes(self):
         data_busca = QDate.currentDate()
+        # Dias sem nenhum agendamento não aparecem no resumo e não precisam de consulta
+        dias_com_agendamento = database.get_resumo_dias(data_busca.toPyDate(), data_busca.addDays(30).toPyDate())
         for _ in range(30):
-            dia_da_semana = data_busca.dayOfWeek()
-            tipo_feriado = self.feriados.get(data_busca)
-            if dia_da_semana in [6, 7] or tipo_feriado == "nacional":
+            # Os 30 dias podem passar do mês exibido: o calendário de dias úteis cobre vários anos
+            if not database.is_dia_util(data_busca):
                 data_busca = data_busca.addDays(1)
                 continue
             todos_horarios = self.gerar_horarios_dinamicos(data_busca)
-            agendamentos_dia = database.get_entregas_por_dia(data_busca.toString("yyyy-MM-dd"))
-            horarios_ocupados = set(agendamentos_dia.keys())
+            if data_busca.toPyDate() in dias_com_agendamento:
+                agendamentos_dia = database.get_entregas_por_dia(data_busca.toString("yyyy-MM-dd"))
+                horarios_ocupados = set(agendamentos_dia.keys())
+            else:
+                horarios_ocupados = set()
             horarios_livres = [h for h in todos_horarios if h not in horarios_ocupados]
             if horarios_livres:
                 hoje = QDate.currentDate()
@@ -2340,7 +2470,82 @@ class CalendarWindow(QMainWindow):
             data_busca = data_busca.addDays(1)
         self.sugestoes_label.setText("Nenhum horário livre<br>encontrado.")
 
+    def _chave_atualizacao(self):
+        """Identifica o que está na tela: muda quando o banco, o mês exibido ou o dia de hoje mudam."""
+        try:
+            versao = database.get_versao_dados()
+        except Exception as e:
+            print(f"⚠️ Erro ao ler a versão dos dados: {e}")
+            return None
+        return (versao, self.current_date.year, self.current_date.month, QDate.currentDate())
+
+    def _ao_receber_alteracoes(self, eventos):
+        # O que exatamente mudou é lido do registro de alterações (ver _alteracoes_afetam_tela)
+        self._atualizar_se_alterado()
+
+    def _alteracoes_afetam_tela(self):
+        """
+        Lê as alterações novas e diz se alguma aparece na tela: um dia do mês exibido,
+        os próximos 30 dias (sugestões) ou clientes/status (painel e cores).
+        Aproveita para renovar o cache de clientes/status e o auto-complete quando preciso.
+        """
+        if self.leitor_alteracoes is None:
+            database.invalidar_cache_referencia()
+            database.invalidar_calendario_uteis()
+            return True
+        try:
+            alteracoes = self.leitor_alteracoes.novas()
+        except Exception as e:
+            print(f"⚠️ Erro ao ler o registro de alterações: {e}")
+            return True
+
+        entidades = {a['ENTIDADE'] for a in alteracoes}
+        if 'CLIENTES' in entidades:
+            database.invalidar_cache_referencia('clientes')
+            self._atualizar_completer_busca()
+        if 'STATUS' in entidades:
+            database.invalidar_cache_referencia('status')
+        if 'FERIADOS' in entidades:
+            database.invalidar_calendario_uteis()
+        if entidades & {'CLIENTES', 'STATUS'}:
+            return True
+
+        inicio_mes = self.current_date.date().replace(day=1)
+        _, dias_no_mes = calendar.monthrange(inicio_mes.year, inicio_mes.month)
+        fim_mes = inicio_mes + timedelta(days=dias_no_mes)
+        hoje = datetime.now().date()
+        fim_sugestoes = hoje + timedelta(days=30)
+        for alteracao in alteracoes:
+            data_ref = alteracao['DATA_REF']
+            if data_ref is None or inicio_mes <= data_ref < fim_mes or hoje <= data_ref <= fim_sugestoes:
+                return True
+        return False
+
+    def _ao_conectar_notificacoes(self):
+        intervalo_segundos = configuracoes.obter()["geral/refresh_reserva_segundos"]
+        self.refresh_timer.setInterval(intervalo_segundos * 1000)
+        print(f"🔔 Avisos de alteração ativos. Atualização automática de reserva a cada {intervalo_segundos} segundos.")
+
+    def _ao_perder_notificacoes(self, erro):
+        intervalo_segundos = configuracoes.obter()["geral/refresh_intervalo_segundos"]
+        self.refresh_timer.setInterval(intervalo_segundos * 1000)
+        print(f"⚠️ Avisos de alteração indisponíveis ({erro}). Voltando à atualização a cada {intervalo_segundos} segundos.")
+
+    def _atualizar_se_alterado(self):
+        """Chamado pelo refresh_timer: só refaz o calendário se algo mudou desde a última pintura."""
+        chave = self._chave_atualizacao()
+        if chave is not None and chave == self._chave_exibida:
+            return
+        mesma_tela = chave is not None and self._chave_exibida is not None and chave[1:] == self._chave_exibida[1:]
+        if mesma_tela and not self._alteracoes_afetam_tela():
+            # Só mudaram dados de outros meses: nada a refazer
+            self._chave_exibida = chave
+            return
+        self.populate_calendar()
+
     def populate_calendar(self):
+        # Lida antes das consultas: uma alteração feita durante a pintura gera nova pintura no próximo ciclo
+        self._chave_exibida = self._chave_atualizacao()
         for i in reversed(range(self.calendar_grid.count())):
             widget = self.calendar_grid.itemAt(i).widget()
             if widget is not None:
@@ -2348,31 +2553,23 @@ class CalendarWindow(QMainWindow):
         year = self.current_date.year
         month = self.current_date.month
 
-        try:
-            # Chama a nova função para contar apenas os pendentes
-            contagem_pendentes = database.get_contagem_solicitados_pendentes_do_mes(year, month)
-            
-            # A lógica agora se baseia apenas na contagem de pendentes
-            if contagem_pendentes > 0:
-                self.solicitados_btn.setStyleSheet("background-color: #ffc107; color: black;")
-                self.solicitados_btn.setToolTip(f"Existem {contagem_pendentes} atendimentos solicitados pendentes este mês.")
-            else:
-                self.solicitados_btn.setStyleSheet("")
-                self.solicitados_btn.setToolTip("Nenhum atendimento solicitado pendente este mês.")
+        # Todos os números do mês vêm de uma única consulta
+        resumo = database.get_resumo_mes(year, month)
 
-        except Exception as e:
-            print(f"Erro ao atualizar a cor do botão de solicitados: {e}")
+        contagem_pendentes = resumo['SOLICITADOS_PENDENTES']
+        if contagem_pendentes > 0:
+            self.solicitados_btn.setStyleSheet("background-color: #ffc107; color: black;")
+            self.solicitados_btn.setToolTip(f"Existem {contagem_pendentes} atendimentos solicitados pendentes este mês.")
+        else:
             self.solicitados_btn.setStyleSheet("")
-        # --- FIM DA ALTERAÇÃO ---
+            self.solicitados_btn.setToolTip("Nenhum atendimento solicitado pendente este mês.")
 
-        self.feriados = database.get_feriados_do_mes(year, month)
+        self.feriados = resumo['FERIADOS']
         self.month_label.setText(f"<b>{self.current_date.strftime('%B de %Y')}</b>")
-        stats = database.get_estatisticas_mensais(year, month)
-        total_clientes = database.get_total_clientes()
-        ids_clientes_atendidos = database.get_clientes_com_agendamento_concluido_no_mes(year, month)
-        concluidos_mes = stats.get('CONCLUIDOS', 0)
-        retificados_mes = stats.get('RETIFICADOS', 0)
-        clientes_pendentes = total_clientes - len(ids_clientes_atendidos)
+        total_clientes = resumo['TOTAL_CLIENTES']
+        concluidos_mes = resumo['CONCLUIDOS']
+        retificados_mes = resumo['RETIFICADOS']
+        clientes_pendentes = total_clientes - resumo['CLIENTES_ATENDIDOS']
         porcentagem_conclusao = (concluidos_mes / total_clientes) * 100 if total_clientes > 0 else 0
         cor_porcentagem = self._get_cor_porcentagem(porcentagem_conclusao)
         cor_pendentes = self._get_cor_pendentes(clientes_pendentes, total_clientes)
@@ -2395,7 +2592,7 @@ class CalendarWindow(QMainWindow):
         </table>
         """
         self.dashboard_label.setText(texto_dashboard)
-        status_dias = database.get_status_dias_para_mes(year, month)
+        status_dias = resumo['DIAS']
         month_calendar = calendar.monthcalendar(year, month)
         for week_num, week in enumerate(month_calendar):
             for day_num, day in enumerate(week):
@@ -2507,8 +2704,7 @@ class CalendarWindow(QMainWindow):
 
     def _atualizar_completer_busca(self):
         try:
-            clientes = database.listar_clientes()
-            nomes_clientes = [cliente['NOME'] for cliente in clientes if cliente.get('NOME')]
+            nomes_clientes = [nome for nome in database.get_nomes_clientes().values() if nome]
             modelo = QStringListModel()
             modelo.setStringList(nomes_clientes)
             self.completer.setModel(modelo)
@@ -2521,11 +2717,13 @@ class CalendarWindow(QMainWindow):
         if not termo:
             QMessageBox.warning(self, "Busca Inválida", "Por favor, digite algo para buscar.")
             return
-        resultados = database.buscar_agendamentos_globais(termo)
-        if not resultados:
+        # Só a primeira página é carregada agora; as demais vêm conforme a rolagem
+        modelo = ModeloResultadosBusca(termo)
+        modelo.fetchMore()
+        if modelo.rowCount() == 0:
             QMessageBox.information(self, "Nenhum Resultado", f"Nenhum agendamento encontrado para o termo '{termo}'.")
         else:
-            dialog = DialogoResultadosBusca(resultados, self.usuario_atual, self)
+            dialog = DialogoResultadosBusca(modelo, self.usuario_atual, self)
             dialog.exec_()    
 
     def verificar_atualizacao(self):
@@ -2573,10 +2771,8 @@ class CalendarWindow(QMainWindow):
         self.tray_icon.setToolTip("Agendador de Entregas"); self.tray_icon.show()
 
     def setup_timer_notificacoes(self):
-        settings = QSettings()
-        minutos_lembrete = settings.value("geral/minutos_lembrete", 15, type=int)
         self.timer = QTimer(self)
-        self.timer.timeout.connect(lambda: self.verificar_agendamentos_proximos(minutos_lembrete))
+        self.timer.timeout.connect(lambda: self.verificar_agendamentos_proximos(configuracoes.obter()["geral/minutos_lembrete"]))
         self.timer.start(60000)
 
     def verificar_agendamentos_proximos(self, minutos_antecedencia):
@@ -2591,7 +2787,15 @@ class CalendarWindow(QMainWindow):
                 self.tray_icon.showMessage(titulo, mensagem, QSystemTrayIcon.Information, 15000); self.notificados_nesta_sessao.add(ag['ID'])
 
     def closeEvent(self, event):
-        self.tray_icon.hide(); event.accept()
+        self.tray_icon.hide()
+        if self.ouvinte_alteracoes:
+            self.ouvinte_alteracoes.parar()
+        # Grava os logs que ainda estão na fila antes de encerrar as conexões
+        database.parar_escritor_auditoria()
+        database.parar_indexador_busca()
+        instrumentacao.registrar_resumo()
+        database.fechar_pool()
+        event.accept()
 
     def prev_month(self):
         self.current_date = self.current_date.replace(day=1) - timedelta(days=1)
@@ -2649,6 +2853,8 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(True)
 
+    instrumentacao.ativar_se_configurado()
+
     try:
         database.iniciar_db()
     except Exception as e:
@@ -2662,6 +2868,13 @@ if __name__ == '__main__':
     
     if login.exec_() == QDialog.Accepted:
         usuario_logado = login.usuario_logado
+        database.iniciar_escritor_auditoria()
+        # quit() (ex: após baixar uma atualização) não passa pelo closeEvent
+        app.aboutToQuit.connect(database.parar_escritor_auditoria)
+        database.iniciar_indexador_busca()
+        app.aboutToQuit.connect(database.parar_indexador_busca)
+        database.limpar_alteracoes_antigas()
+        database.compactar_resumos()
 
         window = CalendarWindow(usuario_logado)
         window.show()
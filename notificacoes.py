@@ -0,0 +1,125 @@
+# notificacoes.py
+# Avisos de alteração no banco feitos por outros computadores.
+# Os triggers criados pela migração 5 (database.py) disparam POST_EVENT a cada
+# gravação; o Firebird entrega o evento a todos os ouvintes quando a transação
+# é confirmada. A thread OuvinteAlteracoes recebe esses eventos de uma
+# "fonte" e os transforma em sinais Qt.
+import abc
+import queue
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+import database
+
+# Eventos disparados pelos triggers (um por tabela)
+EVENTOS = ('entregas_changed', 'clientes_changed', 'status_changed', 'feriados_changed')
+
+class FonteEventos(abc.ABC):
+    """
+    Origem dos eventos escutados pelo OuvinteAlteracoes (FonteEventosFirebird ou
+    FonteEventosLocal). Outra origem pode ser passada em OuvinteAlteracoes(criar_fonte=...).
+    """
+    @abc.abstractmethod
+    def aguardar(self, timeout):
+        """Espera até 'timeout' segundos e retorna o conjunto de eventos recebidos (vazio se nenhum)."""
+
+    def fechar(self):
+        pass
+
+class FonteEventosFirebird(FonteEventos):
+    """Escuta os eventos POST_EVENT do Firebird em uma conexão própria (fora do pool)."""
+    def __init__(self, eventos=EVENTOS):
+        self._conexao = database.abrir_conexao_dedicada()
+        try:
+            self._conduite = self._conexao.event_conduit(list(eventos))
+            self._conduite.begin()
+        except Exception:
+            self._conexao.close()
+            raise
+
+    def aguardar(self, timeout):
+        contagens = self._conduite.wait(timeout) or {}
+        return {evento for evento, quantidade in contagens.items() if quantidade}
+
+    def fechar(self):
+        try:
+            self._conduite.close()
+        finally:
+            self._conexao.close()
+
+class FonteEventosLocal(FonteEventos):
+    """
+    Fonte em memória, para testes e para rodar sem servidor Firebird: quem quiser
+    simular uma alteração chama publicar('entregas_changed'); desconectar(motivo)
+    faz a espera em andamento falhar como se a conexão tivesse caído (os eventos
+    ainda não entregues se perdem, como aconteceria com a conexão real).
+    """
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._erro = None
+
+    def publicar(self, evento):
+        self._fila.put(evento)
+
+    def desconectar(self, motivo="Conexão perdida"):
+        self._erro = ConnectionError(motivo)
+        self._fila.put(None) # Acorda quem está esperando
+
+    def aguardar(self, timeout):
+        eventos = set()
+        try:
+            eventos.add(self._fila.get(timeout=timeout))
+            while True:
+                eventos.add(self._fila.get_nowait())
+        except queue.Empty:
+            pass
+        if self._erro is not None:
+            erro, self._erro = self._erro, None
+            raise erro
+        eventos.discard(None)
+        return eventos
+
+class OuvinteAlteracoes(QThread):
+    """
+    Thread que espera eventos da fonte e emite 'alteracao' com o conjunto de
+    eventos recebidos. Se a fonte falhar, emite 'desconectado' e tenta
+    recriá-la a cada 'espera_reconexao' segundos; ao conseguir, emite 'conectado'.
+    'criar_fonte' é uma função sem argumentos que devolve uma FonteEventos.
+    """
+    alteracao = pyqtSignal(set)
+    conectado = pyqtSignal()
+    desconectado = pyqtSignal(str)
+
+    def __init__(self, criar_fonte=FonteEventosFirebird, espera_reconexao=30, parent=None):
+        super().__init__(parent)
+        self._criar_fonte = criar_fonte
+        self.espera_reconexao = espera_reconexao
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                fonte = self._criar_fonte()
+            except Exception as e:
+                self.desconectado.emit(str(e))
+                self._parar.wait(self.espera_reconexao)
+                continue
+
+            self.conectado.emit()
+            try:
+                while not self._parar.is_set():
+                    # Timeout curto para perceber o pedido de parada
+                    eventos = fonte.aguardar(1.0)
+                    if eventos:
+                        self.alteracao.emit(eventos)
+            except Exception as e:
+                self.desconectado.emit(str(e))
+                self._parar.wait(self.espera_reconexao)
+            finally:
+                try:
+                    fonte.fechar()
+                except Exception:
+                    pass
+
+    def parar(self, timeout_ms=5000):
+        self._parar.set()
+        self.wait(timeout_ms)
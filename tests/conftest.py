@@ -0,0 +1,38 @@
+# Testes rodam sobre o motor SQLite (backends.py), sem servidor de banco:
+#   python -m pytest tests
+import os
+import sys
+import time
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuracoes
+import dados_sinteticos
+import database
+
+@pytest.fixture(scope="session")
+def app():
+    """Aplicação Qt (sem janelas), necessária para QSettings e para os sinais entre threads."""
+    return QCoreApplication.instance() or QCoreApplication([])
+
+@pytest.fixture
+def banco(app, tmp_path):
+    """Banco SQLite novo, com todas as migrações aplicadas; devolve o caminho do arquivo."""
+    caminho = str(tmp_path / "teste.sqlite3")
+    dados_sinteticos.usar_banco(caminho)
+    database.iniciar_db()
+    yield caminho
+    database.fechar_pool()
+    configuracoes.substituir({})
+
+def esperar(condicao, segundos=5.0):
+    """Processa os eventos Qt até 'condicao()' ser verdadeira; falha ao passar de 'segundos'."""
+    limite = time.monotonic() + segundos
+    while not condicao():
+        if time.monotonic() > limite:
+            raise AssertionError("Tempo esgotado esperando a condição")
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
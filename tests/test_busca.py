@@ -0,0 +1,37 @@
+from datetime import date
+
+import database
+
+def _novo_cliente(nome):
+    database.adicionar_cliente(nome, "Nosso", "contato", False, False, "A", "", 1, "", "", "admin")
+    return next(c['ID'] for c in database.listar_clientes() if c['NOME'] == nome)
+
+def _paginas(termo, tamanho):
+    ids, cursor = [], None
+    while True:
+        linhas, cursor = database.buscar_agendamentos_pagina(termo, cursor, tamanho)
+        ids += [linha['ID'] for linha in linhas]
+        if cursor is None:
+            return ids
+
+def test_paginas_seguem_a_ordem_de_relevancia_sem_consultar_a_versao(banco, monkeypatch):
+    pendente = database.get_id_status_pendente()
+    no_nome = _novo_cliente("Padaria Ravena")
+    outro = _novo_cliente("Mercado Central")
+    for dia in (1, 2, 3):
+        database.adicionar_entrega(date(2030, 6, dia), "08:00", pendente, no_nome, "", "", False, "admin")
+        database.adicionar_entrega(date(2030, 6, dia + 3), "09:00", pendente, outro, "Ravena", "", False, "admin")
+    database.adicionar_entrega(date(2030, 7, 1), "10:00", pendente, outro, "", "Ligar para a Ravena", False, "admin")
+
+    esperado = database.buscar_ids_agendamentos("ravena")
+    assert len(esperado) == 7
+    # Os encontrados no nome do cliente vêm antes, mesmo sendo mais antigos
+    assert [database.get_entregas_por_dia(f"2030-06-0{dia}")["08:00"]['ID'] for dia in (3, 2, 1)] == esperado[:3]
+
+    consultas = []
+    versao = database.get_versao_dados
+    monkeypatch.setattr(database, 'get_versao_dados', lambda: consultas.append(1) or versao())
+
+    assert _paginas("ravena", 2) == esperado
+    assert len(consultas) == 1 # Só a primeira página confere a versão dos dados
+    assert _paginas("ravena", 7) == esperado
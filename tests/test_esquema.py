@@ -0,0 +1,136 @@
+import re
+import sqlite3
+
+import backends
+import database
+
+# Triggers sem equivalente no SQLite: chave automática (lá é AUTOINCREMENT) e POST_EVENT
+SO_FIREBIRD = ('_BI', '_EVENTO')
+TABELAS_INTERNAS_SQLITE = {'SQLITE_SEQUENCE', 'GENERATORS', 'SCHEMA_VERSION'}
+
+_RE_CRIAR_TABELA = re.compile(r"^\s*CREATE TABLE (\w+)\s*\((.*)\)\s*$", re.IGNORECASE | re.DOTALL)
+_RE_ADICIONAR_COLUNA = re.compile(r"^\s*ALTER TABLE (\w+) ADD (\w+)", re.IGNORECASE)
+_RE_REMOVER_TABELA = re.compile(r"^\s*DROP TABLE (\w+)", re.IGNORECASE)
+_RE_CRIAR_TRIGGER = re.compile(r"^\s*CREATE (?:OR ALTER )?TRIGGER (\w+) FOR (\w+)\s+ACTIVE (BEFORE|AFTER) ((?:\w+(?: OR )?)+?) POSITION",
+                               re.IGNORECASE)
+_RE_REMOVER_TRIGGER = re.compile(r"^\s*DROP TRIGGER (\w+)", re.IGNORECASE)
+_RE_CRIAR_INDICE = re.compile(r"^\s*CREATE INDEX \w+ ON (\w+) \(([^)]*)\)", re.IGNORECASE)
+
+def _colunas_da_definicao(definicao):
+    """Nomes das colunas de um CREATE TABLE (as restrições de tabela ficam de fora)."""
+    partes, nivel, atual = [], 0, ""
+    for caractere in definicao:
+        nivel += {'(': 1, ')': -1}.get(caractere, 0)
+        if caractere == ',' and nivel == 0:
+            partes.append(atual)
+            atual = ""
+        else:
+            atual += caractere
+    partes.append(atual)
+    nomes = (parte.split()[0].upper() for parte in partes if parte.strip())
+    return {nome for nome in nomes if nome not in ('FOREIGN', 'PRIMARY', 'UNIQUE', 'CONSTRAINT', 'CHECK')}
+
+class EsquemaFirebird:
+    """Estrutura que as migrações criariam num Firebird, montada a partir dos comandos executados."""
+    def __init__(self):
+        self.tabelas = {}   # nome -> {colunas}
+        self.triggers = {}  # nome -> (tabela, momento, {eventos})
+        self.indices = {}   # tabela -> [[colunas]]
+
+    def registrar(self, sql):
+        criar_tabela = _RE_CRIAR_TABELA.match(sql)
+        adicionar_coluna = _RE_ADICIONAR_COLUNA.match(sql)
+        remover_tabela = _RE_REMOVER_TABELA.match(sql)
+        criar_trigger = _RE_CRIAR_TRIGGER.match(sql)
+        remover_trigger = _RE_REMOVER_TRIGGER.match(sql)
+        criar_indice = _RE_CRIAR_INDICE.match(sql)
+        if criar_tabela:
+            self.tabelas[criar_tabela.group(1).upper()] = _colunas_da_definicao(criar_tabela.group(2))
+        elif adicionar_coluna:
+            self.tabelas[adicionar_coluna.group(1).upper()].add(adicionar_coluna.group(2).upper())
+        elif remover_tabela:
+            del self.tabelas[remover_tabela.group(1).upper()]
+        elif criar_trigger:
+            nome, tabela, momento, eventos = criar_trigger.groups()
+            self.triggers[nome.upper()] = (tabela.upper(), momento.upper(), {evento.strip().upper() for evento in eventos.split(" OR ")})
+        elif remover_trigger:
+            del self.triggers[remover_trigger.group(1).upper()]
+        elif criar_indice:
+            colunas = [coluna.strip().upper() for coluna in criar_indice.group(2).split(",")]
+            self.indices.setdefault(criar_indice.group(1).upper(), []).append(colunas)
+
+    def triggers_equivalentes_sqlite(self):
+        """Nomes (e tabelas) que os triggers teriam no SQLite: um por evento, com o sufixo de backends._trigger."""
+        return {
+            (f"{nome}_{momento[0]}{evento[0]}", tabela)
+            for nome, (tabela, momento, eventos) in self.triggers.items()
+            if not nome.endswith(SO_FIREBIRD)
+            for evento in eventos
+        }
+
+class CursorGravador:
+    def __init__(self, esquema):
+        self._esquema = esquema
+
+    def execute(self, sql, params=()):
+        self._esquema.registrar(sql)
+
+    def executemany(self, sql, seq_params):
+        pass
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+class ConexaoGravadora:
+    def __init__(self, esquema):
+        self._esquema = esquema
+
+    def cursor(self):
+        return CursorGravador(self._esquema)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+class BackendFirebirdGravador(backends.BackendFirebird):
+    """Firebird sem servidor: o catálogo é o EsquemaFirebird montado pelos próprios comandos."""
+    def __init__(self, esquema):
+        self._esquema = esquema
+
+    def tabela_existe(self, cur, nome_tabela):
+        return nome_tabela.upper() in self._esquema.tabelas
+
+    def coluna_existe(self, cur, nome_tabela, nome_coluna):
+        return nome_coluna.upper() in self._esquema.tabelas.get(nome_tabela.upper(), ())
+
+    def colunas_dos_indices(self, cur, nome_tabela):
+        return self._esquema.indices.get(nome_tabela.upper(), [])
+
+def _esquema_firebird(monkeypatch):
+    esquema = EsquemaFirebird()
+    monkeypatch.setattr(database, 'motor_atual', lambda: BackendFirebirdGravador(esquema))
+    monkeypatch.setattr(database, '_inserir_dados_padrao', lambda cur: None)
+    conn = ConexaoGravadora(esquema)
+    cur = conn.cursor()
+    for _, _, migracao in database.MIGRACOES:
+        migracao(conn, cur)
+    return esquema
+
+def test_sqlite_tem_as_tabelas_colunas_e_triggers_do_firebird(banco, monkeypatch):
+    db = sqlite3.connect(banco)
+    tabelas = {nome.upper() for (nome,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tabelas -= TABELAS_INTERNAS_SQLITE
+    colunas = {tabela: {coluna[1].upper() for coluna in db.execute(f"PRAGMA table_info({tabela})")} for tabela in tabelas}
+    triggers = {(nome.upper(), tabela.upper())
+                for nome, tabela in db.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'trigger'")}
+    db.close()
+
+    firebird = _esquema_firebird(monkeypatch)
+
+    assert colunas == firebird.tabelas
+    assert triggers == firebird.triggers_equivalentes_sqlite()
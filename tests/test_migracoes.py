@@ -0,0 +1,33 @@
+import threading
+
+import dados_sinteticos
+import database
+
+def test_inicializacao_simultanea_aplica_cada_migracao_uma_vez(app, tmp_path):
+    dados_sinteticos.usar_banco(str(tmp_path / "teste.sqlite3"))
+    erros = []
+    def iniciar():
+        try:
+            database.iniciar_db()
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=iniciar) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert erros == []
+        conn = database.conectar()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT VERSAO, COUNT(*) FROM SCHEMA_VERSION WHERE VERSAO > 0 GROUP BY VERSAO ORDER BY VERSAO")
+            versoes = cur.fetchall()
+        finally:
+            conn.close()
+        assert versoes == [(numero, 1) for numero, _, _ in database.MIGRACOES]
+        assert database.get_usuario_por_nome('admin') is not None
+        assert len(database.listar_status()) == 8
+    finally:
+        database.fechar_pool()
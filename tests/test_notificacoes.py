@@ -0,0 +1,49 @@
+import notificacoes
+from conftest import esperar
+
+def test_ouvinte_emite_sinais_da_fonte_local(app):
+    fonte = notificacoes.FonteEventosLocal()
+    ouvinte = notificacoes.OuvinteAlteracoes(criar_fonte=lambda: fonte, espera_reconexao=0.1)
+    alteracoes, conexoes, quedas = [], [], []
+    ouvinte.alteracao.connect(alteracoes.append)
+    ouvinte.conectado.connect(lambda: conexoes.append(True))
+    ouvinte.desconectado.connect(quedas.append)
+    ouvinte.start()
+    try:
+        esperar(lambda: len(conexoes) == 1)
+
+        fonte.publicar('entregas_changed')
+        fonte.publicar('feriados_changed')
+        esperar(lambda: set().union(*alteracoes) == {'entregas_changed', 'feriados_changed'})
+
+        # Queda da conexão: avisa, recria a fonte e volta a entregar eventos
+        fonte.desconectar("servidor reiniciado")
+        esperar(lambda: len(conexoes) == 2)
+        assert quedas == ["servidor reiniciado"]
+
+        alteracoes.clear()
+        fonte.publicar('status_changed')
+        esperar(lambda: alteracoes == [{'status_changed'}])
+    finally:
+        ouvinte.parar()
+    assert ouvinte.isFinished()
+
+def test_ouvinte_avisa_quando_nao_consegue_criar_a_fonte(app):
+    tentativas = []
+    def criar_fonte():
+        tentativas.append(True)
+        if len(tentativas) == 1:
+            raise ConnectionError("servidor indisponível")
+        return notificacoes.FonteEventosLocal()
+
+    ouvinte = notificacoes.OuvinteAlteracoes(criar_fonte=criar_fonte, espera_reconexao=0.1)
+    conexoes, quedas = [], []
+    ouvinte.conectado.connect(lambda: conexoes.append(True))
+    ouvinte.desconectado.connect(quedas.append)
+    ouvinte.start()
+    try:
+        esperar(lambda: conexoes)
+        assert quedas == ["servidor indisponível"]
+        assert len(tentativas) == 2
+    finally:
+        ouvinte.parar()
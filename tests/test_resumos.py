@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+from datetime import date
+
+import database
+
+DIA = date(2030, 6, 3)
+
+def _novo_cliente(nome):
+    database.adicionar_cliente(nome, "Nosso", "contato", False, False, "A", "", 1, "", "", "admin")
+    return next(c['ID'] for c in database.listar_clientes() if c['NOME'] == nome)
+
+def _consultar(banco, sql, params=()):
+    db = sqlite3.connect(banco)
+    try:
+        return db.execute(sql, params).fetchall()
+    finally:
+        db.close()
+
+def _parcelas_do_dia(banco, dia):
+    return _consultar(banco, "SELECT STATUS_ID, CONTAGEM FROM RESUMO_DIA_PARCELAS WHERE DATA = ? ORDER BY ID", (dia.isoformat(),))
+
+def _parcelas_do_mes(banco, ano, mes):
+    return _consultar(banco, "SELECT CLIENTE_ID, CONCLUIDOS, RETIFICADOS, SOLICITADOS_PENDENTES FROM RESUMO_MES_PARCELAS "
+                             "WHERE ANO = ? AND MES = ? ORDER BY ID", (ano, mes))
+
+def _em_paralelo(*gravacoes):
+    """Executa cada gravação numa thread (como computadores diferentes), todas liberadas juntas."""
+    barreira = threading.Barrier(len(gravacoes))
+    erros = []
+
+    def executar(gravacao):
+        try:
+            barreira.wait()
+            gravacao()
+        except Exception as e:
+            erros.append(e)
+        finally:
+            database.fechar_pool() # Conexões desta thread
+
+    computadores = [threading.Thread(target=executar, args=(gravacao,)) for gravacao in gravacoes]
+    for computador in computadores:
+        computador.start()
+    for computador in computadores:
+        computador.join()
+    return erros
+
+def _resumo_esperado(banco, dia):
+    """O resumo do dia recalculado direto de ENTREGAS."""
+    (contagem, status_id, agendado, solicitado), = _consultar(banco, """
+        SELECT COUNT(*), MIN(STATUS_ID), SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 0, 1)), SUM(IIF(TIPO_ATENDIMENTO = 'SOLICITADO', 1, 0))
+        FROM ENTREGAS WHERE DATA_VENCIMENTO = ?""", (dia.isoformat(),))
+    if not contagem:
+        return None
+    cor = database.get_status_por_id(status_id)['COR_HEX'] if status_id else None
+    return {'CONTAGEM': contagem, 'COR': cor, 'QTD_AGENDADO': agendado, 'QTD_SOLICITADO': solicitado}
+
+def test_dois_computadores_gravando_no_mesmo_dia(banco):
+    cliente_id = _novo_cliente("Cliente concorrente")
+    pendente = database.get_id_status_pendente()
+
+    erros = _em_paralelo(
+        lambda: database.adicionar_entrega(DIA, "08:00", pendente, cliente_id, "", "", False, "admin", 'AGENDADO'),
+        lambda: database.adicionar_entrega(DIA, "09:00", pendente, cliente_id, "", "", False, "admin", 'SOLICITADO'))
+
+    assert erros == []
+    # Cada gravação inseriu a própria parcela, sem atualizar uma linha compartilhada
+    assert _parcelas_do_dia(banco, DIA) == [(pendente, 1), (pendente, 1)]
+    assert database.get_resumo_dias(DIA, date(2030, 6, 4)) == {DIA: _resumo_esperado(banco, DIA)}
+    assert database.get_resumo_dias(DIA, date(2030, 6, 4))[DIA]['CONTAGEM'] == 2
+
+def test_compactar_resumos_mantem_os_numeros_do_dia(banco):
+    cliente_id = _novo_cliente("Cliente da compactação")
+    pendente = database.get_id_status_pendente()
+    feito = database.get_status_por_nome("Feito")['ID']
+    outro_dia = date(2030, 6, 4)
+    for horario in ("08:00", "09:00", "10:00"):
+        database.adicionar_entrega(DIA, horario, pendente, cliente_id, "", "", False, "admin")
+    entregas = sorted(database.get_entregas_por_dia(DIA.isoformat()).values(), key=lambda e: e['HORARIO'])
+    database.atualizar_entrega(entregas[0]['ID'], "08:00", feito, cliente_id, "", "", False, "admin", 'AGENDADO')
+    database.deletar_entrega(entregas[1]['ID'], "admin")
+    database.adicionar_entrega(outro_dia, "08:00", pendente, cliente_id, "", "", False, "admin")
+    database.deletar_entrega(next(iter(database.get_entregas_por_dia(outro_dia.isoformat()).values()))['ID'], "admin")
+    antes = database.get_resumo_dias(DIA, date(2030, 6, 5))
+
+    database.compactar_resumos()
+
+    assert database.get_resumo_dias(DIA, date(2030, 6, 5)) == antes == {DIA: _resumo_esperado(banco, DIA)}
+    # Uma linha por status com agendamentos; o dia que ficou vazio não tem mais parcelas
+    assert sorted(_parcelas_do_dia(banco, DIA)) == sorted([(pendente, 1), (feito, 1)])
+    assert _parcelas_do_dia(banco, outro_dia) == []
+
+def test_dois_computadores_concluindo_no_mesmo_mes(banco):
+    clientes = [_novo_cliente("Cliente A"), _novo_cliente("Cliente B")]
+    feito = database.get_status_por_nome("Feito")['ID']
+
+    erros = _em_paralelo(*(
+        lambda cliente_id=cliente_id: database.adicionar_entrega(DIA, "08:00", feito, cliente_id, "", "", False, "admin")
+        for cliente_id in clientes))
+
+    assert erros == []
+    assert sorted(_parcelas_do_mes(banco, 2030, 6)) == [(clientes[0], 1, 0, 0), (clientes[1], 1, 0, 0)]
+    assert database.get_estatisticas_mensais(2030, 6) == {
+        'CONCLUIDOS': 2, 'RETIFICADOS': 0, 'SOLICITADOS_PENDENTES': 0, 'CLIENTES_ATENDIDOS': 2}
+
+def test_compactar_resumos_mantem_os_numeros_do_mes(banco):
+    cliente_id = _novo_cliente("Cliente do mês")
+    feito = database.get_status_por_nome("Feito")['ID']
+    retificado = database.get_status_por_nome("Retificado")['ID']
+    for horario in ("08:00", "09:00"):
+        database.adicionar_entrega(DIA, horario, feito, cliente_id, "", "", False, "admin")
+    primeira = database.get_entregas_por_dia(DIA.isoformat())["08:00"]
+    database.atualizar_entrega(primeira['ID'], "08:00", retificado, cliente_id, "", "", False, "admin", 'AGENDADO')
+    # Renomear um status insere as diferenças dos agendamentos dele
+    database.atualizar_status(feito, "Concluído", "#007bff", "admin")
+    esperado = {'CONCLUIDOS': 0, 'RETIFICADOS': 1, 'SOLICITADOS_PENDENTES': 0, 'CLIENTES_ATENDIDOS': 0}
+    assert database.get_estatisticas_mensais(2030, 6) == esperado
+
+    database.compactar_resumos()
+
+    assert database.get_estatisticas_mensais(2030, 6) == esperado
+    assert _parcelas_do_mes(banco, 2030, 6) == [(cliente_id, 0, 1, 0)]
@@ -0,0 +1,27 @@
+import pytest
+from PyQt5.QtCore import QDate
+
+import database
+from backends import ErroBanco
+
+def _feriados_de_maio():
+    return database.get_feriados_do_mes(2030, 5)
+
+def test_erro_tratado_fora_de_unidade_nao_sobe(banco):
+    database.adicionar_feriado('2030-05-01', 'nacional')
+    # TIPO é NOT NULL: a função imprime o erro e a remoção feita antes é desfeita
+    database.adicionar_feriado('2030-05-01', None)
+    assert _feriados_de_maio() == {QDate(2030, 5, 1): 'nacional'}
+
+def test_erro_em_unidade_aninhada_desfaz_a_unidade_externa(banco):
+    database.adicionar_feriado('2030-05-01', 'nacional')
+    clientes_antes = database.get_total_clientes()
+
+    with pytest.raises(ErroBanco):
+        with database.transacao():
+            database.adicionar_cliente("Cliente da unidade", "Nosso", "contato", False, False, "A", "", 1, "", "", "admin")
+            database.adicionar_feriado('2030-05-01', None)
+
+    assert database.get_total_clientes() == clientes_antes
+    assert _feriados_de_maio() == {QDate(2030, 5, 1): 'nacional'}
+    assert database.transacao_ativa() is None